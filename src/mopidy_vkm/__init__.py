@@ -2,12 +2,16 @@
 
 import logging
 import pathlib
+from typing import TYPE_CHECKING
 
 from mopidy import config
 from mopidy.config import types
 from mopidy.config.schemas import ConfigSchema
 from mopidy.ext import Extension, Registry
 
+if TYPE_CHECKING:
+    from mopidy.commands import Command
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,15 +33,39 @@ class VKMExtension(Extension):
         schema["sensitive_cache_path"] = types.Path()
         schema["cache_path"] = types.Path(optional=True)
         schema["saved_path"] = types.Path(optional=True)
+        schema["sync_interval"] = types.Integer(minimum=0)
+        schema["sync_api_budget"] = types.Integer(minimum=1)
+        schema["import_workers"] = types.Integer(minimum=1, maximum=16)
+        schema["search_cache_ttl"] = types.Integer(minimum=0)
+        schema["token_check_interval"] = types.Integer(minimum=0)
+        schema["preroll_seconds"] = types.Integer(minimum=0, maximum=60)
+        schema["analysis_workers"] = types.Integer(minimum=0, maximum=8)
+        schema["response_cache"] = types.Boolean()
+        schema["memory_limit"] = types.Integer(minimum=0)
+        schema["search_workers"] = types.Integer(minimum=0, maximum=16)
+        schema["library_workers"] = types.Integer(minimum=0, maximum=16)
+        schema["quality"] = types.String(choices=["low", "medium", "high", "auto"])
+        schema["background_limit"] = types.Integer(minimum=0)
         return schema
 
+    def get_command(self) -> "Command":
+        """Get the ``mopidy vkm`` command."""
+        # Imported on use, like the modules in setup(): Mopidy imports every
+        # extension package at startup, before its dependencies are checked
+        from mopidy_vkm.commands import VKMCommand  # noqa: PLC0415
+
+        return VKMCommand()
+
     def setup(self, registry: Registry) -> None:
         """Setup the extension."""
-        # Import here to avoid circular imports
-        from mopidy_vkm.backend import VKMBackend
-        from mopidy_vkm.web import create_web_app
+        # Imported here so that loading the package for its config schema
+        # does not pull in the backend, the web app and their dependencies
+        from mopidy_vkm.backend import VKMBackend  # noqa: PLC0415
+        from mopidy_vkm.frontend import VKMFrontend  # noqa: PLC0415
+        from mopidy_vkm.web import create_web_app  # noqa: PLC0415
 
         registry.add("backend", VKMBackend)
+        registry.add("frontend", VKMFrontend)
         # Dict param needs type ignore
         registry.add(
             "http:app",
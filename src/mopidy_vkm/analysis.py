@@ -0,0 +1,344 @@
+"""Background analysis of local track files in a low-priority process pool."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import logging
+import mmap
+import multiprocessing
+import os
+import pathlib
+import threading
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.mp3 import FrameHeader, audio_start, is_tag_frame, iter_frames
+from mopidy_vkm.shared import Lease, SharedJsonFile
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from mopidy_vkm.playback import LocalTracks
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_VERSION = 1
+# Seconds between scans of the track directories for new files
+SCAN_INTERVAL = 600
+# Workers run below the Mopidy process so playback never waits on them
+WORKER_NICENESS = 10
+# Seconds another instance sharing cache_path waits before taking over the
+# analysis of a file from an instance that stopped
+ANALYSIS_LEASE = 600
+
+
+def _lower_priority() -> None:
+    """Process pool initializer."""
+    try:
+        os.nice(WORKER_NICENESS)
+    except OSError:
+        logger.debug("Cannot lower the analysis worker priority")
+
+
+def create_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """Create a pool of low-priority analysis worker processes.
+
+    Workers are spawned rather than forked, since Mopidy's process runs
+    GLib and Pykka threads.
+
+    Args:
+        workers: Worker processes.
+
+    Returns:
+        The pool.
+    """
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=max(workers, 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_lower_priority,
+    )
+
+
+def get_lease(path: pathlib.Path, audio_id: str) -> Lease:
+    """Get the lease claiming the analysis of a file.
+
+    Args:
+        path: The results file.
+        audio_id: The VK audio ID of the file.
+
+    Returns:
+        The lease, shared by all instances using the results file.
+    """
+    return Lease(path.parent / "leases", f"analysis-{audio_id}", ANALYSIS_LEASE)
+
+
+def error_result(exc: BaseException) -> dict[str, Any]:
+    """Get the result recorded for a file that cannot be analysed.
+
+    It is remembered so the file is not retried until it changes.
+
+    Args:
+        exc: The analysis error.
+
+    Returns:
+        The result.
+    """
+    return {"version": ANALYSIS_VERSION, "error": str(exc)}
+
+
+def analyse_files(
+    paths: Iterable[pathlib.Path], workers: int = 1
+) -> Iterator[tuple[pathlib.Path, dict[str, Any]]]:
+    """Analyse files in a pool of low-priority worker processes.
+
+    Args:
+        paths: The audio files.
+        workers: Worker processes.
+
+    Yields:
+        Each file with its result, in completion order.
+    """
+    with create_pool(workers) as executor:
+        futures = {executor.submit(analyse_file, str(path)): path for path in paths}
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.exception("Failed to analyse local track %s", path.stem)
+                result = error_result(e)
+            yield path, result
+
+
+def analyse_file(path: str) -> dict[str, Any]:
+    """Analyse an MP3 file. Runs in a worker process.
+
+    Args:
+        path: The audio file.
+
+    Returns:
+        ``duration_ms`` and average ``bitrate`` (kbit/s) counted from the
+        frames, and ``codec``.
+
+    Raises:
+        ValueError: If the file contains no MPEG audio.
+    """
+    file_path = pathlib.Path(path)
+    with (
+        file_path.open("rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        start = audio_start(data)
+        header = FrameHeader(data, start)
+        # The encoder's tag frame is silent and not part of the track
+        if is_tag_frame(data, start, header):
+            start += header.length
+        samples = 0
+        audio_bytes = 0
+        sample_rate = header.sample_rate
+        for _, frame in iter_frames(data, start):
+            samples += frame.samples
+            audio_bytes += frame.length
+    duration_ms = samples * 1000 // sample_rate
+    result: dict[str, Any] = {
+        "version": ANALYSIS_VERSION,
+        "codec": "mp3",
+        "duration_ms": duration_ms,
+        "bitrate": audio_bytes * 8 // duration_ms if duration_ms else 0,
+    }
+    return result
+
+
+class AudioAnalyzer:
+    """Analyse new local track files and keep the results on disk.
+
+    Files are parsed in a process pool (see :func:`create_pool`) so that
+    analysis does not compete with the backend actor for the GIL.
+
+    Instances sharing the results file claim each file with a lease and
+    pick up each other's results, so every file is analysed once.
+    """
+
+    def __init__(
+        self,
+        local_tracks: LocalTracks,
+        path: pathlib.Path | None = None,
+        workers: int = 1,
+        interval: float = SCAN_INTERVAL,
+    ) -> None:
+        """Initialize the analyzer.
+
+        Args:
+            local_tracks: The local track lookup whose directories are
+                scanned.
+            path: File the results are stored in, or None to keep them in
+                memory only.
+            workers: Worker processes (0 disables analysis).
+            interval: Seconds between directory scans.
+        """
+        self.local_tracks = local_tracks
+        self.path = path
+        self.workers = workers
+        self.interval = interval
+        self._file = SharedJsonFile(path) if path else None
+        self._results: dict[str, dict[str, Any]] = {}
+        self._pending: set[str] = set()
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._load()
+
+    def _load(self) -> None:
+        """Load stored results, including other instances' new ones."""
+        if self._file is None or not self._file.changed():
+            return
+        try:
+            results = self._file.load()
+        except (OSError, ValueError):
+            logger.exception("Failed to load audio analysis")
+            return
+        with self._lock:
+            for audio_id in self._dirty:
+                results.pop(audio_id, None)
+            self._results.update(results)
+
+    def save(self) -> None:
+        """Merge this instance's new results into the results file."""
+        if self._file is None:
+            return
+        with self._lock:
+            updates = {audio_id: self._results[audio_id] for audio_id in self._dirty}
+            self._dirty.clear()
+        try:
+            results = self._file.merge(updates)
+        except OSError:
+            logger.exception("Failed to save audio analysis")
+            with self._lock:
+                self._dirty.update(updates)
+            return
+        with self._lock:
+            for audio_id, result in results.items():
+                self._results.setdefault(audio_id, result)
+
+    def get(self, audio_id: str) -> dict[str, Any] | None:
+        """Get the analysis of a track.
+
+        Args:
+            audio_id: The VK audio ID.
+
+        Returns:
+            The analysis or None if the track has not been analysed.
+        """
+        with self._lock:
+            return self._results.get(audio_id)
+
+    def start(self) -> None:
+        """Start scanning for new files in the background."""
+        if not self.workers or not self.local_tracks.dirs or self._thread:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="VKMAudioAnalysis", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scanning and drop queued analyses."""
+        self._stop_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.scan()
+            except Exception:
+                logger.exception("Audio analysis scan failed")
+            self._stop_event.wait(self.interval)
+
+    def scan(self) -> int:
+        """Queue every new or changed file for analysis.
+
+        Returns:
+            The number of files queued.
+        """
+        self._load()
+        queued = 0
+        for directory in self.local_tracks.dirs:
+            if not directory.is_dir():
+                continue
+            for path in directory.glob("*.mp3"):
+                if self._stop_event.is_set():
+                    return queued
+                stat = path.stat()
+                audio_id = path.stem
+                with self._lock:
+                    known = self._results.get(audio_id)
+                    if audio_id in self._pending or (
+                        known is not None
+                        and known.get("version") == ANALYSIS_VERSION
+                        and known.get("size") == stat.st_size
+                        and known.get("mtime_ns") == stat.st_mtime_ns
+                    ):
+                        continue
+                    self._pending.add(audio_id)
+                lease = self._lease(audio_id)
+                if lease is not None and not lease.acquire():
+                    # Another instance is analysing it
+                    with self._lock:
+                        self._pending.discard(audio_id)
+                    continue
+                future = self._get_executor().submit(analyse_file, str(path))
+                future.add_done_callback(
+                    functools.partial(
+                        self._store, audio_id, stat.st_size, stat.st_mtime_ns
+                    )
+                )
+                queued += 1
+        if queued:
+            logger.info("Analysing %d local VK tracks", queued)
+        return queued
+
+    def _lease(self, audio_id: str) -> Lease | None:
+        if self.path is None:
+            return None
+        return get_lease(self.path, audio_id)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = create_pool(self.workers)
+        return self._executor
+
+    def _store(
+        self,
+        audio_id: str,
+        size: int,
+        mtime_ns: int,
+        future: concurrent.futures.Future[dict[str, Any]],
+    ) -> None:
+        """Record a finished analysis; save once the queue has drained."""
+        lease = self._lease(audio_id)
+        if future.cancelled():
+            with self._lock:
+                self._pending.discard(audio_id)
+            if lease is not None:
+                lease.release()
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.exception("Failed to analyse local track %s", audio_id)
+            result = error_result(e)
+        with self._lock:
+            self._pending.discard(audio_id)
+            self._results[audio_id] = {**result, "size": size, "mtime_ns": mtime_ns}
+            self._dirty.add(audio_id)
+            drained = not self._pending
+        if drained:
+            self.save()
+        if lease is not None:
+            lease.release()
@@ -2,6 +2,7 @@
 
 from mopidy_vkm.auth.credentials import CredentialsManager
 from mopidy_vkm.auth.handlers import AuthHandlers, get_handler_methods
+from mopidy_vkm.auth.monitor import TokenMonitor
 from mopidy_vkm.auth.service import VKMAuthService
 from mopidy_vkm.auth.status import AuthStatus
 from mopidy_vkm.auth.token import Service, TokenReceiver
@@ -11,6 +12,7 @@ __all__ = [
     "AuthStatus",
     "CredentialsManager",
     "Service",
+    "TokenMonitor",
     "TokenReceiver",
     "VKMAuthService",
     "get_handler_methods",
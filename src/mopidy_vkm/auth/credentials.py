@@ -103,6 +103,15 @@ class CredentialsManager:
         """
         return self._credentials.get("refresh_token")
 
+    def get_token_expires_at(self) -> float | None:
+        """Get the access token expiry time if known.
+
+        Returns:
+            The expiry as a Unix timestamp or None if the token does not
+            expire or the expiry is unknown.
+        """
+        return self._credentials.get("expires_at")
+
     def get_client_user_id(self) -> str | None:
         """Get the client user ID if available.
 
@@ -145,13 +154,14 @@ class CredentialsManager:
             "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         )
 
-    def update_credentials(
+    def update_credentials(  # noqa: PLR0913, PLR0917
         self,
         access_token: str | None = None,
         refresh_token: str | None = None,
         client_user_id: str | None = None,
         user_agent: str | None = None,
         user_profile: dict[str, Any] | None = None,
+        expires_at: float | None = None,
     ) -> None:
         """Update the credentials with new values.
 
@@ -161,6 +171,7 @@ class CredentialsManager:
             client_user_id: The client user ID.
             user_agent: The user agent string.
             user_profile: The user profile.
+            expires_at: The access token expiry as a Unix timestamp.
         """
         if access_token is not None:
             self._credentials["access_token"] = access_token
@@ -172,6 +183,8 @@ class CredentialsManager:
             self._credentials["user_agent"] = user_agent
         if user_profile is not None:
             self._credentials["user_profile"] = user_profile
+        if expires_at is not None:
+            self._credentials["expires_at"] = expires_at
 
         self._save_credentials()
 
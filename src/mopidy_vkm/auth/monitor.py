@@ -0,0 +1,60 @@
+"""Background validation and refresh of the VK access token."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mopidy_vkm.auth.service import VKMAuthService
+
+logger = logging.getLogger(__name__)
+
+
+class TokenMonitor:
+    """Check the token at startup and then periodically.
+
+    A check costs one cheap ``account.getProfileInfo`` call, so an expired
+    token is noticed before the first playback after a long idle period.
+    """
+
+    def __init__(self, auth_service: VKMAuthService, interval: int) -> None:
+        """Initialize the monitor.
+
+        Args:
+            auth_service: The auth service owning the token.
+            interval: Seconds between checks, 0 only checks at startup.
+        """
+        self.auth_service = auth_service
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="VKMTokenMonitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self) -> None:
+        """Background thread loop."""
+        while not self._stop_event.is_set():
+            try:
+                self.auth_service.check_token()
+            except Exception:
+                logger.exception("Token check failed")
+            if self.interval <= 0:
+                break
+            self._stop_event.wait(self.interval)
@@ -4,17 +4,26 @@ from __future__ import annotations
 
 import logging
 import threading
+import time
 from typing import TYPE_CHECKING, Any
 
 from mopidy_vkm.auth.handlers import AuthHandlers
 from mopidy_vkm.auth.status import AuthStatus
-from mopidy_vkm.auth.token import Service, TokenReceiver
+from mopidy_vkm.auth.token import (
+    Service,
+    TokenReceiver,
+    request_token_refresh,
+    verify_token,
+)
 
 if TYPE_CHECKING:
     from mopidy_vkm.auth.credentials import CredentialsManager
 
 logger = logging.getLogger(__name__)
 
+# Refresh tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 15 * 60
+
 
 class VKMAuthService:
     """VK authentication service using TokenReceiver."""
@@ -38,6 +47,8 @@ class VKMAuthService:
         self.vk_service: Service | None = None
         self._auth_lock = threading.Lock()
         self._auth_thread: threading.Thread | None = None
+        self._refresh_lock = threading.Lock()
+        self.token_checked_at: float | None = None
 
         # Try to initialize the service with existing credentials
         self._initialize_service()
@@ -206,6 +217,31 @@ class VKMAuthService:
 
         return access_token, user_id
 
+    @staticmethod
+    def _extract_token_lifetime(token_data: object) -> tuple[str, float]:
+        """Extract the refresh token and expiry from token data.
+
+        Args:
+            token_data: The token data returned by TokenReceiver.
+
+        Returns:
+            A tuple of (refresh token, expiry as a Unix timestamp); an empty
+            refresh token and 0 if the data carries none, as for plain
+            token strings and non-expiring tokens.
+        """
+        if isinstance(token_data, dict):
+            refresh_token = token_data.get("refresh_token")
+            expires_in = token_data.get("expires_in")
+        else:
+            refresh_token = getattr(token_data, "refresh_token", None)
+            expires_in = getattr(token_data, "expires_in", None)
+        try:
+            expires_in = int(expires_in or 0)
+        except (TypeError, ValueError):
+            expires_in = 0
+        expires_at = time.time() + expires_in if expires_in > 0 else 0
+        return refresh_token if isinstance(refresh_token, str) else "", expires_at
+
     def _initialize_vk_service(
         self, access_token: str, user_id: str, user_agent: str
     ) -> Service:
@@ -283,12 +319,16 @@ class VKMAuthService:
 
             # Extract token data
             access_token, user_id = self._extract_token_data(token_data)
+            refresh_token, expires_at = self._extract_token_lifetime(token_data)
 
-            # Save the credentials
+            # Save the credentials, replacing the refresh token and expiry of
+            # a previous sign-in
             self.credentials_manager.update_credentials(
                 access_token=access_token,
+                refresh_token=refresh_token,
                 client_user_id=user_id,
                 user_agent=user_agent,
+                expires_at=expires_at,
             )
 
             # Initialize the service
@@ -347,6 +387,105 @@ class VKMAuthService:
                     or "Authentication cancelled by user"
                 )
 
+    def _swap_service(self, access_token: str, user_agent: str) -> None:
+        """Replace the VK service with one using a new token.
+
+        Callers holding the previous service keep using it until their call
+        finishes; new calls pick up the replacement.
+
+        Args:
+            access_token: The new access token.
+            user_agent: The user agent string.
+        """
+        user_id = self.credentials_manager.get_client_user_id() or "unknown"
+        try:
+            service = Service(user_agent=user_agent, token=access_token)
+        except TypeError:
+            service = self._initialize_vk_service(access_token, user_id, user_agent)
+        # A single reference assignment, so readers never see a partial state
+        self.vk_service = service
+
+    def token_expires_soon(self) -> bool:
+        """Check whether the stored token expires within the refresh margin.
+
+        Returns:
+            True if the token has a known expiry that is close or past.
+        """
+        expires_at = self.credentials_manager.get_token_expires_at()
+        return bool(expires_at) and expires_at - time.time() < TOKEN_REFRESH_MARGIN
+
+    def refresh_token(self) -> bool:
+        """Exchange the stored refresh token for a new access token.
+
+        Returns:
+            True if the token was refreshed and the service swapped.
+        """
+        refresh_token = self.credentials_manager.get_refresh_token()
+        access_token = self.credentials_manager.get_access_token()
+        if not refresh_token or not access_token:
+            return False
+        user_agent = self.credentials_manager.get_user_agent(
+            self.config.get("user_agent")
+        )
+        try:
+            data = request_token_refresh(access_token, refresh_token, user_agent)
+        except Exception:
+            logger.exception("Token refresh failed")
+            return False
+        if not data:
+            return False
+
+        expires_in = data.get("expires_in") or 0
+        self.credentials_manager.update_credentials(
+            access_token=data["access_token"],
+            refresh_token=data.get("refresh_token"),
+            expires_at=time.time() + expires_in if expires_in else 0,
+        )
+        self._swap_service(data["access_token"], user_agent)
+        logger.info("VK access token refreshed")
+        return True
+
+    def check_token(self) -> bool:
+        """Validate the current token and refresh it when needed.
+
+        A valid token that is about to expire is refreshed ahead of time. An
+        invalid token that cannot be refreshed moves the status to ``ERROR``
+        so the web UI asks for a new sign-in, as the password is not stored.
+
+        Returns:
+            True if a usable token is in place afterwards.
+        """
+        with self._refresh_lock:
+            access_token = self.credentials_manager.get_access_token()
+            if self.vk_service is None or not access_token:
+                return False
+            user_agent = self.credentials_manager.get_user_agent(
+                self.config.get("user_agent")
+            )
+            try:
+                valid = verify_token(access_token, user_agent)
+            except Exception:
+                # Rate limits and network trouble are no reason to drop a
+                # working token
+                logger.warning("Could not validate VK token", exc_info=True)
+                return True
+            self.token_checked_at = time.time()
+
+            if valid and not self.token_expires_soon():
+                return True
+            if self.refresh_token():
+                return True
+            if valid:
+                logger.warning("VK token expires soon and could not be refreshed")
+                return True
+
+            logger.warning("VK token is no longer valid, sign in again")
+            with self._auth_lock:
+                self.vk_service = None
+                self.status = AuthStatus.ERROR
+                self.error_message = "Access token expired, please sign in again"
+            return False
+
     def get_status(self) -> dict[str, Any]:
         """Get the current authentication status.
 
@@ -11,6 +11,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# VK API error code for an invalid or expired access token
+INVALID_TOKEN_ERROR = 5
+
 
 # Define placeholder classes first
 class Service:
@@ -34,6 +37,94 @@ class TokenReceiver:
         """Get the token."""
 
 
+def request_token_refresh(
+    access_token: str, refresh_token: str, user_agent: str
+) -> dict[str, Any] | None:
+    """Exchange a refresh token for a new access token.
+
+    Args:
+        access_token: The current (possibly expired) access token.
+        refresh_token: The stored refresh token.
+        user_agent: The user agent string.
+
+    Returns:
+        A dict with ``access_token``, ``refresh_token`` (if rotated) and
+        ``expires_in`` (seconds, 0 for non-expiring tokens), or None if the
+        refresh was rejected.
+    """
+    try:
+        from vkpymusic.vk_api import (  # noqa: PLC0415
+            VkApiException,
+            VkApiRequestBuilder,
+            make_request,
+        )
+    except ImportError:
+        return None
+
+    request = VkApiRequestBuilder.build_from_base_request(
+        method="get",
+        url="auth.refreshToken",
+        params={"refresh_token": refresh_token},
+    )
+    request.fill_token(access_token)
+    request.fill_user_agent(user_agent)
+    try:
+        response = make_request(request).data
+    except VkApiException as e:
+        logger.warning("VK rejected the token refresh: %s", e)
+        return None
+    if not isinstance(response, dict):
+        return None
+    new_token = response.get("access_token") or response.get("token")
+    if not new_token:
+        return None
+    return {
+        "access_token": new_token,
+        "refresh_token": response.get("refresh_token"),
+        "expires_in": int(response.get("expires_in") or 0),
+    }
+
+
+def verify_token(access_token: str, user_agent: str) -> bool:
+    """Check an access token with VK.
+
+    Unlike vkpymusic's ``is_token_valid``, which reports any API error as an
+    invalid token, only error ``INVALID_TOKEN_ERROR`` counts; rate limits,
+    flood control and server errors are raised so that a working token is
+    not dropped over them.
+
+    Args:
+        access_token: The access token to check.
+        user_agent: The user agent string.
+
+    Returns:
+        False if VK rejected the token, True otherwise (including when
+        vkpymusic is not available).
+
+    Raises:
+        VkApiException: For API errors other than an invalid token.
+    """
+    try:
+        from vkpymusic.vk_api import (  # noqa: PLC0415
+            VkApiException,
+            VkApiRequestBuilder,
+            make_request,
+        )
+    except ImportError:
+        return True
+
+    request = VkApiRequestBuilder.build_req_get_profile_info()
+    request.fill_token(access_token)
+    request.fill_user_agent(user_agent)
+    try:
+        make_request(request)
+    except VkApiException as e:
+        if e.error_code == INVALID_TOKEN_ERROR:
+            return False
+        raise
+    return True
+
+
 # Import with try/except to handle potential import errors
 try:
     from vkpymusic import service, token_receiver
@@ -1,13 +1,39 @@
 """VKM backend."""
 
 import logging
+import pathlib
+import threading
 from typing import Any
 
 import pykka
 from mopidy import backend
 
-from mopidy_vkm.auth import CredentialsManager
+from mopidy_vkm.analysis import AudioAnalyzer
+from mopidy_vkm.auth import CredentialsManager, TokenMonitor
 from mopidy_vkm.auth.service import VKMAuthService
+from mopidy_vkm.dispatch import DispatchingInbox
+from mopidy_vkm.importer import MatchCache, PlaylistImporter, get_playlists_dir
+from mopidy_vkm.library import VKMLibraryProvider
+from mopidy_vkm.memory import MemoryBudget
+from mopidy_vkm.playback import (
+    LocalTracks,
+    PrerollBuffer,
+    UrlCache,
+    VKMPlaybackProvider,
+    get_stream_base_url,
+    get_track_dirs,
+)
+from mopidy_vkm.playlists import PlaylistSnapshots, VKMPlaylistsProvider
+from mopidy_vkm.quality import QualitySelector, ThroughputMonitor
+from mopidy_vkm.radio import RadioManager
+from mopidy_vkm.resilience import CircuitBreaker, ResilientService
+from mopidy_vkm.responsecache import CachingService, ResponseCache
+from mopidy_vkm.search import SearchCache
+from mopidy_vkm.shaping import TrafficShaper
+from mopidy_vkm.sync import LibraryIndex, LibrarySyncScheduler
+from mopidy_vkm.trackstore import TrackStore
+from mopidy_vkm.translator import parse_track_uri
+from mopidy_vkm.warmer import get_covers_dir
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +41,10 @@ logger = logging.getLogger(__name__)
 class VKMBackend(pykka.ThreadingActor, backend.Backend):
     """VKM backend with TokenReceiver authentication."""
 
+    @staticmethod
+    def _create_actor_inbox() -> DispatchingInbox:
+        return DispatchingInbox()
+
     def __init__(self, config: dict[str, Any], audio: object) -> None:
         """Initialize VKM backend."""
         super().__init__()
@@ -28,5 +58,219 @@ class VKMBackend(pykka.ThreadingActor, backend.Backend):
 
         # Initialize auth service
         self.auth_service = VKMAuthService(self.credentials_manager, self.config)
+        self.token_monitor = TokenMonitor(
+            self.auth_service, self.config.get("token_check_interval") or 0
+        )
+
+        # All VK calls share one circuit breaker
+        self.circuit_breaker = CircuitBreaker()
+        self._resilient_service: ResilientService | None = None
+
+        # Downloads feed the throughput the stream quality is chosen from,
+        # and background transfers yield to playback through the shaper
+        self.throughput = ThroughputMonitor()
+        self.traffic = TrafficShaper(
+            self.throughput, (self.config.get("background_limit") or 0) * 1024
+        )
+
+        # Idempotent VK reads are answered from disk where possible
+        cache_path = self.config.get("cache_path")
+        self.response_cache = (
+            ResponseCache(pathlib.Path(cache_path) / "responses")
+            if cache_path and self.config.get("response_cache")
+            else None
+        )
+
+        # Initialize library index and its background sync
+        self.library_index = LibraryIndex(
+            pathlib.Path(cache_path) / "library.json" if cache_path else None
+        )
+        # The sync and snapshots must see VK's current state to detect changes
+        self.sync_scheduler = LibrarySyncScheduler(
+            self.library_index,
+            self.get_fresh_vk_service,
+            self.credentials_manager.get_client_user_id,
+            interval=self.config.get("sync_interval") or 0,
+            api_budget=self.config.get("sync_api_budget") or 1,
+            throttle=self.traffic.background,
+        )
+
+        self.playlist_snapshots = PlaylistSnapshots(
+            self.library_index,
+            self.get_fresh_vk_service,
+            pathlib.Path(cache_path) / "playlists.json" if cache_path else None,
+        )
+        self.playlists = VKMPlaylistsProvider(backend=self)
+
+        self.search_cache = SearchCache(self.config.get("search_cache_ttl") or 0)
+        self.track_store = TrackStore(
+            self.get_vk_service,
+            pathlib.Path(cache_path) / "track_metadata.json" if cache_path else None,
+        )
+        self.library = VKMLibraryProvider(backend=self)
+
+        # Initialize playlist importer used by the web UI
+        self.importer = PlaylistImporter(
+            self.get_vk_service,
+            MatchCache(
+                pathlib.Path(cache_path) / "import_matches.json" if cache_path else None
+            ),
+            get_playlists_dir(config),
+            self.config.get("import_workers") or 1,
+        )
+
+        # Initialize playback provider and the recommendations radio
+        self.url_cache = UrlCache()
+        self.quality = QualitySelector(
+            self.config.get("quality") or "auto", self.throughput
+        )
+        self.preroll = PrerollBuffer(
+            self.config.get("preroll_seconds") or 0,
+            monitor=self.throughput,
+            shaper=self.traffic,
+        )
+        self.stream_base_url = get_stream_base_url(config)
+        self.covers_dir = get_covers_dir(self.config)
+        self.local_tracks = LocalTracks(get_track_dirs(self.config))
+        self.audio_analyzer = AudioAnalyzer(
+            self.local_tracks,
+            pathlib.Path(cache_path) / "analysis.json" if cache_path else None,
+            self.config.get("analysis_workers") or 0,
+        )
+        self.playback = VKMPlaybackProvider(audio=audio, backend=self)
+        self.radio = RadioManager(
+            self.get_vk_service,
+            self.credentials_manager.get_client_user_id,
+            self.url_cache,
+            self.track_store,
+        )
+
+        # All in-process caches share one memory limit (MiB, 0 = unlimited)
+        self.memory_budget = MemoryBudget(
+            (self.config.get("memory_limit") or 0) * 1024 * 1024
+        )
+        for cache in (
+            self.search_cache,
+            self.url_cache,
+            self.preroll,
+            self.track_store,
+            self.playlist_snapshots,
+            self.library_index,
+        ):
+            self.memory_budget.register(cache)
+
+        # Searches and library calls run in their own pools, so they do not
+        # hold up playback calls on the actor thread
+        self.actor_inbox.configure(
+            self,
+            {
+                "search": self.config.get("search_workers") or 0,
+                "library": self.config.get("library_workers") or 0,
+            },
+        )
+
+    def on_start(self) -> None:
+        """Start background tasks once the actor is running."""
+        self.token_monitor.start()
+        self.sync_scheduler.start()
+        self.audio_analyzer.start()
+        if self.response_cache is not None:
+            threading.Thread(
+                target=self.response_cache.prune, name="VKMCachePrune", daemon=True
+            ).start()
+
+    def on_stop(self) -> None:
+        """Stop background tasks."""
+        self.actor_inbox.shutdown()
+        self.track_store.stop()
+        self.audio_analyzer.stop()
+        if self.response_cache is not None:
+            self.response_cache.shutdown()
+        self.sync_scheduler.stop()
+        self.token_monitor.stop()
+
+    def get_vk_service(self) -> Any:  # noqa: ANN401
+        """Get the authenticated VK service.
+
+        Returns:
+            The vkpymusic ``Service`` behind the shared circuit breaker and
+            the response cache, or None if not authenticated.
+        """
+        return self._wrap_service(refresh=False)
+
+    def get_fresh_vk_service(self) -> Any:  # noqa: ANN401
+        """Get the VK service bypassing cached responses.
+
+        Responses are still written to the cache for other callers.
+
+        Returns:
+            The wrapped ``Service`` or None if not authenticated.
+        """
+        return self._wrap_service(refresh=True)
+
+    def _wrap_service(self, *, refresh: bool) -> Any:  # noqa: ANN401
+        service = self.auth_service.vk_service
+        if service is None:
+            return None
+        resilient = self._resilient_service
+        # Rewrap when the token monitor swapped the service
+        if resilient is None or resilient.service is not service:
+            resilient = ResilientService(service, self.circuit_breaker)
+            self._resilient_service = resilient
+        if self.response_cache is None:
+            return resilient
+        return CachingService(
+            resilient,
+            self.response_cache,
+            self.credentials_manager.get_client_user_id() or "",
+            refresh=refresh,
+        )
+
+    def resolve_url(self, audio_id: str) -> str | None:
+        """Resolve an audio ID to its stream URL.
+
+        Args:
+            audio_id: The VK audio ID (``<owner>_<id>``).
+
+        Returns:
+            The stream URL or None if it cannot be resolved.
+        """
+        url = self.url_cache.get(audio_id)
+        if url:
+            return url
+        service = self.get_vk_service()
+        if service is None:
+            logger.warning("Cannot resolve %s: not authenticated", audio_id)
+            return None
+        try:
+            songs = service.get_songs_by_id([audio_id])
+        except Exception:
+            logger.exception("Failed to resolve VK track %s", audio_id)
+            return None
+        self.url_cache.add_songs(songs)
+        return self.url_cache.get(audio_id)
+
+    def preroll_next(self, uri: str) -> None:
+        """Resolve the next track and buffer its first seconds.
+
+        Args:
+            uri: The track URI about to be played.
+        """
+        audio_id = parse_track_uri(uri)
+        if audio_id is None or self.local_tracks.find(audio_id) is not None:
+            return
+        url = self.resolve_url(audio_id)
+        if url:
+            self.preroll.prefetch(audio_id, url)
+            # HLS tracks are not prerolled, but their variants are loaded
+            self.quality.load_variants(url)
+            # Rate-limited prerolls do not measure the link; probes do
+            self.quality.maybe_probe(url)
+
+    def set_playing(self, playing: bool) -> None:  # noqa: FBT001
+        """Protect playback bandwidth while the player is playing.
 
-        # TODO: Initialize library and playback provider  # noqa: FIX002
+        Args:
+            playing: Whether playback is running.
+        """
+        self.traffic.set_playing(playing)
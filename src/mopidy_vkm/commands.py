@@ -0,0 +1,479 @@
+"""VKM command line interface."""
+
+from __future__ import annotations
+
+import json
+import logging
+import pathlib
+import sys
+import time
+import urllib.request
+from typing import TYPE_CHECKING, Any
+
+from mopidy import commands
+
+from mopidy_vkm import exporter, maintenance
+from mopidy_vkm.auth import CredentialsManager, VKMAuthService
+from mopidy_vkm.importer import (
+    FORMATS,
+    ImportJob,
+    MatchCache,
+    PlaylistImporter,
+    get_playlists_dir,
+    parse_playlist,
+)
+from mopidy_vkm.playback import get_stream_base_url
+from mopidy_vkm.playlists import PlaylistSnapshots
+from mopidy_vkm.quality import ThroughputMonitor
+from mopidy_vkm.resilience import CircuitBreaker, ResilientService
+from mopidy_vkm.responsecache import CachingService, ResponseCache
+from mopidy_vkm.shaping import TrafficShaper
+from mopidy_vkm.sync import LibraryIndex, LibrarySyncScheduler
+from mopidy_vkm.warmer import CacheWarmer
+
+if TYPE_CHECKING:
+    import argparse
+
+logger = logging.getLogger(__name__)
+
+
+def create_vk_service(config: dict[str, Any]) -> ResilientService | None:
+    """Create a VK service from the stored credentials.
+
+    Args:
+        config: The full Mopidy configuration.
+
+    Returns:
+        The VK service behind a circuit breaker, as Mopidy uses it, or None
+        if not authenticated.
+    """
+    credentials_manager = CredentialsManager(config["vkm"]["sensitive_cache_path"])
+    auth_service = VKMAuthService(credentials_manager, config["vkm"])
+    if auth_service.vk_service is None:
+        logger.error(
+            "Not authenticated with VK; log in through the /vkm web page first"
+        )
+        return None
+    return ResilientService(auth_service.vk_service, CircuitBreaker())
+
+
+class VKMCommand(commands.Command):
+    """Root of the ``mopidy vkm`` command tree."""
+
+    help = "VK Music utilities."
+
+    def __init__(self) -> None:
+        """Initialize the command and register sub-commands."""
+        super().__init__()
+        self.add_child("import", ImportCommand())
+        self.add_child("export", ExportCommand())
+        self.add_child("warm", WarmCommand())
+        self.add_child("cache", CacheCommand())
+
+
+class ImportCommand(commands.Command):
+    """Import an external playlist export by matching it against VK."""
+
+    help = "Import an M3U, CSV or JSON playlist export into a VK URI playlist."
+
+    def __init__(self) -> None:
+        """Initialize the command arguments."""
+        super().__init__()
+        self.add_argument("path", type=pathlib.Path, help="Playlist file to import.")
+        self.add_argument(
+            "--format",
+            choices=FORMATS,
+            default=None,
+            help="File format, guessed from the extension by default.",
+        )
+        self.add_argument(
+            "--name", default=None, help="Playlist name, defaults to the file name."
+        )
+        self.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of concurrent VK searches (default: [vkm] import_workers).",
+        )
+        self.add_argument(
+            "--output",
+            type=pathlib.Path,
+            default=None,
+            help="Directory to write the M3U playlist to.",
+        )
+
+    def run(self, args: argparse.Namespace, config: dict[str, Any]) -> int:
+        """Run the import.
+
+        Args:
+            args: Parsed command line arguments.
+            config: The full Mopidy configuration.
+
+        Returns:
+            The process exit code.
+        """
+        path: pathlib.Path = args.path
+        fmt = args.format or path.suffix.lstrip(".").lower()
+        try:
+            entries = parse_playlist(path.read_text(encoding="utf-8"), fmt)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to read %s: %s", path, e)  # noqa: TRY400
+            return 1
+        if not entries:
+            logger.error("No tracks found in %s", path)
+            return 1
+
+        service = create_vk_service(config)
+        if service is None:
+            return 1
+
+        cache_path = config["vkm"].get("cache_path")
+        importer = PlaylistImporter(
+            lambda: service,
+            MatchCache(
+                pathlib.Path(cache_path) / "import_matches.json" if cache_path else None
+            ),
+            args.output or get_playlists_dir(config),
+            args.workers or config["vkm"].get("import_workers") or 1,
+        )
+
+        step = max(len(entries) // 20, 1)
+
+        def progress(job: ImportJob) -> None:
+            if job.done % step == 0 or job.done == len(job.entries):
+                logger.info("Matched %d/%d tracks", job.done, len(job.entries))
+
+        job = importer.run(ImportJob(args.name or path.stem, entries), progress)
+        if job.status != "success":
+            logger.error("Import failed: %s", job.error)
+            return 1
+
+        summary = job.to_dict()
+        logger.info(
+            "Imported %d of %d tracks (%d from cache) into %s",
+            summary["matched"],
+            summary["total"],
+            summary["cached"],
+            summary["playlist_path"],
+        )
+        for entry in summary["unmatched"]:
+            logger.info("No match: %s - %s", entry["artist"], entry["title"])
+        return 0
+
+
+class ExportCommand(commands.Command):
+    """Stream the synced VK library to a file or stdout."""
+
+    help = "Export the VK library as NDJSON, CSV or M3U."
+
+    def __init__(self) -> None:
+        """Initialize the command arguments."""
+        super().__init__()
+        self.add_argument(
+            "--format",
+            choices=exporter.FORMATS,
+            default=None,
+            help="Output format, guessed from --output or ndjson by default.",
+        )
+        self.add_argument(
+            "--collections",
+            default=",".join(exporter.COLLECTIONS),
+            help="Comma separated collections to export (default: all).",
+        )
+        self.add_argument(
+            "--playlist-tracks",
+            action="store_true",
+            help="Also export the tracks of every playlist (one VK call per page).",
+        )
+        self.add_argument(
+            "--output",
+            type=pathlib.Path,
+            default=None,
+            help="File to write to, stdout by default.",
+        )
+
+    def run(self, args: argparse.Namespace, config: dict[str, Any]) -> int:
+        """Run the export.
+
+        Args:
+            args: Parsed command line arguments.
+            config: The full Mopidy configuration.
+
+        Returns:
+            The process exit code.
+        """
+        output: pathlib.Path | None = args.output
+        suffix = output.suffix.lstrip(".").lower() if output else ""
+        fmt = args.format or ("m3u" if suffix == "m3u8" else suffix) or "ndjson"
+        collections = args.collections.split(",")
+        if fmt not in exporter.FORMATS or not set(collections) <= set(
+            exporter.COLLECTIONS
+        ):
+            logger.error("Invalid format %s or collections %s", fmt, collections)
+            return 1
+
+        cache_path = config["vkm"].get("cache_path")
+        index = LibraryIndex(
+            pathlib.Path(cache_path) / "library.json" if cache_path else None
+        )
+        if index.is_empty():
+            logger.error("The library has not been synced yet; start Mopidy first")
+            return 1
+
+        service = None
+        if args.playlist_tracks:
+            service = create_vk_service(config)
+            if service is None:
+                return 1
+
+        rows = exporter.iter_rows(index, collections, service)
+        chunks = exporter.iter_chunks(exporter.iter_lines(rows, fmt))
+        if output is None:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
+            return 0
+
+        temp_path = output.with_suffix(f"{output.suffix}.tmp")
+        with temp_path.open("wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        temp_path.replace(output)
+        logger.info("Exported VK library to %s", output)
+        return 0
+
+
+class WarmCommand(commands.Command):
+    """Fill the library index and caches before the first user arrives."""
+
+    help = "Sync the library and pre-fetch playlists, covers and tracks."
+
+    def __init__(self) -> None:
+        """Initialize the command arguments."""
+        super().__init__()
+        self.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Concurrent VK requests (default: [vkm] import_workers).",
+        )
+        self.add_argument(
+            "--download",
+            action="append",
+            default=[],
+            metavar="PLAYLIST",
+            help=(
+                "Also download the tracks of a playlist, by URI or "
+                "<owner_id>_<playlist_id>. Can be repeated."
+            ),
+        )
+        self.add_argument(
+            "--no-covers",
+            action="store_true",
+            help="Do not download playlist covers.",
+        )
+
+    def run(self, args: argparse.Namespace, config: dict[str, Any]) -> int:
+        """Run the warm-up.
+
+        Args:
+            args: Parsed command line arguments.
+            config: The full Mopidy configuration.
+
+        Returns:
+            The process exit code.
+        """
+        vkm_config = config["vkm"]
+        cache_path = vkm_config.get("cache_path")
+        if not cache_path:
+            logger.error("[vkm] cache_path is not set; there is nothing to warm")
+            return 1
+        cache_dir = pathlib.Path(cache_path)
+
+        service = create_vk_service(config)
+        if service is None:
+            return 1
+        user_id = CredentialsManager(
+            vkm_config["sensitive_cache_path"]
+        ).get_client_user_id()
+        response_cache = None
+        if vkm_config.get("response_cache"):
+            # Written through, so Mopidy starts with these responses cached
+            response_cache = ResponseCache(cache_dir / "responses")
+            service = CachingService(
+                service, response_cache, user_id or "", refresh=True
+            )
+
+        # Downloads yield to the running Mopidy's playback as they would in it
+        shaper = TrafficShaper(
+            ThroughputMonitor(),
+            (vkm_config.get("background_limit") or 0) * 1024,
+            lambda: _running_report(config).get("traffic"),
+        )
+        index = LibraryIndex(cache_dir / "library.json")
+        warmer = CacheWarmer(
+            index,
+            LibrarySyncScheduler(
+                index,
+                lambda: service,
+                lambda: user_id,
+                interval=0,
+                api_budget=vkm_config.get("sync_api_budget") or 1,
+                throttle=shaper.background,
+            ),
+            PlaylistSnapshots(index, lambda: service, cache_dir / "playlists.json"),
+            lambda: service,
+            cache_dir,
+            args.workers or vkm_config.get("import_workers") or 1,
+            _log_progress,
+            shaper,
+        )
+        try:
+            cycles = warmer.sync_library()
+            logger.info(
+                "Synced %d tracks and %d playlists in %d cycles",
+                len(index.get_items("my_music")),
+                len(index.get_items("playlists")),
+                cycles,
+            )
+            logger.info("Loaded %d playlists", warmer.resolve_playlists())
+            if not args.no_covers:
+                logger.info("Fetched %d playlist covers", warmer.fetch_covers())
+            if args.download:
+                logger.info(
+                    "%d tracks stored locally", warmer.download_playlists(args.download)
+                )
+        finally:
+            if response_cache is not None:
+                response_cache.shutdown()
+        return 0
+
+
+def _log_progress(step: str, done: int, total: int) -> None:
+    """Log warm-up progress about every 5%."""
+    if done % max(total // 20, 1) == 0 or done == total:
+        logger.info("Warming %s: %d/%d", step, done, total)
+
+
+class CacheCommand(commands.Command):
+    """Inspect and clean up ``cache_path`` and ``saved_path``."""
+
+    help = "Report cache usage, delete leftovers and shrink the cache."
+
+    def __init__(self) -> None:
+        """Initialize the command arguments."""
+        super().__init__()
+        self.add_argument(
+            "--workers",
+            type=int,
+            default=16,
+            help="Directories scanned in parallel (default: 16).",
+        )
+        self.add_argument(
+            "--clean",
+            action="store_true",
+            help="Delete stale leases and partial files.",
+        )
+        self.add_argument(
+            "--max-size",
+            type=int,
+            default=None,
+            metavar="MIB",
+            help="Evict least recently used tracks, responses and covers "
+            "until cache_path is at most this size.",
+        )
+        self.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop analysis results of missing track files and analyse "
+            "new and changed ones.",
+        )
+
+    def run(self, args: argparse.Namespace, config: dict[str, Any]) -> int:
+        """Run the maintenance.
+
+        Args:
+            args: Parsed command line arguments.
+            config: The full Mopidy configuration.
+
+        Returns:
+            The process exit code.
+        """
+        vkm_config = config["vkm"]
+        cache_root = (
+            pathlib.Path(vkm_config["cache_path"])
+            if vkm_config.get("cache_path")
+            else None
+        )
+        roots = [
+            root
+            for root in (
+                cache_root,
+                pathlib.Path(vkm_config["saved_path"])
+                if vkm_config.get("saved_path")
+                else None,
+            )
+            if root is not None
+        ]
+        if not roots:
+            logger.error("Neither [vkm] cache_path nor saved_path is set")
+            return 1
+
+        start = time.monotonic()
+        files = maintenance.scan_files(roots, args.workers)
+        logger.info("Scanned %d files in %.1f s", len(files), time.monotonic() - start)
+        out = sys.stdout
+        for category, totals in maintenance.summarize(files).items():
+            out.write(
+                f"{category:<12} {totals['files']:>8} files "
+                f"{totals['bytes'] / 2**20:>10.1f} MiB\n"
+            )
+        for cache in _running_report(config).get("caches", []):
+            hit_rate = cache["hit_rate"]
+            out.write(
+                f"{cache['name']:<12} {cache['entries']:>8} in memory, hit rate "
+                f"{'-' if hit_rate is None else f'{hit_rate:.0%}'}\n"
+            )
+
+        leftovers = maintenance.find_orphans(files) + maintenance.find_partials(files)
+        out.write(f"{len(leftovers)} orphaned or partial files\n")
+        deleted: set[pathlib.Path] = set()
+        if args.clean:
+            count, size = maintenance.delete_files(leftovers)
+            deleted.update(file.path for file in leftovers)
+            logger.info("Deleted %d leftover files (%d bytes)", count, size)
+
+        if args.max_size is not None and cache_root is not None:
+            remaining = [file for file in files if file.path not in deleted]
+            evicted = maintenance.select_evictions(
+                remaining, args.max_size * 2**20, cache_root
+            )
+            count, size = maintenance.delete_files(evicted)
+            deleted.update(file.path for file in evicted)
+            logger.info("Evicted %d files (%d bytes)", count, size)
+
+        if args.rebuild and cache_root is not None:
+            dropped, analysed = maintenance.rebuild_analysis(
+                cache_root / "analysis.json",
+                [file for file in files if file.path not in deleted],
+                vkm_config.get("analysis_workers") or 1,
+            )
+            logger.info(
+                "Dropped %d analysis results and analysed %d files", dropped, analysed
+            )
+        return 0
+
+
+def _running_report(config: dict[str, Any]) -> dict[str, Any]:
+    """Get the cache and traffic report of a running Mopidy, if there is one."""
+    base_url = get_stream_base_url(config)
+    if base_url is None:
+        return {}
+    try:
+        with urllib.request.urlopen(  # noqa: S310
+            f"{base_url}/vkm/debug/caches", timeout=2
+        ) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        logger.debug("Mopidy is not running; no live statistics")
+        return {}
@@ -0,0 +1,98 @@
+"""Concurrent handling of the backend actor's VK-bound provider calls."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import logging
+import queue
+from typing import Any
+
+from pykka.messages import ProxyCall
+
+logger = logging.getLogger(__name__)
+
+# Provider calls that may run outside the actor thread, by class. Playback
+# calls are not listed: core sends prepare_change and change_track without
+# waiting in between, so they must stay in the actor's order
+CALL_CLASSES = {
+    ("library", "search"): "search",
+    ("library", "browse"): "library",
+    ("library", "lookup"): "library",
+    ("library", "get_images"): "library",
+    ("library", "get_distinct"): "library",
+    ("library", "refresh"): "library",
+    ("playlists", "get_items"): "library",
+    ("playlists", "lookup"): "library",
+    ("playlists", "refresh"): "library",
+    # Radio refills may wait on VK for the next batch
+    ("radio", "on_track_started"): "library",
+}
+
+
+class DispatchingInbox(queue.Queue):
+    """Actor inbox handing VK-bound provider calls to per-class thread pools.
+
+    Pykka runs every message on the actor's one thread, so a slow search
+    would delay the next track's URL resolution for every client. Calls
+    listed in ``CALL_CLASSES`` run in a bounded pool per class instead and
+    answer the caller's future from there; everything else is queued for
+    the actor thread as usual.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the inbox; calls are queued until :meth:`configure`."""
+        super().__init__()
+        self.actor: Any = None
+        self._pools: dict[str, concurrent.futures.ThreadPoolExecutor] = {}
+
+    def configure(self, actor: object, limits: dict[str, int]) -> None:
+        """Create the pools.
+
+        Args:
+            actor: The actor the calls are made on.
+            limits: Concurrent calls per class; classes without a limit, or
+                with 0, run on the actor thread.
+        """
+        self.actor = actor
+        self._pools = {
+            name: concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=f"VKM{name.title()}"
+            )
+            for name, workers in limits.items()
+            if workers > 0
+        }
+
+    def put(self, item: Any, block: bool = True, timeout: float | None = None) -> None:  # noqa: ANN401, FBT001, FBT002
+        """Dispatch a message to its pool, or queue it for the actor thread."""
+        message = getattr(item, "message", None)
+        if isinstance(message, ProxyCall):
+            pool = self._pools.get(CALL_CLASSES.get(tuple(message.attr_path), ""))
+            if pool is not None:
+                try:
+                    pool.submit(self._run, item)
+                except RuntimeError:
+                    # Shut down: let the actor answer it as stopped
+                    pass
+                else:
+                    return
+        super().put(item, block, timeout)
+
+    def _run(self, envelope: Any) -> None:  # noqa: ANN401
+        message = envelope.message
+        try:
+            callee = functools.reduce(getattr, message.attr_path, self.actor)
+            result = callee(*message.args, **message.kwargs)
+        except Exception:
+            if envelope.reply_to is None:
+                logger.exception("VKM %s failed", ".".join(message.attr_path))
+            else:
+                envelope.reply_to.set_exception()
+            return
+        if envelope.reply_to is not None:
+            envelope.reply_to.set(result)
+
+    def shutdown(self) -> None:
+        """Stop the pools once the calls they have accepted are answered."""
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
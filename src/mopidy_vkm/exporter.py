@@ -0,0 +1,176 @@
+"""Streaming export of the VK library as NDJSON, CSV or M3U."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.sync import MY_MUSIC, PLAYLISTS, RECOMMENDATIONS
+from mopidy_vkm.translator import playlist_uri, song_to_dict, track_uri
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from mopidy_vkm.sync import LibraryIndex
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "csv", "m3u")
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "m3u": "audio/x-mpegurl; charset=utf-8",
+}
+COLLECTIONS = (MY_MUSIC, PLAYLISTS, RECOMMENDATIONS)
+CSV_FIELDS = ("collection", "playlist", "uri", "artist", "title", "duration")
+PLAYLIST_PAGE_SIZE = 100
+
+
+def _track_row(
+    collection: str, item: dict[str, Any], playlist: str = ""
+) -> dict[str, Any]:
+    return {
+        "collection": collection,
+        "playlist": playlist,
+        "uri": track_uri(item["owner_id"], item["track_id"]),
+        "artist": item.get("artist", ""),
+        "title": item.get("title", ""),
+        "duration": item.get("duration", 0),
+    }
+
+
+def iter_playlist_songs(
+    service: Any,  # noqa: ANN401
+    playlist: dict[str, Any],
+) -> Iterator[dict[str, Any]]:
+    """Page through the songs of a playlist one API call at a time.
+
+    Args:
+        service: The VK service.
+        playlist: The playlist dict from the library index.
+
+    Yields:
+        Song dicts.
+    """
+    offset = 0
+    while True:
+        songs = service.get_songs_by_playlist_id(
+            playlist["owner_id"],
+            int(playlist["playlist_id"]),
+            playlist.get("access_key", ""),
+            PLAYLIST_PAGE_SIZE,
+            offset,
+        )
+        for song in songs:
+            yield song_to_dict(song)
+        offset += len(songs)
+        if len(songs) < PLAYLIST_PAGE_SIZE:
+            return
+
+
+def iter_rows(
+    index: LibraryIndex,
+    collections: Iterable[str] = COLLECTIONS,
+    service: Any = None,  # noqa: ANN401
+) -> Iterator[dict[str, Any]]:
+    """Produce export rows straight from the library index.
+
+    Args:
+        index: The synced library index.
+        collections: Collections to export.
+        service: VK service used to page through playlist contents, or None
+            to export the playlists themselves only.
+
+    Yields:
+        Track rows (see ``CSV_FIELDS``). Playlists produce one row with a
+        playlist URI, followed by their tracks if a service is given.
+    """
+    for collection in collections:
+        for item in index.get_items(collection):
+            if collection != PLAYLISTS:
+                yield _track_row(collection, item)
+                continue
+            yield {
+                "collection": collection,
+                "playlist": item.get("title", ""),
+                "uri": playlist_uri(
+                    item["owner_id"], item["playlist_id"], item.get("access_key", "")
+                ),
+                "artist": "",
+                "title": item.get("title", ""),
+                "duration": 0,
+            }
+            if service is None:
+                continue
+            try:
+                for song in iter_playlist_songs(service, item):
+                    yield _track_row(collection, song, item.get("title", ""))
+            except Exception:
+                logger.exception("Failed to export VK playlist %s", item.get("id"))
+
+
+def _drain(buffer: io.StringIO) -> str:
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def iter_lines(rows: Iterable[dict[str, Any]], fmt: str) -> Iterator[str]:
+    """Serialize rows one line at a time.
+
+    Args:
+        rows: Export rows.
+        fmt: One of ``FORMATS``.
+
+    Yields:
+        Lines, each ending with a newline.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        yield _drain(buffer)
+        for row in rows:
+            writer.writerow(row)
+            yield _drain(buffer)
+    elif fmt == "m3u":
+        yield "#EXTM3U\n"
+        for row in rows:
+            name = " - ".join(filter(None, (row["artist"], row["title"])))
+            yield f"#EXTINF:{row['duration'] or -1},{name}\n{row['uri']}\n"
+    else:
+        msg = f"Unsupported export format: {fmt}"
+        raise ValueError(msg)
+
+
+def iter_chunks(lines: Iterable[str], size: int = 64 * 1024) -> Iterator[bytes]:
+    """Group lines into chunks of roughly ``size`` bytes.
+
+    Args:
+        lines: Serialized lines.
+        size: Target chunk size in bytes.
+
+    Yields:
+        UTF-8 encoded chunks.
+    """
+    chunk: list[bytes] = []
+    length = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield b"".join(chunk)
@@ -0,0 +1,116 @@
+"""VKM frontend keeping the radio queue topped up and the next track prerolled."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Any
+
+import pykka
+from mopidy import core
+from mopidy.core import PlaybackState
+
+if TYPE_CHECKING:
+    from mopidy.models import TlTrack
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the end of a track at which the next one is prerolled
+PREROLL_LEAD = 30
+
+
+class VKMFrontend(pykka.ThreadingActor, core.CoreListener):
+    """React to playback events on behalf of the VKM backend.
+
+    Backends cannot modify the tracklist or see what plays next, so the
+    radio state and preroll buffer live in the backend and this frontend
+    queues radio tracks and tells the backend which track to preroll.
+    """
+
+    def __init__(self, config: dict[str, Any], core: Any) -> None:  # noqa: ANN401
+        """Initialize the frontend."""
+        super().__init__()
+        self.config = config
+        self.core = core
+        self._preroll_timer: threading.Timer | None = None
+
+    def on_stop(self) -> None:
+        """Cancel a pending preroll."""
+        self._cancel_preroll()
+
+    def _get_backend(self) -> Any:  # noqa: ANN401
+        """Find the VKM backend actor proxy."""
+        for proxy in self.core.backends.get():
+            if "vkm" in proxy.uri_schemes.get():
+                return proxy
+        return None
+
+    def track_playback_started(self, tl_track: TlTrack) -> None:
+        """Schedule the next preroll and refill the radio queue.
+
+        Args:
+            tl_track: The track that started playing.
+        """
+        self._schedule_preroll(tl_track)
+        if not tl_track.track.uri.startswith("vkm:track:"):
+            return
+        backend = self._get_backend()
+        if backend is None:
+            return
+        index = self.core.tracklist.index(tl_track).get()
+        length = self.core.tracklist.get_length().get()
+        remaining = length - index - 1 if index is not None else 0
+        uris = backend.radio.on_track_started(tl_track.track.uri, remaining).get()
+        if uris:
+            logger.debug("Queueing %d VK radio tracks", len(uris))
+            self.core.tracklist.add(uris=uris)
+
+    def playback_state_changed(
+        self,
+        old_state: PlaybackState,  # noqa: ARG002
+        new_state: PlaybackState,
+    ) -> None:
+        """Drop the pending preroll when playback stops.
+
+        Background transfers yield bandwidth to playback while playing.
+
+        Args:
+            old_state: The previous state.
+            new_state: The current state.
+        """
+        if new_state == PlaybackState.STOPPED:
+            self._cancel_preroll()
+        backend = self._get_backend()
+        if backend is not None:
+            backend.set_playing(new_state == PlaybackState.PLAYING)
+
+    def _schedule_preroll(self, tl_track: TlTrack) -> None:
+        """Preroll the next track during the last part of this one."""
+        self._cancel_preroll()
+        if not self.config["vkm"].get("preroll_seconds"):
+            return
+        delay = max((tl_track.track.length or 0) / 1000 - PREROLL_LEAD, 0)
+        self._preroll_timer = threading.Timer(delay, self._preroll_next)
+        self._preroll_timer.daemon = True
+        self._preroll_timer.start()
+
+    def _cancel_preroll(self) -> None:
+        if self._preroll_timer is not None:
+            self._preroll_timer.cancel()
+            self._preroll_timer = None
+
+    def _preroll_next(self) -> None:
+        """Ask the backend to buffer the track that plays after this one."""
+        # Looked up now rather than at track start: the queue may have changed
+        current = self.core.playback.get_current_tl_track().get()
+        if current is None:
+            return
+        next_tl_track = self.core.tracklist.eot_track(current).get()
+        if next_tl_track is None or not next_tl_track.track.uri.startswith(
+            "vkm:track:"
+        ):
+            return
+        backend = self._get_backend()
+        if backend is not None:
+            logger.debug("Prerolling %s", next_tl_track.track.uri)
+            backend.preroll_next(next_tl_track.track.uri)
@@ -0,0 +1,553 @@
+"""Bulk import of external playlists matched against VK search."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import csv
+import difflib
+import io
+import json
+import logging
+import pathlib
+import re
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.shared import SharedJsonFile
+from mopidy_vkm.translator import song_to_dict, track_uri
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+SEARCH_COUNT = 10
+DURATION_TOLERANCE = 5
+MIN_SCORE = 0.6
+# Finished jobs kept for polling; older ones are dropped as new ones start
+MAX_FINISHED_JOBS = 20
+# Seconds a miss is trusted before the entry is searched again, as VK keeps
+# adding songs
+MISS_TTL = 7 * 24 * 60 * 60
+
+FORMATS = ("m3u", "m3u8", "csv", "json")
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("ё", "е")  # noqa: RUF001
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+
+def _entry(artist: object, title: object, duration: object) -> dict[str, Any] | None:
+    artist = str(artist or "").strip()
+    title = str(title or "").strip()
+    if not title:
+        return None
+    try:
+        seconds = int(float(duration)) if duration not in (None, "") else 0  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        seconds = 0
+    # Some exports use milliseconds
+    if seconds > 24 * 60 * 60:
+        seconds //= 1000
+    return {"artist": artist, "title": title, "duration": max(seconds, 0)}
+
+
+def parse_m3u(text: str) -> list[dict[str, Any]]:
+    """Parse an extended M3U playlist.
+
+    Args:
+        text: The playlist content.
+
+    Returns:
+        Entries with ``artist``, ``title`` and ``duration`` keys.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("#EXTINF:"):
+            continue
+        duration, _, name = line[len("#EXTINF:") :].partition(",")
+        artist, separator, title = name.partition(" - ")
+        if not separator:
+            artist, title = "", name
+        entry = _entry(artist, title, duration.split()[0] if duration else 0)
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def parse_csv(text: str) -> list[dict[str, Any]]:
+    """Parse a CSV export with ``artist``, ``title`` and ``duration`` columns.
+
+    Column names are matched case-insensitively; common aliases such as
+    ``track name`` or ``artist name(s)`` are accepted.
+
+    Args:
+        text: The CSV content.
+
+    Returns:
+        Entries with ``artist``, ``title`` and ``duration`` keys.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    entries = []
+    for row in reader:
+        fields = {(key or "").strip().lower(): value for key, value in row.items()}
+        entry = _entry(
+            fields.get("artist") or fields.get("artist name(s)") or "",
+            fields.get("title") or fields.get("track name") or fields.get("name"),
+            fields.get("duration") or fields.get("duration (ms)") or 0,
+        )
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def parse_json(text: str) -> list[dict[str, Any]]:
+    """Parse a JSON export: a list of objects, or ``{"tracks": [...]}``.
+
+    Args:
+        text: The JSON content.
+
+    Returns:
+        Entries with ``artist``, ``title`` and ``duration`` keys.
+    """
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("tracks") or data.get("items") or []
+    entries = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        entry = _entry(
+            item.get("artist"),
+            item.get("title") or item.get("name"),
+            item.get("duration"),
+        )
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def parse_playlist(text: str, fmt: str) -> list[dict[str, Any]]:
+    """Parse a playlist export in the given format.
+
+    Args:
+        text: The file content.
+        fmt: One of :data:`FORMATS`.
+
+    Returns:
+        Entries with ``artist``, ``title`` and ``duration`` keys.
+
+    Raises:
+        ValueError: If the format is unknown or the content is invalid.
+    """
+    parsers = {
+        "m3u": parse_m3u,
+        "m3u8": parse_m3u,
+        "csv": parse_csv,
+        "json": parse_json,
+    }
+    parser = parsers.get(fmt.lower())
+    if parser is None:
+        msg = f"Unsupported playlist format: {fmt}"
+        raise ValueError(msg)
+    return parser(text)
+
+
+def get_playlists_dir(config: dict[str, Any]) -> pathlib.Path | None:
+    """Get the directory imported playlists are written to.
+
+    Imported playlists are plain M3U files of ``vkm:`` URIs, so they are
+    written to the Mopidy-M3U playlists directory when that extension is
+    enabled, and to ``<cache_path>/playlists`` otherwise.
+
+    Args:
+        config: The full Mopidy configuration.
+
+    Returns:
+        The playlists directory or None if none can be determined.
+    """
+    m3u_config = config.get("m3u") or {}
+    if m3u_config.get("enabled"):
+        if m3u_config.get("playlists_dir"):
+            return pathlib.Path(m3u_config["playlists_dir"])
+        data_dir = (config.get("core") or {}).get("data_dir")
+        if data_dir:
+            return pathlib.Path(data_dir) / "m3u"
+    cache_path = config["vkm"].get("cache_path")
+    return pathlib.Path(cache_path) / "playlists" if cache_path else None
+
+
+def match_key(entry: dict[str, Any]) -> str:
+    """Build the match cache key for an entry.
+
+    Args:
+        entry: The import entry.
+
+    Returns:
+        A normalized ``artist|title|duration`` key.
+    """
+    artist = _normalize(entry["artist"])
+    title = _normalize(entry["title"])
+    return f"{artist}|{title}|{entry['duration']}"
+
+
+def score_candidate(entry: dict[str, Any], candidate: dict[str, Any]) -> float:
+    """Score how well a VK song matches an import entry.
+
+    Args:
+        entry: The import entry.
+        candidate: A song dict from VK search.
+
+    Returns:
+        A score between 0 and 1.
+    """
+    title = difflib.SequenceMatcher(
+        None, _normalize(entry["title"]), _normalize(candidate["title"])
+    ).ratio()
+    if entry["artist"]:
+        artist = difflib.SequenceMatcher(
+            None, _normalize(entry["artist"]), _normalize(candidate["artist"])
+        ).ratio()
+    else:
+        artist = 1.0
+    score = 0.6 * title + 0.4 * artist
+    if entry["duration"] and candidate["duration"]:
+        delta = abs(entry["duration"] - candidate["duration"])
+        if delta > DURATION_TOLERANCE:
+            score *= max(0.5, 1 - delta / 60)
+    return score
+
+
+class MatchCache:
+    """Persistent cache of import entry -> VK song matches.
+
+    Misses are stored as ``{"missed_at": <timestamp>}`` and expire after
+    ``miss_ttl`` seconds; matches are kept.
+    """
+
+    def __init__(
+        self, path: str | pathlib.Path | None = None, miss_ttl: float = MISS_TTL
+    ) -> None:
+        """Initialize the match cache.
+
+        Args:
+            path: Path to the JSON file, or None to keep matches in memory.
+            miss_ttl: Seconds a cached miss is valid.
+        """
+        self.path = pathlib.Path(path) if path else None
+        self.miss_ttl = miss_ttl
+        self._file = SharedJsonFile(self.path) if self.path else None
+        self._matches: dict[str, dict[str, Any]] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """Load cached matches, including other instances' new ones."""
+        if self._file is None or not self._file.changed():
+            return
+        try:
+            matches = self._file.load()
+        except (OSError, ValueError):
+            logger.exception("Failed to load import match cache")
+            return
+        with self._lock:
+            for key, song in matches.items():
+                if key not in self._dirty:
+                    self._matches[key] = song
+
+    def save(self) -> None:
+        """Merge the matches found by this instance into the file."""
+        if self._file is None:
+            return
+        with self._lock:
+            updates = {key: self._matches[key] for key in self._dirty}
+            self._dirty.clear()
+        try:
+            matches = self._file.merge(updates)
+        except OSError:
+            logger.exception("Failed to save import match cache")
+            with self._lock:
+                self._dirty.update(updates)
+            return
+        with self._lock:
+            for key, song in matches.items():
+                self._matches.setdefault(key, song)
+
+    def get(self, key: str) -> tuple[bool, dict[str, Any] | None]:
+        """Get a cached match.
+
+        Args:
+            key: The match key.
+
+        Returns:
+            A tuple of (found, song dict). A found entry with a None song is
+            a cached miss. Expired misses are not found.
+        """
+        with self._lock:
+            song = self._matches.get(key)
+        if song is None:
+            # Unknown, or a miss stored before misses had a timestamp
+            return False, None
+        if "missed_at" in song:
+            if time.time() - song["missed_at"] < self.miss_ttl:
+                return True, None
+            return False, None
+        return True, song
+
+    def set(self, key: str, song: dict[str, Any] | None) -> None:
+        """Store a match (or a miss).
+
+        Args:
+            key: The match key.
+            song: The matched song dict or None.
+        """
+        with self._lock:
+            self._matches[key] = song or {"missed_at": time.time()}
+            self._dirty.add(key)
+
+
+class ImportJob:
+    """State of a running or finished playlist import."""
+
+    def __init__(self, name: str, entries: list[dict[str, Any]]) -> None:
+        """Initialize the job.
+
+        Args:
+            name: Name of the resulting playlist.
+            entries: Entries to match.
+        """
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.entries = entries
+        self.results: list[dict[str, Any] | None] = [None] * len(entries)
+        self.done = 0
+        self.cached = 0
+        self.status = "processing"
+        self.error: str | None = None
+        self.playlist_path: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get a JSON-serialisable summary of the job.
+
+        Returns:
+            The job summary.
+        """
+        matched = [track_uri(r["owner_id"], r["track_id"]) for r in self.results if r]
+        result: dict[str, Any] = {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "total": len(self.entries),
+            "done": self.done,
+            "cached": self.cached,
+            "matched": len(matched),
+            "unmatched": [
+                entry
+                for entry, match in zip(self.entries, self.results, strict=True)
+                if match is None
+            ]
+            if self.status == "success"
+            else [],
+        }
+        if self.status == "success":
+            result["uris"] = matched
+            result["playlist_path"] = self.playlist_path
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def _reserve_path(directory: pathlib.Path, name: str) -> pathlib.Path:
+    """Create an empty ``.m3u8`` file under a name that is not taken yet."""
+    number = 1
+    while True:
+        suffix = f" ({number})" if number > 1 else ""
+        path = directory / f"{name}{suffix}.m3u8"
+        try:
+            path.open("x").close()
+        except FileExistsError:
+            number += 1
+        else:
+            return path
+
+
+class PlaylistImporter:
+    """Match playlist entries against VK search with a bounded worker pool."""
+
+    def __init__(
+        self,
+        get_service: Callable[[], Any],
+        match_cache: MatchCache,
+        playlists_dir: str | pathlib.Path | None,
+        workers: int,
+    ) -> None:
+        """Initialize the importer.
+
+        Args:
+            get_service: Callable returning the current VK service or None.
+            match_cache: The persistent match cache.
+            playlists_dir: Directory imported M3U playlists are written to.
+            workers: Maximum number of concurrent VK searches.
+        """
+        self.get_service = get_service
+        self.match_cache = match_cache
+        self.playlists_dir = pathlib.Path(playlists_dir) if playlists_dir else None
+        self.workers = max(workers, 1)
+        self.jobs: dict[str, ImportJob] = {}
+        self._lock = threading.Lock()
+
+    def match(self, service: Any, entry: dict[str, Any]) -> dict[str, Any] | None:  # noqa: ANN401
+        """Find the best VK song for an entry.
+
+        Args:
+            service: The VK service.
+            entry: The import entry.
+
+        Returns:
+            The best matching song dict or None.
+        """
+        query = f"{entry['artist']} {entry['title']}".strip()
+        candidates = [
+            song_to_dict(song)
+            for song in service.search_songs_by_text(query, SEARCH_COUNT)
+        ]
+        if not candidates:
+            return None
+        best = max(candidates, key=lambda song: score_candidate(entry, song))
+        if score_candidate(entry, best) < MIN_SCORE:
+            return None
+        return best
+
+    def run(
+        self,
+        job: ImportJob,
+        progress: Callable[[ImportJob], None] | None = None,
+    ) -> ImportJob:
+        """Match all entries of a job and write the resulting playlist.
+
+        Args:
+            job: The import job.
+            progress: Optional callback invoked after each matched entry.
+
+        Returns:
+            The finished job.
+        """
+        service = self.get_service()
+        if service is None:
+            job.status = "error"
+            job.error = "VK service not available"
+            return job
+
+        def work(position: int) -> None:
+            entry = job.entries[position]
+            key = match_key(entry)
+            found, song = self.match_cache.get(key)
+            if not found:
+                try:
+                    song = self.match(service, entry)
+                except Exception:
+                    logger.exception("Failed to match %s", key)
+                    song = None
+                else:
+                    self.match_cache.set(key, song)
+            job.results[position] = song
+            with self._lock:
+                job.done += 1
+                job.cached += int(found)
+            if progress:
+                progress(job)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="VKMImport"
+            ) as executor:
+                list(executor.map(work, range(len(job.entries))))
+            job.playlist_path = self.write_playlist(job)
+            job.status = "success"
+        except Exception as e:
+            logger.exception("Playlist import failed")
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            self.match_cache.save()
+        logger.info(
+            "Imported playlist %s: %d of %d tracks matched",
+            job.name,
+            sum(1 for r in job.results if r),
+            len(job.entries),
+        )
+        return job
+
+    def start(self, name: str, entries: list[dict[str, Any]]) -> ImportJob:
+        """Start an import in a background thread.
+
+        Args:
+            name: Name of the resulting playlist.
+            entries: Entries to match.
+
+        Only the last ``MAX_FINISHED_JOBS`` finished jobs are kept.
+
+        Returns:
+            The started job, to be polled with :meth:`get_job`.
+        """
+        job = ImportJob(name, entries)
+        with self._lock:
+            finished = [
+                job_id
+                for job_id, other in self.jobs.items()
+                if other.status != "processing"
+            ]
+            for job_id in finished[: max(len(finished) - MAX_FINISHED_JOBS + 1, 0)]:
+                del self.jobs[job_id]
+            self.jobs[job.id] = job
+        threading.Thread(
+            target=self.run, args=(job,), name="VKMImportJob", daemon=True
+        ).start()
+        return job
+
+    def get_job(self, job_id: str) -> ImportJob | None:
+        """Get an import job by ID.
+
+        Args:
+            job_id: The job ID.
+
+        Returns:
+            The job or None if unknown.
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def write_playlist(self, job: ImportJob) -> str | None:
+        """Write the matched tracks as an extended M3U playlist of VK URIs.
+
+        An existing playlist of the same name is kept and the new one gets
+        a numbered name.
+
+        Args:
+            job: The finished job.
+
+        Returns:
+            The path of the written playlist, or None if no directory is
+            configured.
+        """
+        if not self.playlists_dir:
+            return None
+        safe_name = re.sub(r"[^\w\- ]+", "_", job.name).strip() or job.id
+        lines = ["#EXTM3U"]
+        for song in job.results:
+            if song is None:
+                continue
+            lines.append(
+                f"#EXTINF:{song['duration']},{song['artist']} - {song['title']}"
+            )
+            lines.append(track_uri(song["owner_id"], song["track_id"]))
+        self.playlists_dir.mkdir(parents=True, exist_ok=True)
+        path = _reserve_path(self.playlists_dir, safe_name)
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        temp_path.replace(path)
+        return str(path)
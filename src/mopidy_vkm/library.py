@@ -0,0 +1,283 @@
+"""VKM library provider."""
+
+from __future__ import annotations
+
+import logging
+import urllib.parse
+from typing import TYPE_CHECKING, Any
+
+from mopidy import backend
+from mopidy.models import Image, Ref, SearchResult
+
+from mopidy_vkm.radio import parse_radio_uri
+from mopidy_vkm.ranking import collapse_results
+from mopidy_vkm.resilience import CircuitOpenError
+from mopidy_vkm.search import normalize_query, normalize_text
+from mopidy_vkm.sync import MY_MUSIC, PLAYLISTS, RECOMMENDATIONS
+from mopidy_vkm.translator import (
+    MY_MUSIC_URI,
+    PLAYLISTS_URI,
+    RECOMMENDATIONS_URI,
+    ROOT_URI,
+    parse_playlist_uri,
+    parse_track_uri,
+    playlist_ref_from_dict,
+    song_to_dict,
+    track_from_dict,
+    track_ref_from_dict,
+)
+
+if TYPE_CHECKING:
+    from mopidy.models import Track
+
+    from mopidy_vkm.backend import VKMBackend
+
+logger = logging.getLogger(__name__)
+
+SEARCH_COUNT = 50
+SEARCH_FIELDS = ("any", "artist", "albumartist", "track_name", "album")
+
+_DIRECTORIES = {
+    MY_MUSIC_URI: (MY_MUSIC, "My Music"),
+    PLAYLISTS_URI: (PLAYLISTS, "Playlists"),
+    RECOMMENDATIONS_URI: (RECOMMENDATIONS, "Recommendations"),
+}
+
+
+class VKMLibraryProvider(backend.LibraryProvider):
+    """Library provider backed by the incrementally synced library index."""
+
+    root_directory = Ref.directory(uri=ROOT_URI, name="VK Music")
+
+    backend: VKMBackend
+
+    def browse(self, uri: str) -> list[Ref]:
+        """Browse the VK library.
+
+        Args:
+            uri: The directory or playlist URI.
+
+        Returns:
+            The refs contained in the URI.
+        """
+        if uri == ROOT_URI:
+            return [
+                Ref.directory(uri=directory_uri, name=name)
+                for directory_uri, (_, name) in _DIRECTORIES.items()
+            ]
+
+        if uri in _DIRECTORIES:
+            collection = _DIRECTORIES[uri][0]
+            self._ensure_synced()
+            items = self.backend.library_index.get_items(collection)
+            if collection == PLAYLISTS:
+                return [playlist_ref_from_dict(item) for item in items]
+            return [track_ref_from_dict(item) for item in items]
+
+        if parse_playlist_uri(uri):
+            return [track_ref_from_dict(item) for item in self._playlist_items(uri)]
+
+        logger.debug("Unknown browse URI: %s", uri)
+        return []
+
+    def lookup(self, uri: str) -> list[Track]:
+        """Lookup the tracks for a URI.
+
+        Args:
+            uri: A track, playlist, directory or radio URI.
+
+        Returns:
+            The tracks found for the URI. A radio URI starts the station
+            and returns its first batch.
+        """
+        if parse_radio_uri(uri):
+            items = self.backend.radio.start(uri)
+            self.backend.track_store.add(items)
+            return [self._track(item) for item in items]
+
+        audio_id = parse_track_uri(uri)
+        if audio_id:
+            # Tracks restored from the tracklist are mostly answered from
+            # the index or the track store, without calling VK
+            item = self.backend.library_index.find_track(
+                audio_id
+            ) or self.backend.track_store.get(audio_id)
+            if item is None:
+                item = self._fetch_track(audio_id)
+                if item is not None:
+                    self.backend.track_store.add([item])
+            return [self._track(item)] if item else []
+
+        if parse_playlist_uri(uri):
+            items = self._playlist_items(uri)
+            self.backend.track_store.add(items)
+            return [self._track(item) for item in items]
+
+        if uri in _DIRECTORIES and uri != PLAYLISTS_URI:
+            self._ensure_synced()
+            return [
+                self._track(item)
+                for item in self.backend.library_index.get_items(_DIRECTORIES[uri][0])
+            ]
+
+        return []
+
+    def search(
+        self,
+        query: dict[str, list[str]],
+        uris: list[str] | None = None,  # noqa: ARG002
+        exact: bool = False,  # noqa: FBT001, FBT002
+    ) -> SearchResult | None:
+        """Search VK for tracks, serving repeated queries from the cache.
+
+        Args:
+            query: The Mopidy search query (field -> values).
+            uris: Ignored, VK search is global.
+            exact: Whether to keep only exact artist/title matches.
+
+        Returns:
+            The search result or None if the query is not supported.
+        """
+        text = _query_text(query)
+        if not text:
+            return None
+
+        key = normalize_query(query, exact=exact)
+        items = self.backend.search_cache.get(key)
+        if items is None:
+            service = self.backend.get_vk_service()
+            if service is None:
+                return None
+            try:
+                songs = service.search_songs_by_text(text, SEARCH_COUNT)
+            except CircuitOpenError as e:
+                # Answer from expired results rather than not at all
+                items = self.backend.search_cache.get(key, allow_stale=True)
+                if items is None:
+                    logger.warning("VK search for %r skipped: %s", text, e)
+                    return None
+            except Exception:
+                logger.exception("VK search failed for %r", text)
+                return None
+            else:
+                items = [song_to_dict(song) for song in songs]
+                if exact:
+                    items = [item for item in items if _matches_exactly(item, query)]
+                # Near-identical uploads collapse into their best copy
+                items = collapse_results(
+                    items,
+                    text,
+                    lambda audio_id: (
+                        self.backend.library_index.find_track(audio_id) is not None
+                    ),
+                )
+                self.backend.search_cache.set(key, items, "" if exact else text)
+
+        self.backend.track_store.add(items)
+        return SearchResult(
+            uri=f"vkm:search:{urllib.parse.quote(text)}",
+            tracks=[self._track(item) for item in items],
+        )
+
+    def get_images(self, uris: list[str]) -> dict[str, list[Image]]:
+        """Get the cover images of playlists.
+
+        VK tracks carry no artwork, so only playlist URIs resolve. Covers
+        downloaded by ``mopidy vkm warm`` are served by Mopidy's HTTP server
+        instead of VK.
+
+        Args:
+            uris: The URIs to look up.
+
+        Returns:
+            The images by URI, omitting URIs without images.
+        """
+        photos = {
+            item["id"]: item.get("photo")
+            for item in self.backend.library_index.get_items(PLAYLISTS)
+        }
+        covers = self.backend.covers_dir
+        base_url = self.backend.stream_base_url
+        images = {}
+        for uri in uris:
+            parsed = parse_playlist_uri(uri)
+            playlist_id = f"{parsed[0]}_{parsed[1]}" if parsed else None
+            photo = photos.get(playlist_id) if playlist_id else None
+            if not photo:
+                continue
+            if covers and base_url and (covers / f"{playlist_id}.jpg").exists():
+                photo = f"{base_url}/vkm/covers/{playlist_id}.jpg"
+            images[uri] = [Image(uri=photo)]
+        return images
+
+    def refresh(self, uri: str | None = None) -> None:
+        """Refresh the library index incrementally.
+
+        Args:
+            uri: Ignored, the whole library is refreshed.
+        """
+        logger.info("Refreshing VK library%s", f" ({uri})" if uri else "")
+        self.backend.sync_scheduler.sync_once()
+
+    def _track(self, item: dict[str, Any]) -> Track:
+        """Build a track, with exact length and bitrate if analysed."""
+        audio_id = f"{item['owner_id']}_{item['track_id']}"
+        return track_from_dict(item, self.backend.audio_analyzer.get(audio_id))
+
+    def _ensure_synced(self) -> None:
+        """Run an initial sync if the index has never been populated."""
+        if self.backend.library_index.is_empty():
+            self.backend.sync_scheduler.sync_once()
+
+    def _fetch_track(self, audio_id: str) -> dict[str, Any] | None:
+        """Fetch a single track that is not in the index from VK."""
+        service = self.backend.get_vk_service()
+        if service is None:
+            return None
+        try:
+            songs = service.get_songs_by_id([audio_id])
+        except Exception:
+            logger.exception("Failed to look up VK track %s", audio_id)
+            return None
+        return song_to_dict(songs[0]) if songs else None
+
+    def _playlist_items(self, uri: str) -> list[dict[str, Any]]:
+        """Get all tracks of a VK playlist from its snapshot."""
+        return self.backend.playlist_snapshots.get_tracks(uri) or []
+
+
+def _query_text(query: dict[str, list[str]]) -> str:
+    """Join the searchable fields of a query into VK search text."""
+    values = []
+    for field in SEARCH_FIELDS:
+        field_values = query.get(field) or []
+        if isinstance(field_values, str):
+            field_values = [field_values]
+        values.extend(field_values)
+    return " ".join(v.strip() for v in values if v.strip())
+
+
+def _matches_exactly(item: dict[str, Any], query: dict[str, list[str]]) -> bool:
+    """Check a song dict against the fields of an exact query.
+
+    VK's song dicts have no album, so an album criterion is only checked
+    against songs that do; for the others it already narrowed the VK
+    search text.
+    """
+    fields = {
+        "artist": [item["artist"]],
+        "albumartist": [item["artist"]],
+        "track_name": [item["title"]],
+        "any": [item["artist"], item["title"]],
+    }
+    if item.get("album"):
+        fields["album"] = [item["album"]]
+        fields["any"].append(item["album"])
+    for field, field_values in query.items():
+        if field == "album" and field not in fields:
+            continue
+        candidates = [normalize_text(value) for value in fields.get(field, [])]
+        values = [field_values] if isinstance(field_values, str) else field_values
+        if any(normalize_text(value) not in candidates for value in values):
+            return False
+    return True
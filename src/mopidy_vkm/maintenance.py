@@ -0,0 +1,335 @@
+"""Inspection and garbage collection of ``cache_path`` and ``saved_path``."""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm import analysis
+from mopidy_vkm.shared import LEASE_SUFFIX, LOCK_SUFFIX, SharedJsonFile
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from mopidy_vkm.shared import Lease
+
+logger = logging.getLogger(__name__)
+
+# Temporary files younger than this may still be written to
+PARTIAL_MIN_AGE = 60 * 60
+# Categories eviction may delete from; everything else is state or the
+# user's own saved tracks
+EVICTABLE = ("tracks", "responses", "covers")
+SUFFIX_CATEGORIES = (
+    (".tmp", "partial"),
+    (LOCK_SUFFIX, "locks"),
+    (LEASE_SUFFIX, "leases"),
+    (".mp3", "tracks"),
+)
+INDEX_FILES = frozenset(
+    {
+        "library.json",
+        "analysis.json",
+        "playlists.json",
+        "import_matches.json",
+        "track_metadata.json",
+    }
+)
+
+
+class CacheFile:
+    """A file found by the scan, with the stat fields maintenance needs."""
+
+    __slots__ = ("atime", "category", "mtime", "mtime_ns", "path", "size")
+
+    def __init__(self, path: pathlib.Path, stat: os.stat_result, category: str) -> None:
+        """Initialize the entry.
+
+        Args:
+            path: The file.
+            stat: Its stat result.
+            category: What the file is, see :func:`categorize`.
+        """
+        self.path = path
+        self.size = stat.st_size
+        self.atime = stat.st_atime
+        self.mtime = stat.st_mtime
+        self.mtime_ns = stat.st_mtime_ns
+        self.category = category
+
+    @property
+    def last_used(self) -> float:
+        """Last access, or modification where atime is not maintained."""
+        return max(self.atime, self.mtime)
+
+
+def categorize(name: str, top: str) -> str:
+    """Classify a file of the cache directories.
+
+    Args:
+        name: The file name.
+        top: Name of the first directory below the scanned root, or "" for
+            files directly in it.
+
+    Returns:
+        One of ``tracks``, ``responses``, ``covers``,
+        ``indexes``, ``locks``, ``leases``, ``partial`` or ``other``.
+    """
+    for suffix, category in SUFFIX_CATEGORIES:
+        if name.endswith(suffix):
+            return category
+    if top == "responses" and name.endswith(".cache"):
+        return "responses"
+    if top == "covers":
+        return "covers"
+    return "indexes" if not top and name in INDEX_FILES else "other"
+
+
+def scan_files(roots: Iterable[pathlib.Path], workers: int = 8) -> list[CacheFile]:
+    """List the files below some directories, one directory per task.
+
+    ``stat`` calls dominate on large or network file systems and release the
+    GIL, so a thread pool over directories is much faster than ``os.walk``.
+
+    Args:
+        roots: The directories.
+        workers: Concurrent directory scans.
+
+    Returns:
+        The files found.
+    """
+    files: list[CacheFile] = []
+    lock = threading.Lock()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(workers, 1), thread_name_prefix="VKMCacheScan"
+    ) as executor:
+
+        def scan(directory: pathlib.Path, top: str) -> list[tuple[pathlib.Path, str]]:
+            found = []
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(
+                                (pathlib.Path(entry.path), top or entry.name)
+                            )
+                        elif entry.is_file(follow_symlinks=False):
+                            found.append(
+                                CacheFile(
+                                    pathlib.Path(entry.path),
+                                    entry.stat(follow_symlinks=False),
+                                    categorize(entry.name, top),
+                                )
+                            )
+            except OSError as e:
+                logger.warning("Cannot scan %s: %s", directory, e)
+            with lock:
+                files.extend(found)
+            return subdirs
+
+        pending = {executor.submit(scan, root, "") for root in roots if root.is_dir()}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                pending.update(
+                    executor.submit(scan, directory, top)
+                    for directory, top in future.result()
+                )
+    return files
+
+
+def summarize(files: Iterable[CacheFile]) -> dict[str, dict[str, int]]:
+    """Total the files per category.
+
+    Args:
+        files: Scanned files.
+
+    Returns:
+        ``files`` and ``bytes`` per category.
+    """
+    totals: dict[str, dict[str, int]] = collections.defaultdict(
+        lambda: {"files": 0, "bytes": 0}
+    )
+    for file in files:
+        totals[file.category]["files"] += 1
+        totals[file.category]["bytes"] += file.size
+    return dict(sorted(totals.items()))
+
+
+def find_orphans(files: list[CacheFile], now: float | None = None) -> list[CacheFile]:
+    """Find files whose owner is gone: leases that expired over an hour ago.
+
+    Args:
+        files: Scanned files.
+        now: Current time, for tests.
+
+    Returns:
+        The orphaned files.
+    """
+    now = time.time() if now is None else now
+    return [
+        file
+        for file in files
+        if file.category == "leases"
+        and _lease_expired(file.path, now - PARTIAL_MIN_AGE)
+    ]
+
+
+def _lease_expired(path: pathlib.Path, now: float) -> bool:
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f).get("expires", 0) < now
+    except (OSError, ValueError, AttributeError):
+        return True
+
+
+def find_partials(
+    files: Iterable[CacheFile],
+    min_age: float = PARTIAL_MIN_AGE,
+    now: float | None = None,
+) -> list[CacheFile]:
+    """Find temporary files left behind by interrupted writes.
+
+    Args:
+        files: Scanned files.
+        min_age: Seconds since the last write before a file counts as
+            abandoned.
+        now: Current time, for tests.
+
+    Returns:
+        The abandoned temporary files.
+    """
+    now = time.time() if now is None else now
+    return [
+        file
+        for file in files
+        if file.category == "partial" and now - file.mtime > min_age
+    ]
+
+
+def select_evictions(
+    files: Iterable[CacheFile], max_size: int, cache_root: pathlib.Path
+) -> list[CacheFile]:
+    """Choose the least recently used cache files to bring the size down.
+
+    Only downloaded tracks, cached responses and covers under ``cache_root``
+    are considered.
+
+    Args:
+        files: Scanned files.
+        max_size: Target total size of ``cache_root`` in bytes.
+        cache_root: The ``cache_path`` directory.
+
+    Returns:
+        The files to delete, oldest first.
+    """
+    cached = [file for file in files if file.path.is_relative_to(cache_root)]
+    excess = sum(file.size for file in cached) - max_size
+    if excess <= 0:
+        return []
+    candidates = sorted(
+        (file for file in cached if file.category in EVICTABLE),
+        key=lambda file: file.last_used,
+    )
+    selected = []
+    for file in candidates:
+        if excess <= 0:
+            break
+        selected.append(file)
+        excess -= file.size
+    return selected
+
+
+def delete_files(files: Iterable[CacheFile]) -> tuple[int, int]:
+    """Delete files, skipping ones that vanished meanwhile.
+
+    Args:
+        files: The files.
+
+    Returns:
+        The number of files and bytes deleted.
+    """
+    count = size = 0
+    for file in files:
+        try:
+            file.path.unlink()
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning("Cannot delete %s: %s", file.path, e)
+            continue
+        count += 1
+        size += file.size
+    return count, size
+
+
+def rebuild_analysis(
+    path: pathlib.Path, files: Iterable[CacheFile], workers: int = 1
+) -> tuple[int, int]:
+    """Rebuild the analysis results from the scanned track files.
+
+    Results of files that no longer exist are dropped. New and changed
+    files, and files analysed by an older version, are analysed again in a
+    low-priority process pool. Files another instance is analysing are
+    left to it.
+
+    Args:
+        path: The ``analysis.json`` file.
+        files: Scanned files of all track directories.
+        workers: Worker processes.
+
+    Returns:
+        The number of results dropped and of files analysed.
+    """
+    tracks = {file.path.stem: file for file in files if file.category == "tracks"}
+    store = SharedJsonFile(path)
+    try:
+        results: dict[str, Any] = store.load()
+    except (OSError, ValueError):
+        logger.exception("Failed to load audio analysis")
+        return 0, 0
+    dropped = [audio_id for audio_id in results if audio_id not in tracks]
+    outdated = [
+        file
+        for audio_id, file in tracks.items()
+        if not _analysis_current(results.get(audio_id), file)
+    ]
+    leases: dict[pathlib.Path, Lease] = {}
+    for file in outdated:
+        lease = analysis.get_lease(path, file.path.stem)
+        if lease.acquire():
+            leases[file.path] = lease
+    updates: dict[str, Any] = {}
+    try:
+        for track_path, result in analysis.analyse_files(leases, workers):
+            file = tracks[track_path.stem]
+            updates[track_path.stem] = {
+                **result,
+                "size": file.size,
+                "mtime_ns": file.mtime_ns,
+            }
+        if updates or dropped:
+            store.merge(updates, dropped)
+    finally:
+        for lease in leases.values():
+            lease.release()
+    return len(dropped), len(updates)
+
+
+def _analysis_current(result: dict[str, Any] | None, file: CacheFile) -> bool:
+    return (
+        result is not None
+        and result.get("version") == analysis.ANALYSIS_VERSION
+        and result.get("size") == file.size
+        and result.get("mtime_ns") == file.mtime_ns
+    )
@@ -0,0 +1,208 @@
+"""Shared memory budget for the in-process caches."""
+
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any) -> int:  # noqa: ANN401
+    """Estimate the memory held by plain data.
+
+    Follows lists, tuples and dicts; good enough to compare caches, not an
+    exact measurement.
+
+    Args:
+        value: Strings, numbers, bytes and containers of them.
+
+    Returns:
+        Approximate size in bytes.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, list | tuple):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
+
+class CacheMeter:
+    """Size and hit counters of one cache."""
+
+    def __init__(self, name: str, weight: float = 1.0) -> None:
+        """Initialize the meter.
+
+        Args:
+            name: Name the cache is reported under.
+            weight: Relative share of the budget the cache may keep before
+                it is evicted from.
+        """
+        self.name = name
+        self.weight = weight
+        self.size = 0
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.budget: MemoryBudget | None = None
+
+    def hit(self) -> None:
+        """Count a lookup answered by the cache."""
+        self.hits += 1
+
+    def miss(self) -> None:
+        """Count a lookup the cache could not answer."""
+        self.misses += 1
+
+    def grow(self, size: int, entries: int = 1) -> None:
+        """Account for an added entry.
+
+        Call :meth:`check` once the cache's own lock is released.
+
+        Args:
+            size: Estimated bytes added.
+            entries: Entries added.
+        """
+        self.size += size
+        self.entries += entries
+
+    def shrink(self, size: int, entries: int = 1) -> None:
+        """Account for a removed entry.
+
+        Args:
+            size: Estimated bytes released.
+            entries: Entries removed.
+        """
+        self.size = max(self.size - size, 0)
+        self.entries = max(self.entries - entries, 0)
+
+    def check(self) -> None:
+        """Let the budget evict if the caches are over the limit."""
+        if self.budget is not None:
+            self.budget.enforce()
+
+    def stats(self) -> dict[str, Any]:
+        """Report the counters.
+
+        Returns:
+            Size, entries, hits, misses, hit rate and evictions.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "size": self.size,
+            "entries": self.entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+class BudgetedCache(Protocol):
+    """What a cache provides to be registered with a budget."""
+
+    meter: CacheMeter
+
+    def evict(self, size: int) -> int:
+        """Drop the least valuable entries until ``size`` bytes are freed.
+
+        Returns:
+            The bytes actually freed.
+        """
+        ...
+
+
+class MemoryBudget:
+    """Keeps the registered caches within a combined memory limit.
+
+    Each cache may use its weighted share of the limit. When the total is
+    exceeded, caches above their share are evicted from first, in
+    proportion to how far above it they are.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Initialize the budget.
+
+        Args:
+            limit: Combined size in bytes, 0 for no limit.
+        """
+        self.limit = limit
+        self._caches: list[BudgetedCache] = []
+        self._lock = threading.Lock()
+
+    def register(self, cache: BudgetedCache) -> None:
+        """Put a cache under the budget.
+
+        Args:
+            cache: The cache.
+        """
+        cache.meter.budget = self
+        self._caches.append(cache)
+
+    @property
+    def used(self) -> int:
+        """Combined size of the registered caches."""
+        return sum(cache.meter.size for cache in self._caches)
+
+    def enforce(self) -> int:
+        """Evict until the caches fit the limit.
+
+        Returns:
+            The bytes freed.
+        """
+        if not self.limit or self.used <= self.limit:
+            return 0
+        # One eviction pass at a time; concurrent callers will find it done
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._evict(self.used - self.limit)
+        finally:
+            self._lock.release()
+
+    def _evict(self, excess: int) -> int:
+        total_weight = sum(cache.meter.weight for cache in self._caches) or 1
+        overshoots = [
+            (
+                cache.meter.size - self.limit * cache.meter.weight / total_weight,
+                cache,
+            )
+            for cache in self._caches
+        ]
+        over = [(amount, cache) for amount, cache in overshoots if amount > 0]
+        over_total = sum(amount for amount, _ in over)
+        freed = 0
+        for amount, cache in sorted(over, key=lambda item: -item[0]):
+            target = int(excess * amount / over_total) + 1
+            released = cache.evict(target)
+            cache.meter.evictions += 1 if released else 0
+            freed += released
+        # What a cache could not free, e.g. unsaved or unevictable data, is
+        # taken from the others above their share
+        for _, cache in sorted(over, key=lambda item: -item[0]):
+            if freed >= excess:
+                break
+            released = cache.evict(excess - freed)
+            cache.meter.evictions += 1 if released else 0
+            freed += released
+        if freed:
+            logger.debug("Evicted %d bytes from VKM caches", freed)
+        return freed
+
+    def report(self) -> dict[str, Any]:
+        """Report the budget and every cache.
+
+        Returns:
+            ``limit``, ``used`` and per-cache stats.
+        """
+        return {
+            "limit": self.limit,
+            "used": self.used,
+            "caches": [cache.meter.stats() for cache in self._caches],
+        }
@@ -0,0 +1,119 @@
+"""MPEG Layer III frame parsing for local track files."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import mmap
+    from collections.abc import Iterator
+
+MPEG1 = 3
+LAYER3 = 1
+MONO = 3
+BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = (44100, 48000, 32000)
+# MPEG version bits to the sample rate divisor (2.5, reserved, 2, 1)
+SAMPLE_RATE_DIVISORS = {0: 4, 2: 2, 3: 1}
+
+
+class FrameHeader:
+    """A decoded MPEG-1/2/2.5 Layer III frame header."""
+
+    def __init__(self, data: bytes | mmap.mmap, offset: int) -> None:
+        """Decode the header at ``offset``.
+
+        Args:
+            data: The file contents.
+            offset: Offset of the frame sync word.
+
+        Raises:
+            ValueError: If there is no valid Layer III header at the offset.
+        """
+        if offset + 4 > len(data):
+            msg = "Truncated frame header"
+            raise ValueError(msg)
+        b0, b1, b2, b3 = data[offset : offset + 4]
+        version = (b1 >> 3) & 3
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 3
+        if (
+            b0 != 0xFF  # noqa: PLR2004
+            or b1 & 0xE0 != 0xE0  # noqa: PLR2004
+            or version not in SAMPLE_RATE_DIVISORS
+            or (b1 >> 1) & 3 != LAYER3
+            or bitrate_index in {0, 15}
+            or rate_index == 3  # noqa: PLR2004
+        ):
+            msg = f"No Layer III frame at offset {offset}"
+            raise ValueError(msg)
+        mpeg1 = version == MPEG1
+        self.mpeg1 = mpeg1
+        self.mono = b3 >> 6 == MONO
+        self.sample_rate = SAMPLE_RATES[rate_index] // SAMPLE_RATE_DIVISORS[version]
+        self.samples = 1152 if mpeg1 else 576
+        bitrate = BITRATES[mpeg1][bitrate_index] * 1000
+        self.length = (144 if mpeg1 else 72) * bitrate // self.sample_rate + (
+            (b2 >> 1) & 1
+        )
+
+    @property
+    def side_info_size(self) -> int:
+        """Size of the side information following the header."""
+        if self.mpeg1:
+            return 17 if self.mono else 32
+        return 9 if self.mono else 17
+
+
+def audio_start(data: bytes | mmap.mmap) -> int:
+    """Offset of the first byte after an ID3v2 tag, if any."""
+    if len(data) >= 10 and data[:3] == b"ID3":  # noqa: PLR2004
+        size = 0
+        for byte in data[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def iter_frames(
+    data: bytes | mmap.mmap, start: int
+) -> Iterator[tuple[int, FrameHeader]]:
+    """Walk the frame headers of an MP3 stream.
+
+    Args:
+        data: The file contents.
+        start: Offset of the first frame.
+
+    Yields:
+        The offset and header of every frame, stopping at trailing ID3v1
+        or APE tags or anything else that is not a frame.
+    """
+    offset = start
+    while True:
+        try:
+            header = FrameHeader(data, offset)
+        except ValueError:
+            return
+        yield offset, header
+        offset += header.length
+
+
+def is_tag_frame(data: bytes | mmap.mmap, start: int, header: FrameHeader) -> bool:
+    """Check whether the first frame holds a Xing/Info or VBRI tag, not audio.
+
+    Args:
+        data: The file contents.
+        start: Offset of the first frame.
+        header: Its header.
+
+    Returns:
+        True if the frame is an encoder tag.
+    """
+    tag = start + 4 + header.side_info_size
+    return data[tag : tag + 4] in {b"Xing", b"Info"} or (
+        data[start + 36 : start + 40] == b"VBRI"
+    )
@@ -0,0 +1,431 @@
+"""VKM playback provider."""
+
+from __future__ import annotations
+
+import collections
+import logging
+import pathlib
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import TYPE_CHECKING, Any
+
+from mopidy import backend
+
+from mopidy_vkm.memory import CacheMeter, estimate_size
+from mopidy_vkm.translator import parse_track_uri
+
+if TYPE_CHECKING:
+    from mopidy_vkm.backend import VKMBackend
+    from mopidy_vkm.quality import ThroughputMonitor
+    from mopidy_vkm.shaping import TrafficShaper
+
+logger = logging.getLogger(__name__)
+
+# VK stream URLs are signed and expire; keep them well below their lifetime
+URL_TTL = 30 * 60
+
+# VK serves 320 kbps MP3; used to turn preroll seconds into bytes
+STREAM_BYTE_RATE = 320 * 1000 // 8
+PREROLL_TIMEOUT = 10
+PREROLL_CHUNK_SIZE = 16 * 1024
+# The next track and the one after a skip are enough to keep in memory
+PREROLL_ENTRIES = 2
+
+
+class UrlCache:
+    """Short-lived cache of resolved VK stream URLs by audio ID."""
+
+    def __init__(self, ttl: int = URL_TTL) -> None:
+        """Initialize the cache.
+
+        Args:
+            ttl: Seconds a resolved URL is reused.
+        """
+        self.ttl = ttl
+        self.meter = CacheMeter("urls")
+        self._urls: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, audio_id: str) -> str | None:
+        """Get a resolved URL.
+
+        Args:
+            audio_id: The VK audio ID.
+
+        Returns:
+            The URL or None if unknown or expired.
+        """
+        with self._lock:
+            entry = self._urls.get(audio_id)
+            if entry is None:
+                self.meter.miss()
+                return None
+            if time.monotonic() > entry[0]:
+                self._remove(audio_id)
+                self.meter.miss()
+                return None
+            self.meter.hit()
+            return entry[1]
+
+    def set(self, audio_id: str, url: str) -> None:
+        """Store a resolved URL.
+
+        Args:
+            audio_id: The VK audio ID.
+            url: The stream URL.
+        """
+        if not url:
+            return
+        with self._lock:
+            if audio_id in self._urls:
+                self._remove(audio_id)
+            # Reinserted so that iteration order is oldest first
+            self._urls[audio_id] = (time.monotonic() + self.ttl, url)
+            self.meter.grow(estimate_size((audio_id, url)))
+        self.meter.check()
+
+    def _remove(self, audio_id: str) -> None:
+        """Drop an entry (lock held)."""
+        _, url = self._urls.pop(audio_id)
+        self.meter.shrink(estimate_size((audio_id, url)))
+
+    def evict(self, size: int) -> int:
+        """Drop the oldest URLs.
+
+        Args:
+            size: Bytes to free.
+
+        Returns:
+            The bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            while self._urls and freed < size:
+                audio_id = next(iter(self._urls))
+                freed += estimate_size((audio_id, self._urls[audio_id][1]))
+                self._remove(audio_id)
+        return freed
+
+    def add_songs(self, songs: list[object]) -> None:
+        """Store the URLs that come with vkpymusic ``Song`` objects.
+
+        Args:
+            songs: Songs as returned by the VK service.
+        """
+        for song in songs:
+            url = getattr(song, "url", "")
+            if url:
+                self.set(f"{song.owner_id}_{song.track_id}", url)  # type: ignore[attr-defined]
+
+
+class PrerolledTrack:
+    """The first bytes of a track, buffered before it starts playing."""
+
+    def __init__(
+        self, url: str, data: bytes, total: int | None, content_type: str
+    ) -> None:
+        """Initialize the track.
+
+        Args:
+            url: The CDN URL the rest of the track is fetched from.
+            data: The buffered head of the track.
+            total: Size of the whole track in bytes, if known.
+            content_type: The CDN's content type.
+        """
+        self.url = url
+        self.data = data
+        self.total = total
+        self.content_type = content_type
+        self.created = time.monotonic()
+
+    @property
+    def complete(self) -> bool:
+        """Whether the buffer holds the whole track."""
+        return self.total is not None and len(self.data) >= self.total
+
+
+def is_progressive(url: str) -> bool:
+    """Check whether a stream URL is a plain file rather than an HLS playlist.
+
+    Args:
+        url: The stream URL.
+
+    Returns:
+        True if the URL can be fetched with byte ranges.
+    """
+    return not urllib.parse.urlsplit(url).path.endswith(".m3u8")
+
+
+def fetch_head(
+    url: str, size: int, shaper: TrafficShaper | None = None
+) -> PrerolledTrack | None:
+    """Download the first bytes of a track with a range request.
+
+    Args:
+        url: The stream URL.
+        size: Number of bytes to buffer.
+        shaper: Shaper the download yields to playback through.
+
+    Returns:
+        The buffered track, or None if the server ignores byte ranges.
+    """
+    request = urllib.request.Request(  # noqa: S310
+        url, headers={"Range": f"bytes=0-{size - 1}"}
+    )
+    with urllib.request.urlopen(request, timeout=PREROLL_TIMEOUT) as response:  # noqa: S310
+        # Without a 206 the rest could not be resumed from an offset
+        if response.status != 206:  # noqa: PLR2004
+            return None
+        if shaper is None:
+            data = response.read(size)
+        else:
+            chunks = []
+            received = 0
+            while received < size:
+                shaper.background(min(PREROLL_CHUNK_SIZE, size - received))
+                chunk = response.read(min(PREROLL_CHUNK_SIZE, size - received))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+            data = b"".join(chunks)
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return PrerolledTrack(
+            url,
+            data,
+            int(total) if total.isdigit() else None,
+            response.headers.get("Content-Type", "audio/mpeg"),
+        )
+
+
+class PrerollBuffer:
+    """In-memory heads of upcoming tracks for gapless track changes.
+
+    Tracks are buffered in a background thread near the end of the previous
+    track. Playback then starts from these bytes through the local stream
+    endpoint instead of waiting on VK's CDN.
+    """
+
+    def __init__(
+        self,
+        seconds: int,
+        max_entries: int = PREROLL_ENTRIES,
+        monitor: ThroughputMonitor | None = None,
+        shaper: TrafficShaper | None = None,
+    ) -> None:
+        """Initialize the buffer.
+
+        Args:
+            seconds: Seconds of audio to buffer per track (0 disables).
+            max_entries: Number of tracks kept in memory.
+            monitor: Monitor the download throughput is recorded in.
+            shaper: Shaper the downloads yield to playback through.
+        """
+        self.size = seconds * STREAM_BYTE_RATE
+        self.max_entries = max_entries
+        self.monitor = monitor
+        self.shaper = shaper
+        self.meter = CacheMeter("preroll", weight=2.0)
+        self._tracks: collections.OrderedDict[str, PrerolledTrack] = (
+            collections.OrderedDict()
+        )
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def get(self, audio_id: str) -> PrerolledTrack | None:
+        """Get a buffered track.
+
+        Args:
+            audio_id: The VK audio ID.
+
+        Returns:
+            The track or None if it is not buffered or its URL has expired.
+        """
+        with self._lock:
+            track = self._tracks.get(audio_id)
+            if track is None:
+                self.meter.miss()
+                return None
+            if time.monotonic() - track.created > URL_TTL:
+                self._remove(audio_id)
+                self.meter.miss()
+                return None
+            self.meter.hit()
+            return track
+
+    def _remove(self, audio_id: str) -> int:
+        """Drop a track (lock held) and return its size."""
+        track = self._tracks.pop(audio_id)
+        self.meter.shrink(len(track.data))
+        return len(track.data)
+
+    def evict(self, size: int) -> int:
+        """Drop the oldest buffered tracks.
+
+        Args:
+            size: Bytes to free.
+
+        Returns:
+            The bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            while self._tracks and freed < size:
+                freed += self._remove(next(iter(self._tracks)))
+        return freed
+
+    def progress(self) -> dict[str, Any]:
+        """Report the buffered and pending downloads.
+
+        Returns:
+            ``pending`` audio IDs still downloading and, per ``buffered``
+            audio ID, the bytes held and the track size if known.
+        """
+        with self._lock:
+            return {
+                "pending": sorted(self._pending),
+                "buffered": {
+                    audio_id: {"bytes": len(track.data), "total": track.total}
+                    for audio_id, track in self._tracks.items()
+                },
+            }
+
+    def prefetch(self, audio_id: str, url: str) -> None:
+        """Start buffering a track in the background.
+
+        Args:
+            audio_id: The VK audio ID.
+            url: The resolved stream URL.
+        """
+        if not self.size or not is_progressive(url):
+            return
+        with self._lock:
+            if audio_id in self._tracks or audio_id in self._pending:
+                return
+            self._pending.add(audio_id)
+
+        def run() -> None:
+            # A rate-limited download measures the limit, not the link
+            measure = self.monitor is not None and (
+                self.shaper is None or self.shaper.background_rate() is None
+            )
+            start = time.monotonic()
+            try:
+                track = fetch_head(url, self.size, self.shaper)
+            except Exception:
+                logger.exception("Failed to preroll VK track %s", audio_id)
+                track = None
+                if self.monitor is not None:
+                    self.monitor.stall()
+            if track is not None and measure:
+                self.monitor.record(len(track.data), time.monotonic() - start)  # type: ignore[union-attr]
+            with self._lock:
+                self._pending.discard(audio_id)
+                if track is None:
+                    return
+                self._tracks[audio_id] = track
+                self.meter.grow(len(track.data))
+                while len(self._tracks) > self.max_entries:
+                    self._remove(next(iter(self._tracks)))
+            self.meter.check()
+            logger.debug("Prerolled %d bytes of %s", len(track.data), audio_id)
+
+        threading.Thread(target=run, name="VKMPreroll", daemon=True).start()
+
+
+class LocalTracks:
+    """Cached and saved audio files, named ``<owner_id>_<track_id>.mp3``."""
+
+    def __init__(self, dirs: list[pathlib.Path]) -> None:
+        """Initialize the lookup.
+
+        Args:
+            dirs: Directories to look in, in order of preference.
+        """
+        self.dirs = dirs
+
+    def find(self, audio_id: str) -> pathlib.Path | None:
+        """Find the local file of a track.
+
+        Args:
+            audio_id: The VK audio ID.
+
+        Returns:
+            The file path or None if the track is not stored locally.
+        """
+        for directory in self.dirs:
+            path = directory / f"{audio_id}.mp3"
+            if path.is_file():
+                return path
+        return None
+
+
+def get_track_dirs(config: dict[str, Any]) -> list[pathlib.Path]:
+    """Get the directories local track files are looked up in.
+
+    Args:
+        config: The ``vkm`` configuration section.
+
+    Returns:
+        ``saved_path`` and ``<cache_path>/tracks``, where configured.
+    """
+    dirs = []
+    if config.get("saved_path"):
+        dirs.append(pathlib.Path(config["saved_path"]))
+    if config.get("cache_path"):
+        dirs.append(pathlib.Path(config["cache_path"]) / "tracks")
+    return dirs
+
+
+def get_stream_base_url(config: dict[str, Any]) -> str | None:
+    """Get the local URL of the Mopidy HTTP server.
+
+    Args:
+        config: The full Mopidy configuration.
+
+    Returns:
+        ``http://host:port`` reachable from GStreamer, or None if the HTTP
+        frontend is disabled.
+    """
+    http = config.get("http") or {}
+    if not http.get("enabled"):
+        return None
+    hostname = http.get("hostname") or ""
+    if hostname in {"", "0.0.0.0", "::"}:  # noqa: S104
+        hostname = "127.0.0.1"
+    elif ":" in hostname:
+        hostname = f"[{hostname}]"
+    return f"http://{hostname}:{http.get('port')}"
+
+
+class VKMPlaybackProvider(backend.PlaybackProvider):
+    """Playback provider resolving ``vkm:track:`` URIs to VK stream URLs."""
+
+    backend: VKMBackend
+
+    def translate_uri(self, uri: str) -> str | None:
+        """Resolve a track URI to a playable URL.
+
+        Args:
+            uri: The track URI.
+
+        Returns:
+            The stream URL or None if it cannot be resolved.
+        """
+        audio_id = parse_track_uri(uri)
+        if audio_id is None:
+            return None
+        base_url = self.backend.stream_base_url
+        path = self.backend.local_tracks.find(audio_id)
+        if path is not None:
+            # The stream endpoint serves the file with byte ranges
+            return f"{base_url}/vkm/stream/{audio_id}" if base_url else path.as_uri()
+        # About-to-finish lands here for the next track: if its head is
+        # buffered, start from local bytes instead of VK's CDN
+        if base_url and self.backend.preroll.get(audio_id) is not None:
+            return f"{base_url}/vkm/stream/{audio_id}"
+        url = self.backend.resolve_url(audio_id)
+        # HLS master playlists are narrowed to the variant the link can carry
+        return self.backend.quality.stream_url(url) if url else None
@@ -0,0 +1,359 @@
+"""VKM playlists provider backed by versioned playlist snapshots."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from mopidy import backend
+from mopidy.models import Playlist, Ref
+
+from mopidy_vkm.exporter import iter_playlist_songs
+from mopidy_vkm.memory import CacheMeter, estimate_size
+from mopidy_vkm.shared import SharedJsonFile
+from mopidy_vkm.sync import PLAYLISTS
+from mopidy_vkm.translator import (
+    parse_playlist_uri,
+    playlist_uri,
+    track_from_dict,
+    track_ref_from_dict,
+)
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Callable
+
+    from mopidy_vkm.backend import VKMBackend
+    from mopidy_vkm.sync import LibraryIndex
+
+logger = logging.getLogger(__name__)
+
+
+def playlist_version(item: dict[str, Any]) -> str:
+    """Compute the modification marker of a playlist.
+
+    vkpymusic does not expose VK's ``update_time``, so the fields that
+    change whenever the playlist is edited are hashed with it, if present.
+
+    Args:
+        item: The playlist dict from the library index.
+
+    Returns:
+        A short hash of the playlist's modification marker.
+    """
+    marker = [
+        item.get("update_time", 0),
+        item.get("count", 0),
+        item.get("title", ""),
+        item.get("description", ""),
+        item.get("photo", ""),
+    ]
+    return hashlib.sha1(  # noqa: S324
+        json.dumps(marker, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:12]
+
+
+class PlaylistSnapshots:
+    """Track lists of the user's playlists, loaded lazily and kept on disk.
+
+    A snapshot is reused as long as the playlist's version in the library
+    index matches the version it was fetched at. Under memory pressure saved
+    snapshots are dropped from memory and read back from the file when
+    needed again.
+    """
+
+    def __init__(
+        self,
+        index: LibraryIndex,
+        get_service: Callable[[], Any],
+        path: pathlib.Path | None = None,
+    ) -> None:
+        """Initialize the snapshots.
+
+        Args:
+            index: The library index holding the playlists collection.
+            get_service: Callable returning the VK service or None.
+            path: File the snapshots are stored in, or None to keep them in
+                memory only.
+        """
+        self.index = index
+        self.get_service = get_service
+        self.path = path
+        self._file = SharedJsonFile(path) if path else None
+        self.meter = CacheMeter("playlists")
+        self._snapshots: dict[str, dict[str, Any]] = {}
+        self._dirty: set[str] = set()
+        self._removed: set[str] = set()
+        self._evicted: set[str] = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self, playlist_id: str | None = None) -> None:
+        """Load the snapshots, including those fetched by other instances.
+
+        Args:
+            playlist_id: An evicted snapshot to read back even if the file
+                did not change; other evicted snapshots stay unloaded.
+        """
+        if self._file is None or (playlist_id is None and not self._file.changed()):
+            return
+        try:
+            snapshots = self._file.load()
+        except (OSError, ValueError):
+            logger.exception("Failed to load playlist snapshots")
+            return
+        with self._lock:
+            self._evicted.discard(playlist_id)
+            for key, snapshot in snapshots.items():
+                if key not in self._dirty and key not in self._evicted:
+                    self._put(key, snapshot)
+        self.meter.check()
+
+    def _put(self, playlist_id: str, snapshot: dict[str, Any]) -> None:
+        """Store a snapshot in memory (lock held)."""
+        if playlist_id in self._snapshots:
+            self._remove(playlist_id)
+        self._snapshots[playlist_id] = snapshot
+        self.meter.grow(estimate_size(snapshot))
+
+    def _remove(self, playlist_id: str) -> int:
+        """Drop a snapshot from memory (lock held) and return its size."""
+        size = estimate_size(self._snapshots.pop(playlist_id))
+        self.meter.shrink(size)
+        return size
+
+    def evict(self, size: int) -> int:
+        """Drop the least recently fetched saved snapshots from memory.
+
+        Args:
+            size: Bytes to free.
+
+        Returns:
+            The bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            saved = sorted(
+                (key for key in self._snapshots if key not in self._dirty),
+                key=lambda key: self._snapshots[key].get("fetched_at", 0),
+            )
+            for playlist_id in saved:
+                if freed >= size:
+                    break
+                freed += self._remove(playlist_id)
+                self._evicted.add(playlist_id)
+        return freed
+
+    def save(self) -> None:
+        """Merge the snapshots changed by this instance into the file."""
+        if self._file is None:
+            return
+        with self._lock:
+            updates = {key: self._snapshots[key] for key in self._dirty}
+            removed = set(self._removed)
+            self._dirty.clear()
+            self._removed.clear()
+        try:
+            self._file.merge(updates, removed)
+        except OSError:
+            logger.exception("Failed to save playlist snapshots")
+            with self._lock:
+                self._dirty.update(updates)
+                self._removed.update(removed)
+
+    def find_playlist(self, uri: str) -> dict[str, Any] | None:
+        """Find a playlist of the user by URI.
+
+        Args:
+            uri: The playlist URI.
+
+        Returns:
+            The playlist dict from the library index or None.
+        """
+        parsed = parse_playlist_uri(uri)
+        if parsed is None:
+            return None
+        playlist_id = f"{parsed[0]}_{parsed[1]}"
+        for item in self.index.get_items(PLAYLISTS):
+            if item["id"] == playlist_id:
+                return item
+        return None
+
+    def get_tracks(self, uri: str) -> list[dict[str, Any]] | None:
+        """Get the tracks of a playlist, fetching them only when changed.
+
+        Args:
+            uri: The playlist URI.
+
+        Returns:
+            Song dicts, or None if the playlist cannot be fetched.
+        """
+        parsed = parse_playlist_uri(uri)
+        if parsed is None:
+            return None
+        item = self.find_playlist(uri)
+        if item is None:
+            # Not one of the user's playlists: nothing to version it by
+            owner_id, playlist_id, access_key = parsed
+            return self._fetch(
+                {
+                    "owner_id": owner_id,
+                    "playlist_id": playlist_id,
+                    "access_key": access_key,
+                }
+            )
+
+        version = playlist_version(item)
+        with self._lock:
+            snapshot = self._snapshots.get(item["id"])
+            evicted = item["id"] in self._evicted
+        if snapshot is None or snapshot["version"] != version:
+            # Another instance sharing cache_path may have fetched it
+            self._load(item["id"] if evicted else None)
+            with self._lock:
+                snapshot = self._snapshots.get(item["id"])
+        if snapshot is not None and snapshot["version"] == version:
+            self.meter.hit()
+            return snapshot["tracks"]
+        self.meter.miss()
+        tracks = self._fetch(item)
+        if tracks is None:
+            # Better stale than nothing while VK is unreachable
+            return snapshot["tracks"] if snapshot else None
+        with self._lock:
+            self._put(
+                item["id"],
+                {"version": version, "fetched_at": time.time(), "tracks": tracks},
+            )
+            self._dirty.add(item["id"])
+        self.save()
+        self.meter.check()
+        return tracks
+
+    def refresh(self) -> int:
+        """Refetch loaded playlists whose version changed, drop removed ones.
+
+        Returns:
+            The number of playlists refetched.
+        """
+        items = {item["id"]: item for item in self.index.get_items(PLAYLISTS)}
+        with self._lock:
+            removed = (set(self._snapshots) | self._evicted) - set(items)
+            for playlist_id in removed:
+                if playlist_id in self._snapshots:
+                    self._remove(playlist_id)
+                self._dirty.discard(playlist_id)
+            self._evicted -= removed
+            self._removed.update(removed)
+            stale = [
+                items[playlist_id]
+                for playlist_id, snapshot in self._snapshots.items()
+                if snapshot["version"] != playlist_version(items[playlist_id])
+            ]
+        for item in stale:
+            self.get_tracks(_playlist_item_uri(item))
+        if removed and not stale:
+            self.save()
+        return len(stale)
+
+    def _fetch(self, item: dict[str, Any]) -> list[dict[str, Any]] | None:
+        """Fetch all tracks of a playlist from VK."""
+        service = self.get_service()
+        if service is None:
+            return None
+        try:
+            return list(iter_playlist_songs(service, item))
+        except Exception:
+            logger.exception(
+                "Failed to fetch VK playlist %s_%s",
+                item["owner_id"],
+                item["playlist_id"],
+            )
+            return None
+
+
+def _playlist_item_uri(item: dict[str, Any]) -> str:
+    return playlist_uri(
+        item["owner_id"], item["playlist_id"], item.get("access_key", "")
+    )
+
+
+class VKMPlaylistsProvider(backend.PlaylistsProvider):
+    """Read-only playlists provider for the user's VK playlists.
+
+    ``as_list`` is answered from the synced library index and never calls
+    VK; track lists are loaded per playlist on first use.
+    """
+
+    backend: VKMBackend
+
+    def as_list(self) -> list[Ref]:
+        """List the user's playlists.
+
+        Returns:
+            Playlist refs.
+        """
+        return [
+            Ref.playlist(uri=_playlist_item_uri(item), name=item.get("title") or None)
+            for item in self.backend.library_index.get_items(PLAYLISTS)
+        ]
+
+    def get_items(self, uri: str) -> list[Ref] | None:
+        """Get the track refs of a playlist.
+
+        Args:
+            uri: The playlist URI.
+
+        Returns:
+            Track refs, or None if the playlist cannot be found.
+        """
+        tracks = self.backend.playlist_snapshots.get_tracks(uri)
+        if tracks is None:
+            return None
+        return [track_ref_from_dict(item) for item in tracks]
+
+    def lookup(self, uri: str) -> Playlist | None:
+        """Look up a playlist with its tracks.
+
+        Args:
+            uri: The playlist URI.
+
+        Returns:
+            The playlist or None if it cannot be found.
+        """
+        tracks = self.backend.playlist_snapshots.get_tracks(uri)
+        if tracks is None:
+            return None
+        self.backend.track_store.add(tracks)
+        item = self.backend.playlist_snapshots.find_playlist(uri) or {}
+        update_time = item.get("update_time")
+        return Playlist(
+            uri=uri,
+            name=item.get("title") or None,
+            tracks=[
+                track_from_dict(track, self.backend.audio_analyzer.get(track["id"]))
+                for track in tracks
+            ],
+            last_modified=update_time * 1000 if update_time else None,
+        )
+
+    def refresh(self) -> None:
+        """Sync the playlists and refetch the loaded ones that changed."""
+        self.backend.sync_scheduler.sync_once()
+        self.backend.playlist_snapshots.refresh()
+
+    def create(self, name: str) -> Playlist | None:  # noqa: ARG002
+        """VK playlists cannot be created through Mopidy."""
+        return None
+
+    def delete(self, uri: str) -> bool:  # noqa: ARG002
+        """VK playlists cannot be deleted through Mopidy."""
+        return False
+
+    def save(self, playlist: Playlist) -> Playlist | None:  # noqa: ARG002
+        """VK playlists cannot be modified through Mopidy."""
+        return None
@@ -0,0 +1,316 @@
+"""Stream quality selection from measured download throughput."""
+
+from __future__ import annotations
+
+import collections
+import logging
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from mopidy_vkm.playback import is_progressive
+
+logger = logging.getLogger(__name__)
+
+# Bitrate ceilings in kbit/s, lowest first
+BITRATES = {"low": 128, "medium": 192, "high": 320}
+QUALITIES = (*BITRATES, "auto")
+# Weight of the newest sample in the throughput average
+EWMA_ALPHA = 0.3
+# Smaller downloads mostly measure connection setup
+MIN_SAMPLE_BYTES = 32 * 1024
+# Share of the measured throughput a stream may use, leaving room for jitter
+HEADROOM = 0.75
+# Stalls older than this no longer lower the quality
+STALL_WINDOW = 5 * 60
+# A relayed stream waiting longer than this for the next chunk stalled
+STALL_GAP = 2.0
+# Measurements older than this are refreshed with a probe download
+PROBE_INTERVAL = 10 * 60
+PROBE_BYTES = 256 * 1024
+PROBE_TIMEOUT = 10
+# Parsed HLS master playlists are kept as long as their signed URLs live
+VARIANTS_TTL = 30 * 60
+
+_STREAM_INF = re.compile(r"#EXT-X-STREAM-INF:.*?\bBANDWIDTH=(\d+)")
+
+
+def parse_variants(text: str, base_url: str) -> list[tuple[int, str]]:
+    """Read the variant streams of an HLS master playlist.
+
+    Args:
+        text: The playlist.
+        base_url: Its URL, which relative variant URLs are resolved against.
+
+    Returns:
+        ``(bandwidth in bit/s, URL)`` pairs, lowest bandwidth first; empty
+        for a media playlist.
+    """
+    variants = []
+    bandwidth = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        match = _STREAM_INF.match(line)
+        if match:
+            bandwidth = int(match.group(1))
+        elif line and not line.startswith("#") and bandwidth is not None:
+            variants.append((bandwidth, urllib.parse.urljoin(base_url, line)))
+            bandwidth = None
+    return sorted(variants)
+
+
+class ThroughputMonitor:
+    """Moving average of download throughput and a log of recent stalls.
+
+    Fed by preroll downloads, the stream relay and probe downloads.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the monitor without measurements."""
+        self.kbps: float | None = None
+        self.measured_at: float | None = None
+        self.last_stall: float | None = None
+        self._stalls: collections.deque[float] = collections.deque()
+        self._lock = threading.Lock()
+
+    def record(self, size: int, seconds: float) -> None:
+        """Add a finished download to the average.
+
+        Args:
+            size: Bytes downloaded.
+            seconds: Time the download took.
+        """
+        if size < MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        sample = size * 8 / 1000 / seconds
+        with self._lock:
+            self.kbps = (
+                sample
+                if self.kbps is None
+                else EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * self.kbps
+            )
+            self.measured_at = time.monotonic()
+
+    def stall(self) -> None:
+        """Record that a stream ran dry."""
+        with self._lock:
+            self.last_stall = time.monotonic()
+            self._stalls.append(self.last_stall)
+
+    def recent_stalls(self) -> int:
+        """Count the stalls within ``STALL_WINDOW``.
+
+        Returns:
+            The number of recent stalls.
+        """
+        cutoff = time.monotonic() - STALL_WINDOW
+        with self._lock:
+            while self._stalls and self._stalls[0] < cutoff:
+                self._stalls.popleft()
+            return len(self._stalls)
+
+    def is_stale(self) -> bool:
+        """Check whether the average needs a fresh measurement.
+
+        Returns:
+            True if nothing was measured within ``PROBE_INTERVAL``.
+        """
+        with self._lock:
+            return (
+                self.measured_at is None
+                or time.monotonic() - self.measured_at > PROBE_INTERVAL
+            )
+
+    def stats(self) -> dict[str, float | int | None]:
+        """Report the current measurements.
+
+        Returns:
+            Throughput in kbit/s and the recent stall count.
+        """
+        return {
+            "kbps": round(self.kbps) if self.kbps is not None else None,
+            "stalls": self.recent_stalls(),
+        }
+
+
+def probe(url: str, monitor: ThroughputMonitor) -> None:
+    """Time the download of the first bytes of a stream.
+
+    Args:
+        url: A progressive stream URL.
+        monitor: Monitor the measurement is recorded in.
+    """
+    request = urllib.request.Request(  # noqa: S310
+        url, headers={"Range": f"bytes=0-{PROBE_BYTES - 1}"}
+    )
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=PROBE_TIMEOUT) as response:  # noqa: S310
+            size = len(response.read(PROBE_BYTES))
+    except OSError as e:
+        logger.debug("Throughput probe failed: %s", e)
+        monitor.stall()
+        return
+    monitor.record(size, time.monotonic() - start)
+
+
+class QualitySelector:
+    """Picks the stream bitrate from the configured quality.
+
+    ``low``, ``medium`` and ``high`` are fixed ceilings. ``auto`` takes the
+    highest ceiling that fits in the measured throughput, one step lower
+    per recent stall, and re-probes the link when the measurement is old.
+    The ceiling selects the variant of HLS master playlists; VK's MP3
+    files come in one bitrate only. Playlists are fetched in the background,
+    never in :meth:`stream_url`, which runs on the backend actor's thread.
+    """
+
+    def __init__(self, quality: str, monitor: ThroughputMonitor) -> None:
+        """Initialize the selector.
+
+        Args:
+            quality: One of ``QUALITIES``.
+            monitor: Throughput measurements used by ``auto``.
+        """
+        self.quality = quality if quality in QUALITIES else "auto"
+        self.monitor = monitor
+        self._chosen: str | None = None
+        self._variants: dict[str, tuple[float, list[tuple[int, str]]]] = {}
+        self._loading: set[str] = set()
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def level(self) -> str:
+        """Get the quality level in effect.
+
+        Returns:
+            ``low``, ``medium`` or ``high``.
+        """
+        if self.quality != "auto":
+            return self.quality
+        levels = list(BITRATES)
+        kbps = self.monitor.kbps
+        if kbps is None:
+            index = levels.index("medium")
+        else:
+            fitting = [
+                i
+                for i, level in enumerate(levels)
+                if BITRATES[level] <= kbps * HEADROOM
+            ]
+            index = fitting[-1] if fitting else 0
+        index = max(index - self.monitor.recent_stalls(), 0)
+        level = levels[index]
+        if level != self._chosen:
+            logger.info("VKM stream quality is now %s", level)
+            self._chosen = level
+        return level
+
+    def bitrate(self) -> int:
+        """Get the bitrate ceiling in effect.
+
+        Returns:
+            The ceiling in kbit/s.
+        """
+        return BITRATES[self.level()]
+
+    def stream_url(self, url: str) -> str:
+        """Choose the variant of an HLS master playlist for the ceiling.
+
+        Does not block: a playlist that was not loaded yet is loaded in the
+        background for the next time, and GStreamer gets the master
+        playlist, whose variants it switches between by itself.
+
+        Args:
+            url: A resolved stream URL.
+
+        Returns:
+            The URL of the best variant within the ceiling, the lowest
+            variant if none fits, or ``url`` itself if it has no variants
+            or they are not loaded yet.
+        """
+        if is_progressive(url):
+            return url
+        with self._lock:
+            entry = self._variants.get(url)
+        if entry is None or entry[0] <= time.monotonic():
+            self.load_variants(url)
+            return url
+        variants = entry[1]
+        if not variants:
+            return url
+        ceiling = self.bitrate() * 1000
+        fitting = [variant for bandwidth, variant in variants if bandwidth <= ceiling]
+        return fitting[-1] if fitting else variants[0][1]
+
+    def load_variants(self, url: str) -> None:
+        """Fetch and parse an HLS master playlist in the background.
+
+        Called for the next track ahead of time, so that :meth:`stream_url`
+        finds its variants.
+
+        Args:
+            url: A resolved stream URL; progressive URLs are ignored.
+        """
+        if is_progressive(url):
+            return
+        with self._lock:
+            entry = self._variants.get(url)
+            if (
+                entry is not None and entry[0] > time.monotonic()
+            ) or url in self._loading:
+                return
+            self._loading.add(url)
+
+        def run() -> None:
+            try:
+                self._fetch_variants(url)
+            finally:
+                with self._lock:
+                    self._loading.discard(url)
+
+        threading.Thread(target=run, name="VKMVariants", daemon=True).start()
+
+    def _fetch_variants(self, url: str) -> None:
+        """Fetch and parse a playlist, kept for ``VARIANTS_TTL``."""
+        now = time.monotonic()
+        try:
+            with urllib.request.urlopen(url, timeout=PROBE_TIMEOUT) as response:  # noqa: S310
+                text = response.read().decode("utf-8", "replace")
+        except OSError as e:
+            logger.debug("Cannot read HLS playlist %s: %s", url, e)
+            return
+        variants = parse_variants(text, url)
+        with self._lock:
+            self._variants = {
+                key: value for key, value in self._variants.items() if value[0] > now
+            }
+            self._variants[url] = (now + VARIANTS_TTL, variants)
+
+    def maybe_probe(self, url: str) -> None:
+        """Measure the link in the background if ``auto`` needs it.
+
+        Args:
+            url: A resolved stream URL; only progressive URLs are probed.
+        """
+        if (
+            self.quality != "auto"
+            or not is_progressive(url)
+            or not self.monitor.is_stale()
+        ):
+            return
+        with self._lock:
+            if self._probing:
+                return
+            self._probing = True
+
+        def run() -> None:
+            try:
+                probe(url, self.monitor)
+            finally:
+                with self._lock:
+                    self._probing = False
+
+        threading.Thread(target=run, name="VKMProbe", daemon=True).start()
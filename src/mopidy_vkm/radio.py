@@ -0,0 +1,247 @@
+"""Endless VK recommendations radio."""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import logging
+import threading
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.translator import parse_track_uri, song_to_dict, track_uri
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from mopidy_vkm.playback import UrlCache
+    from mopidy_vkm.trackstore import TrackStore
+
+logger = logging.getLogger(__name__)
+
+RADIO_URI_PREFIX = "vkm:radio:"
+USER_RADIO_URI = "vkm:radio:user"
+
+BATCH_SIZE = 25
+# Over-fetch so a batch survives filtering of recently played tracks
+FETCH_COUNT = BATCH_SIZE * 2
+# Remaining queued tracks at which the next batch is fetched in background
+PREFETCH_THRESHOLD = 10
+# Remaining queued tracks at which the prefetched batch is queued
+REFILL_THRESHOLD = 3
+# Seconds a refill waits for the prefetched batch; a slower batch is queued
+# on a later track start instead
+REFILL_TIMEOUT = 10.0
+HISTORY_SIZE = 500
+
+
+def parse_radio_uri(uri: str) -> str | None:
+    """Get the seed of a radio URI.
+
+    Args:
+        uri: ``vkm:radio:user`` or ``vkm:radio:track:<owner>_<id>``.
+
+    Returns:
+        ``user``, the seed audio ID, or None if the URI is not a radio URI.
+    """
+    if uri == USER_RADIO_URI:
+        return "user"
+    if uri.startswith(RADIO_URI_PREFIX):
+        return parse_track_uri(f"vkm:{uri[len(RADIO_URI_PREFIX) :]}")
+    return None
+
+
+class RadioStation:
+    """A recommendations station that fetches its next batch ahead of time."""
+
+    def __init__(
+        self,
+        seed: str,
+        get_service: Callable[[], Any],
+        get_user_id: Callable[[], str | None],
+        url_cache: UrlCache,
+        history: collections.deque[str],
+    ) -> None:
+        """Initialize the station.
+
+        Args:
+            seed: ``user`` for personal recommendations or a seed audio ID.
+            get_service: Callable returning the current VK service or None.
+            get_user_id: Callable returning the VK user ID or None.
+            url_cache: Cache the stream URLs of fetched batches go to.
+            history: Recently played audio IDs shared between stations.
+        """
+        self.seed = seed
+        self.get_service = get_service
+        self.get_user_id = get_user_id
+        self.url_cache = url_cache
+        self.history = history
+        self.queued: set[str] = set()
+        self._offset = 0
+        self._last_queued: str | None = None
+        self._prefetch: concurrent.futures.Future[list[dict[str, Any]]] | None = None
+        self._lock = threading.Lock()
+
+    def owns(self, audio_id: str) -> bool:
+        """Check whether a track was queued by this station."""
+        return audio_id in self.queued
+
+    def _fetch_batch(self) -> list[dict[str, Any]]:
+        """Fetch the next batch of fresh tracks (usually a single API call)."""
+        service = self.get_service()
+        if service is None:
+            return []
+        batch: list[dict[str, Any]] = []
+        for _ in range(3):
+            if self.seed == "user":
+                songs = service.get_recommendations(
+                    user_id=self.get_user_id(), count=FETCH_COUNT, offset=self._offset
+                )
+                self._offset += FETCH_COUNT
+            else:
+                # Drift from the last queued track to keep the station endless
+                seed = self._last_queued or self.seed
+                songs = service.get_recommendations(song_id=seed, count=FETCH_COUNT)
+            # Recommendations already carry stream URLs: no resolution calls
+            self.url_cache.add_songs(songs)
+            for song in songs:
+                item = song_to_dict(song)
+                if (
+                    item["id"] in self.queued
+                    or item["id"] in self.history
+                    or any(item["id"] == other["id"] for other in batch)
+                ):
+                    continue
+                batch.append(item)
+            if len(batch) >= BATCH_SIZE or not songs:
+                break
+        return batch[:BATCH_SIZE]
+
+    def prefetch(self) -> None:
+        """Start fetching the next batch in the background if not running."""
+        with self._lock:
+            if self._prefetch is not None:
+                return
+            self._prefetch = concurrent.futures.Future()
+            future = self._prefetch
+
+        def run() -> None:
+            try:
+                future.set_result(self._fetch_batch())
+            except Exception as e:
+                logger.exception("Failed to prefetch radio batch")
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="VKMRadioPrefetch", daemon=True).start()
+
+    def next_batch(self, timeout: float | None = None) -> list[dict[str, Any]]:
+        """Take the next batch, waiting for the prefetch if it is in flight.
+
+        Args:
+            timeout: Maximum seconds to wait for an in-flight prefetch.
+
+        Returns:
+            The song dicts of the batch.
+        """
+        with self._lock:
+            future, self._prefetch = self._prefetch, None
+        try:
+            batch = future.result(timeout) if future else self._fetch_batch()
+        except TimeoutError:
+            # Still in flight: kept for the next call
+            with self._lock:
+                if self._prefetch is None:
+                    self._prefetch = future
+            logger.warning("VK radio batch is late, queueing it later")
+            return []
+        except Exception:
+            logger.exception("Failed to fetch radio batch")
+            return []
+        batch = [item for item in batch if item["id"] not in self.history]
+        for item in batch:
+            self.queued.add(item["id"])
+        if batch:
+            self._last_queued = batch[-1]["id"]
+        return batch
+
+
+class RadioManager:
+    """Keep the active radio station's queue topped up."""
+
+    pykka_traversable = True
+
+    def __init__(
+        self,
+        get_service: Callable[[], Any],
+        get_user_id: Callable[[], str | None],
+        url_cache: UrlCache,
+        track_store: TrackStore | None = None,
+    ) -> None:
+        """Initialize the manager.
+
+        Args:
+            get_service: Callable returning the current VK service or None.
+            get_user_id: Callable returning the VK user ID or None.
+            url_cache: Cache the stream URLs of fetched batches go to.
+            track_store: Store refill batches go to, so that their lookups
+                need no VK calls.
+        """
+        self.get_service = get_service
+        self.get_user_id = get_user_id
+        self.url_cache = url_cache
+        self.track_store = track_store
+        self.station: RadioStation | None = None
+        self.history: collections.deque[str] = collections.deque(maxlen=HISTORY_SIZE)
+
+    def start(self, uri: str) -> list[dict[str, Any]]:
+        """Start a station and return its first batch.
+
+        Args:
+            uri: The radio URI.
+
+        Returns:
+            The song dicts of the first batch, with the following batch
+            already being fetched.
+        """
+        seed = parse_radio_uri(uri)
+        if seed is None:
+            return []
+        self.station = RadioStation(
+            seed, self.get_service, self.get_user_id, self.url_cache, self.history
+        )
+        batch = self.station.next_batch()
+        self.station.prefetch()
+        logger.info("Started VK radio %s with %d tracks", uri, len(batch))
+        return batch
+
+    def on_track_started(self, uri: str, remaining: int) -> list[str]:
+        """Record a played track and refill the queue when it runs low.
+
+        Runs in the backend's library pool, not on the actor thread, and
+        waits for the prefetched batch at most ``REFILL_TIMEOUT``. Refill
+        batches are added to the track store.
+
+        Args:
+            uri: URI of the track that started playing.
+            remaining: Number of tracks queued after it.
+
+        Returns:
+            Track URIs to append to the tracklist (empty if none are due).
+        """
+        audio_id = parse_track_uri(uri)
+        station = self.station
+        if audio_id is None or station is None or not station.owns(audio_id):
+            return []
+        self.history.append(audio_id)
+        if remaining <= PREFETCH_THRESHOLD:
+            station.prefetch()
+        if remaining > REFILL_THRESHOLD:
+            return []
+        batch = station.next_batch(REFILL_TIMEOUT)
+        station.prefetch()
+        if self.track_store is not None:
+            self.track_store.add(batch)
+        return [track_uri(item["owner_id"], item["track_id"]) for item in batch]
+
+    def stop(self) -> None:
+        """Stop the active station."""
+        self.station = None
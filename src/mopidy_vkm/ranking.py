@@ -0,0 +1,136 @@
+"""Duplicate collapsing and ranking of VK search results."""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.search import normalize_text
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Seconds two uploads of the same recording may differ by
+DURATION_TOLERANCE = 3
+# Shorter uploads are mostly previews and ringtone cuts
+SHORT_TRACK = 60
+# Title words marking another version of a song, unless the query asks
+# for it
+VARIANT_WORDS = frozenset(
+    {
+        "live",
+        "remix",
+        "mix",
+        "cover",
+        "karaoke",
+        "instrumental",
+        "acoustic",
+        "edit",
+        "version",
+        "remastered",
+        "remaster",
+        "sped",
+        "slowed",
+        "nightcore",
+        "минус",
+        "кавер",
+        "ремикс",
+        "концерт",
+    }
+)
+# Score weights; relevance ranges from 0 to 1
+VARIANT_PENALTY = 0.3
+SHORT_PENALTY = 0.5
+LIBRARY_BONUS = 0.2
+# VK's own order breaks ties between otherwise equal results
+ORDER_WEIGHT = 0.1
+
+_BRACKETS = re.compile(r"[\(\[][^\)\]]*[\)\]]")
+_FEATURING = re.compile(r"\s(?:feat|ft|featuring)\b.*$")
+_WORDS = re.compile(r"\w+")
+
+
+def _words(text: str) -> list[str]:
+    return _WORDS.findall(normalize_text(text))
+
+
+def song_key(item: dict[str, Any]) -> str:
+    """Build the key uploads of the same song share.
+
+    Bracketed remarks and featured artists are dropped, along with case,
+    punctuation and ``ё`` spelling.
+
+    Args:
+        item: A song dict.
+
+    Returns:
+        A normalized ``artist|title`` key.
+    """
+    artist = _FEATURING.sub("", normalize_text(item["artist"]))
+    title = _FEATURING.sub("", _BRACKETS.sub(" ", normalize_text(item["title"])))
+    return f"{' '.join(_WORDS.findall(artist))}|{' '.join(_WORDS.findall(title))}"
+
+
+def collapse_results(
+    items: list[dict[str, Any]],
+    query: str,
+    in_library: Callable[[str], bool] | None = None,
+) -> list[dict[str, Any]]:
+    """Keep the best upload of every song and order songs by quality.
+
+    The whole page is scored in one pass: the share of query words in the
+    artist and title, less penalties for unrequested versions (live,
+    remix, ...) and preview-length uploads, plus a bonus for tracks in the
+    user's library and a little for VK's own order. Uploads with the same
+    :func:`song_key` and durations within ``DURATION_TOLERANCE`` of each
+    other are one song; only its best scoring upload is kept.
+
+    Args:
+        items: Song dicts in VK's order.
+        query: The free-text query.
+        in_library: Callable telling whether an audio ID is in the user's
+            library.
+
+    Returns:
+        One song dict per song, best first.
+    """
+    if not items:
+        return []
+    query_words = set(_words(query))
+    count = len(items)
+    scores = []
+    for position, item in enumerate(items):
+        words = set(_words(f"{item['artist']} {item['title']}"))
+        relevance = len(query_words & words) / len(query_words) if query_words else 1
+        variant = bool((words & VARIANT_WORDS) - query_words)
+        duration = item.get("duration") or 0
+        score = (
+            relevance
+            - VARIANT_PENALTY * variant
+            - SHORT_PENALTY * (0 < duration < SHORT_TRACK)
+            + ORDER_WEIGHT * (1 - position / count)
+        )
+        if in_library is not None and in_library(item["id"]):
+            score += LIBRARY_BONUS
+        scores.append(score)
+
+    # Bucket by key, then split each bucket where durations drift apart
+    buckets: dict[str, list[int]] = {}
+    for position, item in enumerate(items):
+        buckets.setdefault(song_key(item), []).append(position)
+    best: list[int] = []
+    for positions in buckets.values():
+        positions.sort(key=lambda i: items[i].get("duration") or 0)
+        group_start = items[positions[0]].get("duration") or 0
+        winner = positions[0]
+        for i in positions[1:]:
+            duration = items[i].get("duration") or 0
+            if duration - group_start > DURATION_TOLERANCE:
+                best.append(winner)
+                group_start, winner = duration, i
+            elif (scores[i], -i) > (scores[winner], -winner):
+                winner = i
+        best.append(winner)
+
+    best.sort(key=lambda i: (-scores[i], i))
+    return [items[i] for i in best]
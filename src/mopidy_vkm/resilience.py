@@ -0,0 +1,182 @@
+"""Circuit breaker shared by all VK API calls."""
+
+from __future__ import annotations
+
+import functools
+import logging
+import random
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# VK error codes that mean "back off": too many requests per second, flood
+# control, internal server error and captcha required
+RATE_LIMIT = 6
+FLOOD_CONTROL = 9
+INTERNAL_ERROR = 10
+CAPTCHA_NEEDED = 14
+BACKOFF_ERROR_CODES = frozenset(
+    {RATE_LIMIT, FLOOD_CONTROL, INTERNAL_ERROR, CAPTCHA_NEEDED}
+)
+# VK asked us to slow down explicitly: open at once instead of counting
+IMMEDIATE_ERROR_CODES = frozenset({RATE_LIMIT, FLOOD_CONTROL, CAPTCHA_NEEDED})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling VK while the circuit is open."""
+
+    def __init__(self, retry_in: float) -> None:
+        """Initialize the error.
+
+        Args:
+            retry_in: Seconds until the next call is let through.
+        """
+        super().__init__(f"VK API unavailable, retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def is_backoff_error(exc: BaseException) -> bool:
+    """Check whether a failure should count against the circuit.
+
+    Args:
+        exc: The exception raised by a VK call.
+
+    Returns:
+        True for the VK error codes in ``BACKOFF_ERROR_CODES`` and for
+        network errors (curl errors are ``OSError`` subclasses).
+    """
+    code = getattr(exc, "error_code", None)
+    if code is not None:
+        return code in BACKOFF_ERROR_CODES
+    return isinstance(exc, OSError)
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker with exponential backoff and jitter.
+
+    After ``failure_threshold`` consecutive failures (or a single explicit
+    rate limit) the circuit opens and calls fail fast. Once the backoff has
+    passed a single probe call is let through: success closes the circuit,
+    failure reopens it with a doubled delay.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        jitter: float = 0.2,
+    ) -> None:
+        """Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit.
+            base_delay: Seconds the circuit stays open the first time.
+            max_delay: Upper bound for the backoff.
+            jitter: Relative random spread applied to every delay.
+        """
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Let a call through or fail fast.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half open with a
+                probe already in flight.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now >= self._retry_at:
+                self.state = HALF_OPEN
+                return
+            raise CircuitOpenError(max(self._retry_at - now, 0.0))
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("VK API reachable again, closing circuit")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened = 0
+
+    def record_failure(self, exc: BaseException) -> None:
+        """Count a failed call and open the circuit when due.
+
+        Args:
+            exc: The exception raised by the call.
+        """
+        with self._lock:
+            self.failures += 1
+            immediate = getattr(exc, "error_code", None) in IMMEDIATE_ERROR_CODES
+            if (
+                self.state == HALF_OPEN
+                or immediate
+                or self.failures >= self.failure_threshold
+            ):
+                self._open(exc)
+
+    def _open(self, exc: BaseException) -> None:
+        """Open the circuit with the next backoff delay (lock held)."""
+        delay = min(self.base_delay * 2**self.opened, self.max_delay)
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)  # noqa: S311
+        self.opened += 1
+        self.state = OPEN
+        self._retry_at = time.monotonic() + delay
+        logger.warning("VK API failing (%s), pausing calls for %.0fs", exc, delay)
+
+
+class ResilientService:
+    """Proxy for the vkpymusic ``Service`` guarded by a circuit breaker.
+
+    Only VK back-off errors and network failures count as failures. Any
+    other VK error still proves the API is reachable and counts as success.
+    """
+
+    def __init__(self, service: Any, breaker: CircuitBreaker) -> None:  # noqa: ANN401
+        """Initialize the proxy.
+
+        Args:
+            service: The wrapped VK service.
+            breaker: The shared circuit breaker.
+        """
+        self.service = service
+        self.breaker = breaker
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        """Wrap the service's methods with the breaker."""
+        attribute = getattr(self.service, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            self.breaker.before_call()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                if is_backoff_error(e):
+                    self.breaker.record_failure(e)
+                else:
+                    self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+        return call
@@ -0,0 +1,307 @@
+"""Disk cache of VK API responses with stale-while-revalidate."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import hashlib
+import json
+import logging
+import lzma
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any
+
+from vkpymusic.models import Playlist, Song, UserInfo
+
+from mopidy_vkm.shared import Lease, publish
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+# Seconds a response is fresh, per idempotent read. Everything else,
+# including URL resolution and radio recommendations, is never cached
+CACHE_TTLS = {
+    "get_count_by_user_id": 5 * 60,
+    "get_songs_by_userid": 10 * 60,
+    "get_playlists_by_userid": 15 * 60,
+    "get_songs_by_playlist_id": 30 * 60,
+    "get_popular": 60 * 60,
+    "search_songs_by_text": 60 * 60,
+    "search_albums_by_text": 60 * 60,
+    "search_playlists_by_text": 60 * 60,
+    "get_user_info": 24 * 60 * 60,
+}
+# Older entries are refetched before answering, and pruned from disk
+MAX_STALE = 7 * 24 * 60 * 60
+# Instances sharing cache_path refresh an entry once per lease, and prune
+# at most once per PRUNE_LEASE seconds
+REFRESH_LEASE = 60
+PRUNE_LEASE = 60 * 60
+
+# Entries above this size are compressed with lzma, smaller ones with zlib
+LZMA_THRESHOLD = 64 * 1024
+ZLIB = b"z"
+LZMA = b"x"
+
+_MODELS: dict[str, type] = {
+    model.__name__: model for model in (Song, Playlist, UserInfo)
+}
+
+
+def _encode(value: Any) -> Any:  # noqa: ANN401
+    """Turn vkpymusic models into JSON-serialisable data."""
+    if isinstance(value, list | tuple):
+        return [_encode(v) for v in value]
+    model = type(value).__name__
+    if model in _MODELS:
+        data = dict(vars(value))
+        # Stream URLs expire long before the entry does
+        if "url" in data:
+            data["url"] = ""
+        return {"__model__": model, **data}
+    return value
+
+
+def _decode(value: Any) -> Any:  # noqa: ANN401
+    """Rebuild vkpymusic models from cached data."""
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict) and value.get("__model__") in _MODELS:
+        data = dict(value)
+        model = _MODELS[data.pop("__model__")]
+        obj = model.__new__(model)
+        obj.__dict__.update(data)
+        return obj
+    return value
+
+
+class ResponseCache:
+    """Compressed VK responses, one file per call, under ``cache_path``.
+
+    Fresh entries are returned without calling VK. Stale entries are
+    returned at once while a background refresh replaces them, and are
+    also the fallback when VK fails.
+    """
+
+    def __init__(self, path: pathlib.Path, max_stale: int = MAX_STALE) -> None:
+        """Initialize the cache.
+
+        Args:
+            path: Directory holding the entries.
+            max_stale: Seconds after which an entry is no longer served
+                without refetching first.
+        """
+        self.path = path
+        self.max_stale = max_stale
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="VKMCacheRefresh"
+        )
+
+    @staticmethod
+    def key(namespace: str, method: str, args: tuple, kwargs: dict[str, Any]) -> str:
+        """Build the key of a call.
+
+        Args:
+            namespace: Separates the accounts sharing the cache.
+            method: The service method.
+            args: Positional arguments.
+            kwargs: Keyword arguments.
+
+        Returns:
+            A hex digest.
+        """
+        call = json.dumps(
+            [namespace, method, list(args), sorted(kwargs.items())], default=str
+        )
+        return hashlib.sha1(call.encode("utf-8")).hexdigest()  # noqa: S324
+
+    def call(  # noqa: PLR0913
+        self,
+        key: str,
+        ttl: int,
+        func: Callable[..., Any],
+        args: tuple,
+        kwargs: dict[str, Any],
+        *,
+        refresh: bool = False,
+    ) -> Any:  # noqa: ANN401
+        """Answer a call from the cache, calling VK when needed.
+
+        Args:
+            key: The key from :meth:`key`.
+            ttl: Seconds the response stays fresh.
+            func: The service method.
+            args: Positional arguments.
+            kwargs: Keyword arguments.
+            refresh: Always call VK and store the result, e.g. for the
+                library sync which must see VK's current state.
+
+        Returns:
+            The response.
+        """
+        entry = None if refresh else self._read(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < ttl:
+                return entry[1]
+            if age < self.max_stale:
+                self._revalidate(key, func, args, kwargs)
+                return entry[1]
+        try:
+            value = func(*args, **kwargs)
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning("Serving cached VK response after error: %s", e)
+            return entry[1]
+        self._write(key, value)
+        return value
+
+    def _revalidate(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Refresh an entry in the background, once at a time."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run() -> None:
+            # Not released: the refreshed entry is fresh for other
+            # instances, which only need to refresh once the lease expires
+            lease = Lease(self.path / "leases", key, REFRESH_LEASE)
+            try:
+                if lease.acquire():
+                    self._write(key, func(*args, **kwargs))
+            except Exception as e:  # noqa: BLE001
+                logger.debug("Background refresh of VK response failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        return self.path / key[:2] / f"{key}.cache"
+
+    def _read(self, key: str) -> tuple[float, Any] | None:
+        """Read and decompress an entry."""
+        try:
+            raw = self._entry_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.exception("Failed to read cached VK response")
+            return None
+        try:
+            codec, payload = raw[:1], raw[1:]
+            data = (
+                lzma.decompress(payload) if codec == LZMA else zlib.decompress(payload)
+            )
+            entry = json.loads(data)
+            return entry["stored_at"], _decode(entry["value"])
+        except (lzma.LZMAError, zlib.error, ValueError, KeyError):
+            logger.warning("Ignoring corrupt cached VK response %s", key)
+            return None
+
+    def _write(self, key: str, value: Any) -> None:  # noqa: ANN401
+        """Compress and store an entry (atomic replace)."""
+        data = json.dumps(
+            {"stored_at": time.time(), "value": _encode(value)}, ensure_ascii=False
+        ).encode("utf-8")
+        if len(data) > LZMA_THRESHOLD:
+            raw = LZMA + lzma.compress(data, preset=1)
+        else:
+            raw = ZLIB + zlib.compress(data)
+        try:
+            publish(self._entry_path(key), raw)
+        except OSError:
+            logger.exception("Failed to cache VK response")
+
+    def prune(self) -> int:
+        """Delete entries older than ``max_stale``.
+
+        Only one instance sharing the directory prunes it per
+        ``PRUNE_LEASE``.
+
+        Returns:
+            The number of entries deleted.
+        """
+        if not self.path.is_dir():
+            return 0
+        if not Lease(self.path / "leases", "prune", PRUNE_LEASE).acquire():
+            return 0
+        cutoff = time.time() - self.max_stale
+        removed = 0
+        for path in self.path.glob("*/*.cache"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                logger.debug("Failed to prune %s", path)
+        for path in self.path.glob("leases/*.lease"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                logger.debug("Failed to prune %s", path)
+        if removed:
+            logger.info("Pruned %d cached VK responses", removed)
+        return removed
+
+    def shutdown(self) -> None:
+        """Stop background refreshes."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CachingService:
+    """Proxy for the VK service answering idempotent reads from the cache."""
+
+    def __init__(
+        self,
+        service: Any,  # noqa: ANN401
+        cache: ResponseCache,
+        namespace: str = "",
+        *,
+        refresh: bool = False,
+    ) -> None:
+        """Initialize the proxy.
+
+        Args:
+            service: The wrapped VK service.
+            cache: The response cache.
+            namespace: The VK user ID, so accounts do not share entries.
+            refresh: Always call VK and write the results through.
+        """
+        self.service = service
+        self.cache = cache
+        self.namespace = namespace
+        self.refresh = refresh
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        """Wrap the cacheable methods of the service."""
+        attribute = getattr(self.service, name)
+        ttl = CACHE_TTLS.get(name)
+        if ttl is None or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            key = self.cache.key(self.namespace, name, args, kwargs)
+            return self.cache.call(
+                key, ttl, attribute, args, kwargs, refresh=self.refresh
+            )
+
+        return call
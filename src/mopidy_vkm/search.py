@@ -0,0 +1,214 @@
+"""Search result cache with normalized keys and prefix autocomplete."""
+
+from __future__ import annotations
+
+import bisect
+import collections
+import logging
+import threading
+import time
+from typing import Any
+
+from mopidy_vkm.memory import CacheMeter, estimate_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+SUGGESTION_RESULTS = 5
+
+
+def normalize_text(text: str) -> str:
+    """Normalize free text for cache keys.
+
+    Lowercases, folds ``ё`` into its plain form and collapses whitespace.
+
+    Args:
+        text: The text to normalize.
+
+    Returns:
+        The normalized text.
+    """
+    return " ".join(text.lower().replace("ё", "е").split())  # noqa: RUF001
+
+
+def normalize_query(query: dict[str, list[str] | str], *, exact: bool = False) -> str:
+    """Build a cache key for a Mopidy search query.
+
+    Field order, value order, case, whitespace and ``ё`` spelling
+    differences do not change the key.
+
+    Args:
+        query: The Mopidy search query (field -> values).
+        exact: Whether the search is exact.
+
+    Returns:
+        The normalized cache key.
+    """
+    parts = []
+    for field in sorted(query):
+        values = query[field]
+        if isinstance(values, str):
+            values = [values]
+        normalized = sorted(filter(None, (normalize_text(v) for v in values)))
+        if normalized:
+            parts.append(f"{field}={' '.join(normalized)}")
+    key = "&".join(parts)
+    return f"exact:{key}" if exact else key
+
+
+class SearchCache:
+    """TTL/LRU cache of search results plus a prefix index of past queries."""
+
+    def __init__(self, ttl: int, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """Initialize the cache.
+
+        Args:
+            ttl: Seconds a cached result stays valid, 0 disables caching.
+            max_entries: Maximum number of cached queries.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.meter = CacheMeter("search", weight=2.0)
+        self._entries: collections.OrderedDict[
+            str, tuple[float, list[dict[str, Any]]]
+        ] = collections.OrderedDict()
+        # Sorted free-text queries and their top results for autocomplete
+        self._prefix_keys: list[str] = []
+        self._prefix_results: dict[str, tuple[float, list[dict[str, Any]]]] = {}
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        """Lookups answered from the cache."""
+        return self.meter.hits
+
+    @property
+    def misses(self) -> int:
+        """Lookups the cache could not answer."""
+        return self.meter.misses
+
+    def get(
+        self, key: str, *, allow_stale: bool = False
+    ) -> list[dict[str, Any]] | None:
+        """Get cached results.
+
+        Expired entries are kept until evicted so they can still be served
+        while VK is unreachable.
+
+        Args:
+            key: The normalized query key.
+            allow_stale: Whether to return results older than the TTL.
+
+        Returns:
+            The cached song dicts or None on a miss.
+        """
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (
+                not allow_stale and time.monotonic() - entry[0] > self.ttl
+            ):
+                self.meter.miss()
+                return None
+            self._entries.move_to_end(key)
+            self.meter.hit()
+            return entry[1]
+
+    def set(self, key: str, results: list[dict[str, Any]], text: str = "") -> None:
+        """Store results.
+
+        Args:
+            key: The normalized query key.
+            results: The song dicts to cache.
+            text: The free-text part of the query, indexed for autocomplete.
+        """
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now, results)
+            # Suggestions share the result dicts, so only entries are counted
+            self._sizes[key] = estimate_size(key) + estimate_size(results)
+            self.meter.grow(self._sizes[key])
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+            text = normalize_text(text)
+            if text:
+                if text not in self._prefix_results:
+                    bisect.insort(self._prefix_keys, text)
+                self._prefix_results[text] = (now, results[:SUGGESTION_RESULTS])
+                self._trim_prefix_index()
+        self.meter.check()
+
+    def _remove(self, key: str) -> int:
+        """Drop an entry (lock held) and return its size."""
+        del self._entries[key]
+        size = self._sizes.pop(key)
+        self.meter.shrink(size)
+        return size
+
+    def evict(self, size: int) -> int:
+        """Drop the least recently used results.
+
+        Args:
+            size: Bytes to free.
+
+        Returns:
+            The bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            while self._entries and freed < size:
+                freed += self._remove(next(iter(self._entries)))
+        return freed
+
+    def _trim_prefix_index(self) -> None:
+        """Drop the oldest autocomplete entries beyond ``max_entries``."""
+        excess = len(self._prefix_keys) - self.max_entries
+        if excess <= 0:
+            return
+        oldest = sorted(self._prefix_results, key=lambda k: self._prefix_results[k][0])
+        for text in oldest[:excess]:
+            del self._prefix_results[text]
+        self._prefix_keys = sorted(self._prefix_results)
+
+    def suggest(self, prefix: str, limit: int = 10) -> list[dict[str, Any]]:
+        """Suggest previous queries starting with a prefix.
+
+        Args:
+            prefix: The typed prefix.
+            limit: Maximum number of suggestions.
+
+        Returns:
+            Suggestions with ``query`` and its top ``results``, most recent
+            first.
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._prefix_keys, prefix)
+            matches = []
+            for text in self._prefix_keys[start:]:
+                if not text.startswith(prefix):
+                    break
+                matches.append((self._prefix_results[text][0], text))
+            matches.sort(reverse=True)
+            return [
+                {"query": text, "results": self._prefix_results[text][1]}
+                for _, text in matches[:limit]
+            ]
+
+    def clear(self) -> None:
+        """Drop all cached results and suggestions."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.meter.shrink(self.meter.size, self.meter.entries)
+            self._prefix_keys = []
+            self._prefix_results = {}
@@ -0,0 +1,220 @@
+"""Bandwidth sharing between playback and background transfers."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.playback import STREAM_BYTE_RATE
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from mopidy_vkm.quality import ThroughputMonitor
+
+logger = logging.getLogger(__name__)
+
+# Bytes/s kept free for the playing stream: twice its bitrate, so that the
+# player's buffer refills after a dip
+PLAYBACK_RESERVE = 2 * STREAM_BYTE_RATE
+# Bytes/s background transfers still get while playing on an unknown or
+# saturated link, so that they finish eventually
+MIN_BACKGROUND_RATE = 16 * 1024
+# Bytes background transfers may send at once after being idle
+BURST = 64 * 1024
+# Seconds background transfers pause after playback stalled
+BACKOFF = 15.0
+# Seconds relayed playback bytes count as playing without a state change
+PLAYBACK_HOLD = 10.0
+# Seconds between polls of another process's playback state
+POLL_INTERVAL = 5.0
+# Longest single sleep, so that a stall is noticed quickly
+MAX_SLEEP = 1.0
+
+
+class TokenBucket:
+    """Token bucket whose refill rate is given with each request."""
+
+    def __init__(self, burst: int = BURST) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            burst: Bucket size in bytes.
+        """
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def reserve(self, size: int, rate: float) -> float:
+        """Take tokens for a transfer, going into debt if needed.
+
+        Args:
+            size: Bytes about to be transferred.
+            rate: Refill rate in bytes/s.
+
+        Returns:
+            Seconds to wait before the transfer.
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated) * rate, float(self.burst)
+        )
+        self._updated = now
+        self._tokens -= size
+        return max(-self._tokens / rate, 0.0)
+
+
+class TrafficShaper:
+    """Gives playback the bandwidth it needs and background transfers the rest.
+
+    Playback bytes are never delayed. Background transfers (preroll, sync,
+    warm-up downloads) pass through a token bucket: unlimited apart from
+    ``background_limit`` while nothing plays, and the measured link rate
+    minus ``PLAYBACK_RESERVE`` while something does. A playback stall
+    pauses them for ``BACKOFF`` seconds.
+    """
+
+    def __init__(
+        self,
+        monitor: ThroughputMonitor,
+        background_limit: int = 0,
+        state_source: Callable[[], dict[str, Any] | None] | None = None,
+    ) -> None:
+        """Initialize the shaper.
+
+        Args:
+            monitor: Throughput measurements and playback stalls.
+            background_limit: Bytes/s background transfers may use at most
+                (0 for no fixed cap).
+            state_source: Callable returning the :meth:`stats` of the
+                shaper in another process whose playback should be
+                protected too, or None.
+        """
+        self.monitor = monitor
+        self.background_limit = background_limit
+        self.state_source = state_source
+        self._playing = False
+        self._last_playback: float | None = None
+        self._playback_bytes = 0
+        self._background_bytes = 0
+        self._bucket = TokenBucket()
+        self._remote: dict[str, Any] = {}
+        self._polled: float | None = None
+        self._lock = threading.Lock()
+
+    def set_playing(self, playing: bool) -> None:  # noqa: FBT001
+        """Record whether the player is playing.
+
+        Args:
+            playing: True while playback is running.
+        """
+        self._playing = playing
+
+    def playback(self, size: int) -> None:
+        """Account for playback bytes relayed by this process.
+
+        Args:
+            size: Bytes relayed.
+        """
+        with self._lock:
+            self._playback_bytes += size
+            self._last_playback = time.monotonic()
+
+    def is_playing(self) -> bool:
+        """Check whether playback needs protecting.
+
+        Returns:
+            True while playing, here or in the followed process.
+        """
+        last = self._last_playback
+        return (
+            self._playing
+            or (last is not None and time.monotonic() - last < PLAYBACK_HOLD)
+            or bool(self._remote.get("playing"))
+        )
+
+    def pause_remaining(self) -> float:
+        """Get the rest of the pause after a playback stall.
+
+        Returns:
+            Seconds background transfers still wait, or 0.
+        """
+        self._poll()
+        if self._remote.get("paused"):
+            return POLL_INTERVAL
+        stall = self.monitor.last_stall
+        if stall is None or not self.is_playing():
+            return 0.0
+        return max(stall + BACKOFF - time.monotonic(), 0.0)
+
+    def background_rate(self) -> float | None:
+        """Get the rate background transfers may use now.
+
+        Returns:
+            Bytes/s, or None for no limit.
+        """
+        limit = self.background_limit or None
+        if not self.is_playing():
+            return limit
+        link = self._link_rate()
+        rate = (
+            max(link - PLAYBACK_RESERVE, MIN_BACKGROUND_RATE)
+            if link
+            else MIN_BACKGROUND_RATE
+        )
+        return min(rate, limit) if limit else rate
+
+    def _link_rate(self) -> float | None:
+        """Measured link rate in bytes/s, here or in the followed process."""
+        kbps = self.monitor.kbps
+        if kbps is not None:
+            return kbps * 1000 / 8
+        return self._remote.get("link_rate")
+
+    def background(self, size: int) -> None:
+        """Wait until a background transfer may proceed.
+
+        Args:
+            size: Bytes about to be transferred.
+        """
+        self._wait(0.0)
+        rate = self.background_rate()
+        with self._lock:
+            self._background_bytes += size
+            delay = self._bucket.reserve(size, rate) if rate else 0.0
+        self._wait(delay)
+
+    def _wait(self, delay: float) -> None:
+        """Sleep for ``delay`` and for as long as a pause lasts."""
+        deadline = time.monotonic() + delay
+        while (wait := max(self.pause_remaining(), deadline - time.monotonic())) > 0:
+            time.sleep(min(wait, MAX_SLEEP))
+
+    def _poll(self) -> None:
+        """Refresh the followed process's state every ``POLL_INTERVAL``."""
+        if self.state_source is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._polled is not None and now - self._polled < POLL_INTERVAL:
+                return
+            self._polled = now
+        self._remote = self.state_source() or {}
+
+    def stats(self) -> dict[str, Any]:
+        """Report the shaper state.
+
+        Returns:
+            Whether playback is protected or background transfers paused,
+            the background and link rates in bytes/s, and byte counts.
+        """
+        return {
+            "playing": self.is_playing(),
+            "paused": self.pause_remaining() > 0,
+            "background_rate": self.background_rate(),
+            "link_rate": self._link_rate(),
+            "playback_bytes": self._playback_bytes,
+            "background_bytes": self._background_bytes,
+        }
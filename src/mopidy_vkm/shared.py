@@ -0,0 +1,245 @@
+"""Coordination of several Mopidy instances sharing one ``cache_path``.
+
+Files are published atomically under unique temporary names, writers
+serialise on ``fcntl`` record locks (which NFS forwards to the server),
+and long-running work such as analysing a track or refreshing a response
+is claimed with an expiring lease so that only one instance does it.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in leases; the host matters on shared NFS
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+LOCK_SUFFIX = ".lock"
+LEASE_SUFFIX = ".lease"
+
+# fcntl locks belong to the process, so threads also need their own lock
+_thread_locks: dict[str, threading.Lock] = {}
+_thread_locks_lock = threading.Lock()
+
+
+def temp_path(path: pathlib.Path) -> pathlib.Path:
+    """Get a temporary path next to a file, unique to this process and thread.
+
+    Args:
+        path: The file about to be written.
+
+    Returns:
+        A hidden sibling path.
+    """
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def publish(path: pathlib.Path, data: bytes) -> None:
+    """Write a file so that other processes see either nothing or all of it.
+
+    Args:
+        path: The target file.
+        data: Its content.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = temp_path(path)
+    try:
+        with temp.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        temp.replace(path)
+    except OSError:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path: pathlib.Path) -> Iterator[None]:
+    """Hold the exclusive lock of a file across threads and processes.
+
+    The lock is taken on ``<path>.lock`` so that the file itself can be
+    replaced while it is held.
+
+    Args:
+        path: The file to lock.
+
+    Yields:
+        Nothing; the lock is held inside the block.
+    """
+    lock_path = path.with_name(path.name + LOCK_SUFFIX)
+    with _thread_locks_lock:
+        thread_lock = _thread_locks.setdefault(str(lock_path), threading.Lock())
+    with thread_lock:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with lock_path.open("a") as f:
+            fcntl.lockf(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(f, fcntl.LOCK_UN)
+
+
+class Lease:
+    """Expiring claim on a piece of work, shared through a directory.
+
+    A lease left behind by a crashed instance expires after ``ttl`` and can
+    then be taken over. All leases of a directory share one lock, so
+    expired lease files can be deleted without leaving lock files behind.
+    """
+
+    def __init__(self, directory: pathlib.Path, name: str, ttl: float) -> None:
+        """Initialize the lease.
+
+        Args:
+            directory: Directory holding the lease files.
+            name: The work claimed, e.g. an audio ID.
+            ttl: Seconds the claim is valid without renewal.
+        """
+        self.path = directory / f"{name}{LEASE_SUFFIX}"
+        self.ttl = ttl
+
+    def _holder(self) -> dict[str, Any] | None:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.debug("Ignoring unreadable lease %s", self.path)
+            return None
+
+    def acquire(self) -> bool:
+        """Claim the work unless another instance holds a valid lease.
+
+        Acquiring a lease this process already holds renews it.
+
+        Returns:
+            Whether this process now holds the lease.
+        """
+        try:
+            with file_lock(self.path.parent):
+                holder = self._holder()
+                if (
+                    holder is not None
+                    and holder.get("owner") != OWNER
+                    and holder.get("expires", 0) > time.time()
+                ):
+                    return False
+                publish(
+                    self.path,
+                    json.dumps(
+                        {"owner": OWNER, "expires": time.time() + self.ttl}
+                    ).encode("utf-8"),
+                )
+                return True
+        except OSError:
+            logger.exception("Failed to acquire lease %s", self.path)
+            return False
+
+    def release(self) -> None:
+        """Give up the lease if this process holds it."""
+        try:
+            with file_lock(self.path.parent):
+                holder = self._holder()
+                if holder is not None and holder.get("owner") == OWNER:
+                    self.path.unlink(missing_ok=True)
+        except OSError:
+            logger.exception("Failed to release lease %s", self.path)
+
+
+class SharedJsonFile:
+    """JSON object on disk that several processes update key by key.
+
+    Each process only writes the keys it changed, merged into the current
+    file under its lock, so concurrent writers never drop each other's
+    entries.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Initialize the file.
+
+        Args:
+            path: The JSON file.
+        """
+        self.path = path
+        self._seen: tuple[int, int] | None = None
+
+    def _stamp(self) -> tuple[int, int] | None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def changed(self) -> bool:
+        """Check whether another process published the file since it was read.
+
+        Returns:
+            True if the file changed since the last load or merge.
+        """
+        return self._stamp() != self._seen
+
+    def load(self) -> dict[str, Any]:
+        """Read the file.
+
+        Returns:
+            The JSON object, or an empty dict if the file does not exist.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not valid JSON.
+        """
+        self._seen = self._stamp()
+        return self._read()
+
+    def merge(
+        self, updates: dict[str, Any], removed: Iterable[str] = ()
+    ) -> dict[str, Any]:
+        """Write changed keys into the file.
+
+        Args:
+            updates: Keys set or replaced by this process.
+            removed: Keys deleted by this process.
+
+        Returns:
+            The merged object, including other processes' entries.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        with file_lock(self.path):
+            try:
+                data = self._read()
+            except ValueError:
+                logger.warning("Replacing corrupt shared file %s", self.path)
+                data = {}
+            data.update(updates)
+            for key in removed:
+                data.pop(key, None)
+            publish(self.path, json.dumps(data).encode("utf-8"))
+            self._seen = self._stamp()
+        return data
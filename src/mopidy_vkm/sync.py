@@ -0,0 +1,583 @@
+"""Incremental background synchronisation of the VK library."""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import logging
+import pathlib
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.memory import CacheMeter, estimate_size
+from mopidy_vkm.shared import file_lock, publish
+from mopidy_vkm.translator import playlist_to_dict, song_to_dict
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+JITTER = 0.1
+# Rough size of a VK API response page, for bandwidth shaping
+RESPONSE_BYTES = 32 * 1024
+
+MY_MUSIC = "my_music"
+PLAYLISTS = "playlists"
+RECOMMENDATIONS = "recommendations"
+COLLECTIONS = (MY_MUSIC, PLAYLISTS, RECOMMENDATIONS)
+
+
+class BudgetExhaustedError(Exception):
+    """Raised when a sync cycle has used up its API call budget."""
+
+
+class ApiBudget:
+    """Per-cycle budget of VK API calls."""
+
+    def __init__(
+        self, limit: int, throttle: Callable[[int], None] | None = None
+    ) -> None:
+        """Initialize the budget.
+
+        Args:
+            limit: Maximum number of API calls allowed in the cycle.
+            throttle: Called with the expected response bytes before calls
+                are made, to wait for bandwidth.
+        """
+        self.limit = limit
+        self.throttle = throttle
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        """Number of API calls left in the cycle."""
+        return max(self.limit - self.used, 0)
+
+    def spend(self, calls: int = 1) -> None:
+        """Account for API calls about to be made.
+
+        Args:
+            calls: Number of calls.
+
+        Raises:
+            BudgetExhaustedError: If the budget does not allow the calls.
+        """
+        if self.used + calls > self.limit:
+            msg = f"API budget of {self.limit} calls exhausted"
+            raise BudgetExhaustedError(msg)
+        self.used += calls
+        if self.throttle is not None:
+            self.throttle(calls * RESPONSE_BYTES)
+
+
+def page_hash(items: list[dict[str, Any]]) -> str:
+    """Compute a stable hash of a page of items.
+
+    Args:
+        items: Song or playlist dicts.
+
+    Returns:
+        A short hex digest identifying the page content.
+    """
+    digest = hashlib.sha1(usedforsecurity=False)
+    for item in items:
+        digest.update(item["id"].encode())
+        digest.update(str(item.get("count", "")).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def _page_hashes(items: list[dict[str, Any]]) -> list[str]:
+    return [
+        page_hash(items[offset : offset + PAGE_SIZE])
+        for offset in range(0, len(items), PAGE_SIZE)
+    ]
+
+
+class LibraryIndex:
+    """Thread-safe snapshot of the user's VK library, optionally persisted.
+
+    The index is registered with the memory budget so that the caches fit
+    around it, but it is never evicted: it is the library itself.
+    """
+
+    def __init__(self, path: str | pathlib.Path | None = None) -> None:
+        """Initialize the index.
+
+        Args:
+            path: Path to the JSON file the index is persisted to, or None to
+                keep it in memory only.
+        """
+        self.path = pathlib.Path(path) if path else None
+        self.version = 0
+        self._collections: dict[str, dict[str, Any]] = {}
+        self._tracks_by_id: dict[str, dict[str, Any]] = {}
+        self.meter = CacheMeter("library_index")
+        self._lock = threading.RLock()
+        self._load()
+        self._reindex()
+
+    def _load(self) -> None:
+        """Load the index from disk if it exists."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+            self.version = int(data.get("version", 0))
+            self._collections = data.get("collections", {})
+            logger.info("Loaded library index from %s", self.path)
+        except (OSError, ValueError):
+            logger.exception("Failed to load library index")
+            self._collections = {}
+
+    def save(self) -> None:
+        """Persist the index to disk (atomic replace)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"version": self.version, "collections": self._collections}
+        try:
+            with file_lock(self.path):
+                publish(self.path, json.dumps(data).encode("utf-8"))
+        except OSError:
+            logger.exception("Failed to save library index")
+
+    def get_state(self, name: str) -> dict[str, Any]:
+        """Get the stored state of a collection.
+
+        Args:
+            name: Collection name.
+
+        Returns:
+            The collection state (``count``, ``items``, ``page_hashes``,
+            ``complete``, ``synced_at``, the index ``version`` it was last
+            changed in and an optional ``pending`` partial sync), or an
+            empty dict if the collection was never synced.
+        """
+        with self._lock:
+            return self._collections.get(name, {})
+
+    def get_items(self, name: str) -> list[dict[str, Any]]:
+        """Get the items of a collection.
+
+        Args:
+            name: Collection name.
+
+        Returns:
+            The list of song or playlist dicts.
+        """
+        return self.get_state(name).get("items", [])
+
+    def find_track(self, audio_id: str) -> dict[str, Any] | None:
+        """Find a song dict by its ``owner_track`` ID.
+
+        Args:
+            audio_id: The VK audio ID.
+
+        Returns:
+            The song dict or None if it is not indexed.
+        """
+        with self._lock:
+            return self._tracks_by_id.get(audio_id)
+
+    def is_empty(self) -> bool:
+        """Check whether nothing has been synced yet."""
+        with self._lock:
+            return not self._collections
+
+    def is_synced(self, names: Iterable[str] = COLLECTIONS) -> bool:
+        """Check whether collections are fully synced.
+
+        Args:
+            names: Collection names.
+
+        Returns:
+            True if every collection is complete and has no partial sync
+            waiting to be resumed.
+        """
+        with self._lock:
+            return all(
+                self._collections.get(name, {}).get("complete")
+                and "pending" not in self._collections[name]
+                for name in names
+            )
+
+    def set_items(self, name: str, items: list[dict[str, Any]], count: int) -> None:
+        """Replace the items of a collection and bump the index version.
+
+        Args:
+            name: Collection name.
+            items: The complete list of items.
+            count: The total item count reported by VK.
+        """
+        with self._lock:
+            self.version += 1
+            self._collections[name] = {
+                "count": count,
+                "items": items,
+                "page_hashes": _page_hashes(items),
+                "complete": True,
+                "synced_at": time.time(),
+                "version": self.version,
+            }
+            self._reindex()
+        self.meter.check()
+
+    def _reindex(self) -> None:
+        """Rebuild the track lookup table and remeasure the collections."""
+        with self._lock:
+            self._tracks_by_id = {
+                item["id"]: item
+                for name in (RECOMMENDATIONS, MY_MUSIC)
+                for item in self._collections.get(name, {}).get("items", [])
+            }
+            self.meter.shrink(self.meter.size, self.meter.entries)
+            self.meter.grow(
+                sum(
+                    estimate_size(state.get("items", []))
+                    for state in self._collections.values()
+                ),
+                sum(
+                    len(state.get("items", [])) for state in self._collections.values()
+                ),
+            )
+
+    def evict(self, size: int) -> int:  # noqa: ARG002
+        """Free nothing: the index is not a cache.
+
+        Returns:
+            0.
+        """
+        return 0
+
+    def set_pending(self, name: str, pending: dict[str, Any] | None) -> None:
+        """Store (or clear) a partial sync to be resumed in the next cycle.
+
+        Args:
+            name: Collection name.
+            pending: The partial state with ``items`` and ``count``, or None.
+        """
+        with self._lock:
+            state = self._collections.setdefault(name, {"complete": False})
+            if pending is None:
+                state.pop("pending", None)
+            else:
+                state["pending"] = pending
+
+    def touch(self, name: str) -> None:
+        """Mark a collection as verified unchanged.
+
+        Args:
+            name: Collection name.
+        """
+        with self._lock:
+            if name in self._collections:
+                self._collections[name]["synced_at"] = time.time()
+
+
+def _fetch_songs(
+    service: Any,  # noqa: ANN401
+    user_id: str,
+    count: int,
+    offset: int,
+) -> list[dict[str, Any]]:
+    return [
+        song_to_dict(song)
+        for song in service.get_songs_by_userid(user_id, count, offset)
+    ]
+
+
+def _fetch_playlists(
+    service: Any,  # noqa: ANN401
+    user_id: str,
+    count: int,
+    offset: int,
+) -> list[dict[str, Any]]:
+    return [
+        playlist_to_dict(playlist)
+        for playlist in service.get_playlists_by_userid(user_id, count, offset)
+    ]
+
+
+def _splice_tail(
+    page: list[dict[str, Any]],
+    known: list[dict[str, Any]],
+    known_positions: dict[str, int],
+    fetched_count: int,
+    count: int | None,
+) -> list[dict[str, Any]] | None:
+    """Try to align the last fetched page with the known item list.
+
+    VK returns collections newest first, so additions and removals shift the
+    head of the list while the tail stays the same. If the last fetched page
+    matches a window of the known list (and the counts add up), everything
+    after that window is unchanged and does not need to be fetched again.
+
+    Returns:
+        The known items following the aligned window, or None if the page
+        cannot be aligned.
+    """
+    if not page or not known:
+        return None
+    end = known_positions.get(page[-1]["id"])
+    if end is None:
+        return None
+    # The page may also start with new items ahead of the known list
+    overlap = min(len(page), end + 1)
+    window = known[end + 1 - overlap : end + 1]
+    if [item["id"] for item in window] != [item["id"] for item in page[-overlap:]]:
+        return None
+    if any(item["id"] in known_positions for item in page[:-overlap]):
+        return None
+    tail = known[end + 1 :]
+    if count is not None and fetched_count + len(tail) != count:
+        return None
+    return tail
+
+
+class LibrarySyncScheduler:
+    """Periodically refresh the library index with delta detection.
+
+    Each cycle checks the item count and the first page of every collection,
+    which costs a couple of API calls when nothing changed. Changed
+    collections are fetched page by page only until the fetched pages line
+    up with the already indexed tail.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        index: LibraryIndex,
+        get_service: Callable[[], Any],
+        get_user_id: Callable[[], str | None],
+        interval: int,
+        api_budget: int,
+        throttle: Callable[[int], None] | None = None,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            index: The library index to keep up to date.
+            get_service: Callable returning the current VK service or None.
+            get_user_id: Callable returning the VK user ID or None.
+            interval: Seconds between sync cycles, 0 disables the background
+                thread.
+            api_budget: Maximum number of VK API calls per cycle.
+            throttle: Called with the expected response bytes before each
+                API call of background cycles, to yield bandwidth to
+                playback.
+        """
+        self.index = index
+        self.get_service = get_service
+        self.get_user_id = get_user_id
+        self.interval = interval
+        self.api_budget = api_budget
+        self.throttle = throttle
+        self._cycle_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the background sync thread."""
+        if self.interval <= 0:
+            logger.info("Background library sync disabled")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="VKMLibrarySync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background sync thread."""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def request_sync(self) -> None:
+        """Ask the background thread to run a cycle as soon as possible."""
+        self._wake_event.set()
+
+    def next_delay(self) -> float:
+        """Seconds until the next cycle, with jitter applied."""
+        jitter = self.interval * JITTER
+        return max(self.interval + random.uniform(-jitter, jitter), 1.0)  # noqa: S311
+
+    def _run(self) -> None:
+        """Background thread loop."""
+        delay = 0.0
+        while not self._stop_event.is_set():
+            self._wake_event.wait(delay)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.sync_once(background=True)
+            except Exception:
+                logger.exception("Library sync cycle failed")
+            delay = self.next_delay()
+
+    def sync_once(self, *, background: bool = False) -> bool:
+        """Run a single sync cycle.
+
+        Args:
+            background: Whether nobody waits for the cycle, as for the
+                scheduler's own cycles and warm-up. Only these are
+                throttled; a refresh asked for by a client is not.
+
+        Returns:
+            True if the cycle made progress or left more to do: a collection
+            changed, or the budget ran out and the partial sync was stored
+            to be resumed.
+        """
+        service = self.get_service()
+        user_id = self.get_user_id()
+        if service is None or not user_id:
+            logger.debug("VK service not available, skipping library sync")
+            return False
+
+        with self._cycle_lock:
+            budget = ApiBudget(self.api_budget, self.throttle if background else None)
+            progressed = False
+            try:
+                progressed |= self._sync_collection(
+                    MY_MUSIC,
+                    functools.partial(_fetch_songs, service, user_id),
+                    functools.partial(service.get_count_by_user_id, user_id),
+                    budget,
+                )
+                progressed |= self._sync_collection(
+                    PLAYLISTS,
+                    functools.partial(_fetch_playlists, service, user_id),
+                    None,
+                    budget,
+                )
+                progressed |= self._sync_recommendations(service, user_id, budget)
+            except BudgetExhaustedError:
+                logger.info(
+                    "Library sync stopped after %d API calls, resuming next cycle",
+                    budget.used,
+                )
+                progressed = True
+            finally:
+                # Also stores the cursor of a partial sync, so that a restart
+                # resumes it instead of paging from the start again
+                if progressed:
+                    self.index.save()
+            logger.debug(
+                "Library sync cycle done: %d API calls, progressed=%s",
+                budget.used,
+                progressed,
+            )
+            return progressed
+
+    def _sync_collection(
+        self,
+        name: str,
+        fetch_page: Callable[[int, int], list[dict[str, Any]]],
+        fetch_count: Callable[[], int] | None,
+        budget: ApiBudget,
+    ) -> bool:
+        """Sync one paged collection.
+
+        Returns:
+            True if the collection changed or a partial sync of it finished.
+        """
+        state = self.index.get_state(name)
+        known = state.get("items", []) if state.get("complete") else []
+
+        count = None
+        if fetch_count is not None:
+            budget.spend()
+            count = fetch_count()
+
+        budget.spend()
+        first_page = fetch_page(PAGE_SIZE, 0)
+
+        # Resume a partial sync if the head of the list did not move since
+        pending = state.get("pending")
+        if (
+            pending
+            and pending.get("count") == count
+            and pending.get("first_page") == page_hash(first_page)
+        ):
+            fetched = pending["items"]
+        else:
+            fetched = first_page
+
+        known_positions = {item["id"]: pos for pos, item in enumerate(known)}
+        last_page = fetched[-PAGE_SIZE:]
+        while True:
+            # A short page ends the collection: known items after it are gone
+            tail = (
+                None
+                if len(last_page) < PAGE_SIZE
+                else _splice_tail(
+                    last_page, known, known_positions, len(fetched), count
+                )
+            )
+            if tail is not None:
+                items = fetched + tail
+                break
+            if len(last_page) < PAGE_SIZE or (
+                count is not None and len(fetched) >= count
+            ):
+                items = fetched
+                break
+            try:
+                budget.spend()
+            except BudgetExhaustedError:
+                self.index.set_pending(
+                    name,
+                    {
+                        "count": count,
+                        "first_page": page_hash(first_page),
+                        "items": fetched,
+                    },
+                )
+                raise
+            last_page = fetch_page(PAGE_SIZE, len(fetched))
+            fetched = fetched + last_page
+
+        self.index.set_pending(name, None)
+        if state.get("complete") and _page_hashes(items) == state.get("page_hashes"):
+            self.index.touch(name)
+            # A finished partial sync still has to be cleared on disk
+            return pending is not None
+
+        self.index.set_items(name, items, count if count is not None else len(items))
+        logger.info("Library collection %s updated: %d items", name, len(items))
+        return True
+
+    def _sync_recommendations(
+        self,
+        service: Any,  # noqa: ANN401
+        user_id: str,
+        budget: ApiBudget,
+    ) -> bool:
+        """Sync the single-page recommendations collection.
+
+        Returns:
+            True if the recommendations changed.
+        """
+        budget.spend()
+        items = [
+            song_to_dict(song)
+            for song in service.get_recommendations(user_id=user_id, count=PAGE_SIZE)
+        ]
+        state = self.index.get_state(RECOMMENDATIONS)
+        if state.get("complete") and _page_hashes(items) == state.get("page_hashes"):
+            self.index.touch(RECOMMENDATIONS)
+            return False
+        self.index.set_items(RECOMMENDATIONS, items, len(items))
+        return True
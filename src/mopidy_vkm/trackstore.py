@@ -0,0 +1,256 @@
+"""Persistent track metadata for instant tracklist restore."""
+
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.memory import CacheMeter, estimate_size
+from mopidy_vkm.shared import SharedJsonFile
+from mopidy_vkm.translator import song_to_dict
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKS = 10000
+# Entries older than this are served, then refreshed from VK in the background
+REVALIDATE_AFTER = 24 * 60 * 60
+# Audio IDs per get_songs_by_id call
+REVALIDATE_BATCH = 100
+# Seconds changes are collected before being written or revalidated
+SAVE_DELAY = 10.0
+REVALIDATE_DELAY = 5.0
+
+
+class TrackStore:
+    """Song dicts of every track handed to Mopidy, kept on disk.
+
+    When Mopidy restores its tracklist and history after a restart it looks
+    up every URI again. Answering those from this store instead of VK
+    brings the queue back at once; entries that are due are refreshed
+    afterwards in batches. Under memory pressure saved entries are dropped
+    from memory only, so they are still there after the next restart.
+    """
+
+    def __init__(
+        self,
+        get_service: Callable[[], Any],
+        path: pathlib.Path | None = None,
+        max_tracks: int = MAX_TRACKS,
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            get_service: Callable returning the VK service or None.
+            path: File the store is kept in, or None to keep it in memory
+                only.
+            max_tracks: Entries kept; the least recently used are dropped.
+        """
+        self.get_service = get_service
+        self.max_tracks = max_tracks
+        self.meter = CacheMeter("track_metadata")
+        self._file = SharedJsonFile(path) if path else None
+        self._entries: collections.OrderedDict[str, dict[str, Any]] = (
+            collections.OrderedDict()
+        )
+        self._dirty: set[str] = set()
+        self._removed: set[str] = set()
+        self._stale: set[str] = set()
+        self._lock = threading.Lock()
+        self._save_timer: threading.Timer | None = None
+        self._revalidate_timer: threading.Timer | None = None
+        self._load()
+
+    def _load(self) -> None:
+        """Load the stored entries, oldest first."""
+        if self._file is None:
+            return
+        try:
+            entries = self._file.load()
+        except (OSError, ValueError):
+            logger.exception("Failed to load track metadata")
+            return
+        with self._lock:
+            for audio_id, entry in sorted(
+                entries.items(), key=lambda item: item[1].get("checked_at", 0)
+            ):
+                self._put(audio_id, entry)
+            self._trim()
+        self.meter.check()
+
+    def get(self, audio_id: str) -> dict[str, Any] | None:
+        """Get the song dict of a track.
+
+        Args:
+            audio_id: The VK audio ID.
+
+        Returns:
+            The song dict, or None if the track is unknown.
+        """
+        with self._lock:
+            entry = self._entries.get(audio_id)
+            if entry is None:
+                self.meter.miss()
+                return None
+            self.meter.hit()
+            self._entries.move_to_end(audio_id)
+            due = time.time() - entry["checked_at"] > REVALIDATE_AFTER
+            if due:
+                self._stale.add(audio_id)
+        if due:
+            self._schedule("_revalidate_timer", REVALIDATE_DELAY, self.revalidate)
+        return entry["song"]
+
+    def add(self, songs: Iterable[dict[str, Any]]) -> None:
+        """Remember song dicts handed to Mopidy.
+
+        Args:
+            songs: Song dicts, e.g. from the index, a search or a playlist.
+        """
+        now = time.time()
+        changed = False
+        with self._lock:
+            for song in songs:
+                audio_id = song["id"]
+                entry = self._entries.get(audio_id)
+                if entry is not None and entry["song"] == song:
+                    self._entries.move_to_end(audio_id)
+                    continue
+                self._put(audio_id, {"song": song, "checked_at": now})
+                self._entries.move_to_end(audio_id)
+                self._dirty.add(audio_id)
+                self._removed.discard(audio_id)
+                changed = True
+            self._trim()
+        if changed:
+            self.meter.check()
+            self._schedule("_save_timer", SAVE_DELAY, self.save)
+
+    def _put(self, audio_id: str, entry: dict[str, Any]) -> None:
+        """Store an entry, keeping the place of one it replaces (lock held)."""
+        old = self._entries.get(audio_id)
+        if old is None:
+            self.meter.grow(estimate_size(audio_id) + estimate_size(entry))
+        else:
+            self.meter.shrink(estimate_size(old), entries=0)
+            self.meter.grow(estimate_size(entry), entries=0)
+        self._entries[audio_id] = entry
+
+    def _remove(self, audio_id: str) -> int:
+        """Drop an entry from memory (lock held) and return its size."""
+        size = estimate_size(audio_id) + estimate_size(self._entries.pop(audio_id))
+        self.meter.shrink(size)
+        return size
+
+    def _trim(self) -> None:
+        """Drop the least recently used entries beyond the limit (lock held)."""
+        while len(self._entries) > self.max_tracks:
+            audio_id = next(iter(self._entries))
+            self._remove(audio_id)
+            self._dirty.discard(audio_id)
+            self._removed.add(audio_id)
+
+    def evict(self, size: int) -> int:
+        """Drop the least recently used saved entries from memory.
+
+        Entries not saved yet are kept, and dropped ones stay in the file.
+
+        Args:
+            size: Bytes to free.
+
+        Returns:
+            The bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            saved = [
+                audio_id for audio_id in self._entries if audio_id not in self._dirty
+            ]
+            for audio_id in saved:
+                if freed >= size:
+                    break
+                freed += self._remove(audio_id)
+                self._stale.discard(audio_id)
+        return freed
+
+    def _schedule(self, name: str, delay: float, func: Callable[[], Any]) -> None:
+        """Run ``func`` once after ``delay`` unless it is already pending."""
+        with self._lock:
+            timer = getattr(self, name)
+            if timer is not None and timer.is_alive():
+                return
+            timer = threading.Timer(delay, func)
+            timer.name = "VKMTrackStore"
+            timer.daemon = True
+            setattr(self, name, timer)
+        timer.start()
+
+    def revalidate(self) -> int:
+        """Refresh due entries from VK.
+
+        Returns:
+            The number of entries refreshed.
+        """
+        service = self.get_service()
+        if service is None:
+            return 0
+        refreshed = 0
+        while True:
+            with self._lock:
+                batch = list(self._stale)[:REVALIDATE_BATCH]
+                self._stale.difference_update(batch)
+            if not batch:
+                break
+            try:
+                songs = service.get_songs_by_id(batch)
+            except Exception:
+                logger.exception("Failed to revalidate VK track metadata")
+                break
+            now = time.time()
+            with self._lock:
+                for song in map(song_to_dict, songs):
+                    if song["id"] in self._entries:
+                        self._put(song["id"], {"song": song, "checked_at": now})
+                        self._dirty.add(song["id"])
+                        refreshed += 1
+        if refreshed:
+            self.save()
+        return refreshed
+
+    def save(self) -> None:
+        """Merge the changed entries into the file."""
+        if self._file is None:
+            return
+        with self._lock:
+            updates = {
+                audio_id: self._entries[audio_id]
+                for audio_id in self._dirty
+                if audio_id in self._entries
+            }
+            removed = set(self._removed)
+            self._dirty.clear()
+            self._removed.clear()
+        if not updates and not removed:
+            return
+        try:
+            self._file.merge(updates, removed)
+        except OSError:
+            logger.exception("Failed to save track metadata")
+            with self._lock:
+                self._dirty.update(updates)
+                self._removed.update(removed)
+
+    def stop(self) -> None:
+        """Cancel pending timers and save."""
+        with self._lock:
+            timers = [self._save_timer, self._revalidate_timer]
+        for timer in timers:
+            if timer is not None:
+                timer.cancel()
+        self.save()
@@ -0,0 +1,194 @@
+"""Translation between VK objects and Mopidy models."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from mopidy.models import Artist, Ref, Track
+
+logger = logging.getLogger(__name__)
+
+URI_SCHEME = "vkm"
+
+ROOT_URI = "vkm:root"
+MY_MUSIC_URI = "vkm:directory:my_music"
+PLAYLISTS_URI = "vkm:directory:playlists"
+RECOMMENDATIONS_URI = "vkm:directory:recommendations"
+
+TRACK_URI_PREFIX = "vkm:track:"
+PLAYLIST_URI_PREFIX = "vkm:playlist:"
+
+
+def track_uri(owner_id: str | int, track_id: str | int) -> str:
+    """Build a track URI.
+
+    Args:
+        owner_id: VK owner ID of the audio.
+        track_id: VK audio ID.
+
+    Returns:
+        The track URI, e.g. ``vkm:track:123_456``.
+    """
+    return f"{TRACK_URI_PREFIX}{owner_id}_{track_id}"
+
+
+def parse_track_uri(uri: str) -> str | None:
+    """Extract the VK audio ID (``owner_track``) from a track URI.
+
+    Args:
+        uri: The track URI.
+
+    Returns:
+        The audio ID or None if the URI is not a track URI.
+    """
+    if not uri.startswith(TRACK_URI_PREFIX):
+        return None
+    audio_id = uri[len(TRACK_URI_PREFIX) :]
+    owner_id, _, track_id = audio_id.rpartition("_")
+    if not owner_id or not track_id:
+        return None
+    return audio_id
+
+
+def playlist_uri(owner_id: str | int, playlist_id: str | int, access_key: str) -> str:
+    """Build a playlist URI.
+
+    Args:
+        owner_id: VK owner ID of the playlist.
+        playlist_id: VK playlist ID.
+        access_key: VK access key of the playlist (may be empty).
+
+    Returns:
+        The playlist URI, e.g. ``vkm:playlist:123_4:abcdef``.
+    """
+    uri = f"{PLAYLIST_URI_PREFIX}{owner_id}_{playlist_id}"
+    if access_key:
+        uri = f"{uri}:{access_key}"
+    return uri
+
+
+def parse_playlist_uri(uri: str) -> tuple[str, str, str] | None:
+    """Split a playlist URI into its parts.
+
+    Args:
+        uri: The playlist URI.
+
+    Returns:
+        A tuple of (owner_id, playlist_id, access_key) or None if the URI is
+        not a playlist URI.
+    """
+    if not uri.startswith(PLAYLIST_URI_PREFIX):
+        return None
+    ids, _, access_key = uri[len(PLAYLIST_URI_PREFIX) :].partition(":")
+    owner_id, _, playlist_id = ids.rpartition("_")
+    if not owner_id or not playlist_id:
+        return None
+    return owner_id, playlist_id, access_key
+
+
+def song_to_dict(song: object) -> dict[str, Any]:
+    """Convert a vkpymusic ``Song`` into a plain, JSON-serialisable dict.
+
+    The stream URL is intentionally dropped: VK URLs expire quickly and are
+    resolved at playback time instead.
+
+    Args:
+        song: The song object.
+
+    Returns:
+        A dictionary with the song data.
+    """
+    owner_id = str(getattr(song, "owner_id", ""))
+    track_id = str(getattr(song, "track_id", ""))
+    return {
+        "id": f"{owner_id}_{track_id}",
+        "owner_id": owner_id,
+        "track_id": track_id,
+        "title": str(getattr(song, "title", "") or ""),
+        "artist": str(getattr(song, "artist", "") or ""),
+        "duration": int(getattr(song, "duration", 0) or 0),
+    }
+
+
+def playlist_to_dict(playlist: object) -> dict[str, Any]:
+    """Convert a vkpymusic ``Playlist`` into a plain, JSON-serialisable dict.
+
+    Args:
+        playlist: The playlist object.
+
+    Returns:
+        A dictionary with the playlist data.
+    """
+    owner_id = str(getattr(playlist, "owner_id", ""))
+    playlist_id = str(getattr(playlist, "playlist_id", ""))
+    return {
+        "id": f"{owner_id}_{playlist_id}",
+        "owner_id": owner_id,
+        "playlist_id": playlist_id,
+        "access_key": str(getattr(playlist, "access_key", "") or ""),
+        "title": str(getattr(playlist, "title", "") or ""),
+        "description": str(getattr(playlist, "description", "") or ""),
+        "photo": str(getattr(playlist, "photo", "") or ""),
+        "count": int(getattr(playlist, "count", 0) or 0),
+        "update_time": int(getattr(playlist, "update_time", 0) or 0),
+    }
+
+
+def track_from_dict(
+    item: dict[str, Any], analysis: dict[str, Any] | None = None
+) -> Track:
+    """Build a Mopidy track from a song dict.
+
+    Args:
+        item: The song dict as produced by :func:`song_to_dict`.
+        analysis: Analysis of the local file, if any. Its exact duration
+            and bitrate replace VK's rounded duration.
+
+    Returns:
+        The Mopidy track.
+    """
+    artists = [Artist(name=item["artist"])] if item.get("artist") else []
+    duration = item.get("duration") or 0
+    length = int(duration * 1000) if duration else None
+    bitrate = None
+    if analysis and analysis.get("duration_ms"):
+        length = analysis["duration_ms"]
+        bitrate = analysis.get("bitrate") or None
+    return Track(
+        uri=track_uri(item["owner_id"], item["track_id"]),
+        name=item.get("title") or None,
+        artists=artists,
+        length=length,
+        bitrate=bitrate,
+    )
+
+
+def track_ref_from_dict(item: dict[str, Any]) -> Ref:
+    """Build a track ref from a song dict.
+
+    Args:
+        item: The song dict.
+
+    Returns:
+        The track ref.
+    """
+    name = item.get("title") or item["id"]
+    if item.get("artist"):
+        name = f"{item['artist']} - {name}"
+    return Ref.track(uri=track_uri(item["owner_id"], item["track_id"]), name=name)
+
+
+def playlist_ref_from_dict(item: dict[str, Any]) -> Ref:
+    """Build a playlist ref from a playlist dict.
+
+    Args:
+        item: The playlist dict as produced by :func:`playlist_to_dict`.
+
+    Returns:
+        The playlist ref.
+    """
+    return Ref.playlist(
+        uri=playlist_uri(item["owner_id"], item["playlist_id"], item["access_key"]),
+        name=item.get("title") or item["id"],
+    )
@@ -0,0 +1,272 @@
+"""Pre-population of the library index and caches of a fresh node."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import pathlib
+import urllib.request
+from typing import TYPE_CHECKING, Any
+
+from mopidy_vkm.playback import is_progressive
+from mopidy_vkm.shared import Lease, temp_path
+from mopidy_vkm.sync import PLAYLISTS
+from mopidy_vkm.translator import parse_playlist_uri, playlist_uri
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from mopidy_vkm.playlists import PlaylistSnapshots
+    from mopidy_vkm.shaping import TrafficShaper
+    from mopidy_vkm.sync import LibraryIndex, LibrarySyncScheduler
+
+logger = logging.getLogger(__name__)
+
+COVERS_DIR = "covers"
+TRACKS_DIR = "tracks"
+DOWNLOAD_TIMEOUT = 60
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Audio IDs per get_songs_by_id call when resolving downloads
+RESOLVE_BATCH = 100
+# Seconds another instance waits before retrying a track left half done
+DOWNLOAD_LEASE = 10 * 60
+# Sync cycles run until the index is complete; a cycle is bounded by its
+# budget
+MAX_SYNC_CYCLES = 20
+
+
+def get_covers_dir(config: dict[str, Any]) -> pathlib.Path | None:
+    """Get the directory warmed playlist covers are stored in.
+
+    Args:
+        config: The ``vkm`` configuration section.
+
+    Returns:
+        ``<cache_path>/covers`` or None without a cache path.
+    """
+    cache_path = config.get("cache_path")
+    return pathlib.Path(cache_path) / COVERS_DIR if cache_path else None
+
+
+def download_file(
+    url: str, path: pathlib.Path, shaper: TrafficShaper | None = None
+) -> int:
+    """Download a file and publish it once complete.
+
+    Args:
+        url: The URL.
+        path: The target file.
+        shaper: Shaper the download yields to playback through.
+
+    Returns:
+        The number of bytes written.
+
+    Raises:
+        OSError: If the download or the write fails.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = temp_path(path)
+    size = 0
+    try:
+        with (
+            urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response,  # noqa: S310
+            temp.open("wb") as f,
+        ):
+            while True:
+                if shaper is not None:
+                    shaper.background(DOWNLOAD_CHUNK_SIZE)
+                chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                size += len(chunk)
+        temp.replace(path)
+    except OSError:
+        temp.unlink(missing_ok=True)
+        raise
+    return size
+
+
+class CacheWarmer:
+    """Fills the library index, playlist snapshots, covers and track files.
+
+    Each step runs its requests in a bounded thread pool and reports
+    progress through a callback.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        index: LibraryIndex,
+        scheduler: LibrarySyncScheduler,
+        snapshots: PlaylistSnapshots,
+        get_service: Callable[[], Any],
+        cache_path: pathlib.Path,
+        workers: int = 1,
+        progress: Callable[[str, int, int], None] | None = None,
+        shaper: TrafficShaper | None = None,
+    ) -> None:
+        """Initialize the warmer.
+
+        Args:
+            index: The library index.
+            scheduler: The sync scheduler filling the index.
+            snapshots: The playlist snapshots.
+            get_service: Callable returning the VK service or None.
+            cache_path: The ``cache_path`` directory.
+            workers: Concurrent requests per step.
+            progress: Called with the step name, done and total count.
+            shaper: Shaper downloads yield to playback through.
+        """
+        self.index = index
+        self.scheduler = scheduler
+        self.snapshots = snapshots
+        self.get_service = get_service
+        self.cache_path = cache_path
+        self.workers = max(workers, 1)
+        self.progress = progress
+        self.shaper = shaper
+
+    def sync_library(self) -> int:
+        """Sync the library index until it is complete.
+
+        Returns:
+            The number of sync cycles run.
+        """
+        cycles = 0
+        while cycles < MAX_SYNC_CYCLES:
+            cycles += 1
+            progressed = self.scheduler.sync_once(background=True)
+            if self.index.is_synced() or not progressed:
+                break
+        return cycles
+
+    def resolve_playlists(self) -> int:
+        """Load the track lists of all playlists.
+
+        Returns:
+            The number of playlists loaded.
+        """
+        uris = [
+            playlist_uri(
+                item["owner_id"], item["playlist_id"], item.get("access_key", "")
+            )
+            for item in self.index.get_items(PLAYLISTS)
+        ]
+        return self._run(
+            "playlists",
+            uris,
+            lambda uri: self.snapshots.get_tracks(uri) is not None,
+        )
+
+    def fetch_covers(self) -> int:
+        """Download the cover images of all playlists.
+
+        Returns:
+            The number of covers available locally.
+        """
+        covers = self.cache_path / COVERS_DIR
+        items = [item for item in self.index.get_items(PLAYLISTS) if item.get("photo")]
+
+        def fetch(item: dict[str, Any]) -> bool:
+            path = covers / f"{item['id']}.jpg"
+            if not path.exists():
+                download_file(item["photo"], path, self.shaper)
+            return True
+
+        return self._run("covers", items, fetch)
+
+    def download_playlists(self, uris: Iterable[str]) -> int:
+        """Download the tracks of playlists into ``<cache_path>/tracks``.
+
+        Args:
+            uris: Playlist URIs, or ``<owner_id>_<playlist_id>`` IDs of the
+                user's playlists.
+
+        Returns:
+            The number of tracks available locally.
+        """
+        audio_ids: dict[str, None] = {}
+        for uri in uris:
+            tracks = self.snapshots.get_tracks(self._playlist_uri(uri))
+            if tracks is None:
+                logger.warning("Cannot load VK playlist %s", uri)
+                continue
+            audio_ids.update(dict.fromkeys(track["id"] for track in tracks))
+
+        tracks_dir = self.cache_path / TRACKS_DIR
+        missing = [i for i in audio_ids if not (tracks_dir / f"{i}.mp3").exists()]
+        urls = self._resolve(missing)
+        leases = tracks_dir / "leases"
+
+        def download(audio_id: str) -> bool:
+            url = urls.get(audio_id)
+            if not url or not is_progressive(url):
+                # HLS streams would have to be remuxed first
+                return False
+            path = tracks_dir / f"{audio_id}.mp3"
+            lease = Lease(leases, audio_id, DOWNLOAD_LEASE)
+            if not lease.acquire():
+                return False
+            try:
+                # Another instance may have finished it since the scan
+                if not path.exists():
+                    download_file(url, path, self.shaper)
+            finally:
+                lease.release()
+            return True
+
+        done = self._run("downloads", missing, download)
+        return len(audio_ids) - len(missing) + done
+
+    def _playlist_uri(self, value: str) -> str:
+        """Accept a playlist URI or the ID of one of the user's playlists."""
+        if parse_playlist_uri(value) is not None:
+            return value
+        for item in self.index.get_items(PLAYLISTS):
+            if item["id"] == value:
+                return playlist_uri(
+                    item["owner_id"], item["playlist_id"], item.get("access_key", "")
+                )
+        return value
+
+    def _resolve(self, audio_ids: list[str]) -> dict[str, str]:
+        """Resolve stream URLs in batches."""
+        service = self.get_service()
+        if service is None or not audio_ids:
+            return {}
+        batches = [
+            audio_ids[i : i + RESOLVE_BATCH]
+            for i in range(0, len(audio_ids), RESOLVE_BATCH)
+        ]
+        urls: dict[str, str] = {}
+
+        def resolve(batch: list[str]) -> bool:
+            for song in service.get_songs_by_id(batch):
+                if getattr(song, "url", ""):
+                    urls[f"{song.owner_id}_{song.track_id}"] = song.url
+            return True
+
+        self._run("urls", batches, resolve)
+        return urls
+
+    def _run(self, step: str, items: list[Any], func: Callable[[Any], bool]) -> int:
+        """Apply ``func`` to every item in the worker pool.
+
+        Returns:
+            The number of items for which ``func`` returned True.
+        """
+        succeeded = 0
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="VKMWarm"
+        ) as executor:
+            futures = [executor.submit(func, item) for item in items]
+            for done, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1
+            ):
+                try:
+                    succeeded += bool(future.result())
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("Warming %s failed: %s", step, e)
+                if self.progress is not None:
+                    self.progress(step, done, len(items))
+        return succeeded
@@ -6,12 +6,26 @@ from typing import Any
 
 from tornado.web import StaticFileHandler
 
+from mopidy_vkm.warmer import get_covers_dir
 from mopidy_vkm.web.handlers import (
     AuthCancelHandler,
     AuthLoginHandler,
     AuthStatusHandler,
     AuthVerifyHandler,
+    BatchHandler,
+    DebugCachesHandler,
+    ExportHandler,
+    ImportHandler,
+    ImportStatusHandler,
+    LibraryApiHandler,
     MainHandler,
+    SearchSuggestHandler,
+    StreamHandler,
+)
+from mopidy_vkm.web.pipeline import (
+    ASSETS_DIR,
+    PrecompressedStaticHandler,
+    list_variants,
 )
 
 logger = logging.getLogger(__name__)
@@ -29,6 +43,8 @@ def create_web_app(
     current_dir = pathlib.Path(__file__).parent
     static_dir = str(current_dir / "static")
     template_dir = str(current_dir / "templates")
+    # Scanned here, off the IOLoop's request path
+    list_variants(static_dir)
 
     # URL routing for authentication handlers - Mopidy adds /vkm prefix automatically
     handlers = [
@@ -39,9 +55,34 @@ def create_web_app(
         (r"/auth/verify", AuthVerifyHandler, handler_kwargs),
         (r"/auth/status", AuthStatusHandler, handler_kwargs),
         (r"/auth/cancel", AuthCancelHandler, handler_kwargs),
-        # Static files
-        (r"/static/(.*)", StaticFileHandler, {"path": static_dir}),
+        # Playlist import
+        (r"/import", ImportHandler, handler_kwargs),
+        (r"/import/([0-9a-f]+)", ImportStatusHandler, handler_kwargs),
+        # Several API operations in one round-trip
+        (r"/api/batch", BatchHandler, handler_kwargs),
+        # Paginated library index
+        (r"/api/library/?", LibraryApiHandler, handler_kwargs),
+        (
+            r"/api/library/(my_music|playlists|recommendations)",
+            LibraryApiHandler,
+            handler_kwargs,
+        ),
+        # Streaming library export
+        (r"/api/export", ExportHandler, handler_kwargs),
+        # Prerolled tracks for gapless playback
+        (r"/stream/(-?[0-9]+_[0-9]+)", StreamHandler, handler_kwargs),
+        # Search autocomplete
+        (r"/search/suggest", SearchSuggestHandler, handler_kwargs),
+        # Cache sizes and hit rates against the memory budget
+        (r"/debug/caches", DebugCachesHandler, handler_kwargs),
+        # Built, fingerprinted assets and their unbuilt sources
+        (r"/static/(.*)", PrecompressedStaticHandler, {"path": static_dir}),
+        (r"/assets/(.*)", StaticFileHandler, {"path": str(ASSETS_DIR)}),
     ]
+    # Playlist covers downloaded by ``mopidy vkm warm``
+    covers_dir = get_covers_dir(config.get("vkm", {}))
+    if covers_dir is not None:
+        handlers.append((r"/covers/(.*)", StaticFileHandler, {"path": str(covers_dir)}))
 
     logger.info("Creating VKM web application with %d handlers", len(handlers))
 
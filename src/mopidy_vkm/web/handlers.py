@@ -1,16 +1,50 @@
 """VKM web request handlers."""
 
+import asyncio
+import concurrent.futures
+import functools
 import json
 import logging
-from typing import Any, cast
+import pathlib
+import re
+import time
+import urllib.request
+from collections.abc import Awaitable, Callable
+from typing import Any, ClassVar, cast
 
-from tornado.web import RequestHandler
+import pykka
+from tornado.iostream import StreamClosedError
+from tornado.web import HTTPError, RequestHandler
 
+from mopidy_vkm import exporter
 from mopidy_vkm.auth import AuthStatus
 from mopidy_vkm.auth.service import VKMAuthService
+from mopidy_vkm.importer import parse_playlist
+from mopidy_vkm.quality import STALL_GAP
+from mopidy_vkm.sync import MY_MUSIC, PLAYLISTS, RECOMMENDATIONS
+from mopidy_vkm.translator import playlist_uri, track_uri
+from mopidy_vkm.web.pipeline import asset_url, load_manifest
 
 logger = logging.getLogger(__name__)
 
+# Seconds a request may wait on the backend before it is answered with 504
+REQUEST_TIMEOUT = 10.0
+
+# Seconds the CDN may go quiet while the rest of a prerolled track is relayed
+STREAM_TIMEOUT = 30.0
+
+# Bytes read from a local track file per write
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Most bytes relayed from the CDN per write
+RELAY_CHUNK_SIZE = 64 * 1024
+
+# Blocking Pykka and VK calls run here so they never stall Mopidy's IOLoop,
+# which also serves JSON-RPC and every other HTTP client
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="VKMWeb"
+)
+
 
 class BaseHandler(RequestHandler):
     """Base handler for VKM web requests."""
@@ -32,12 +66,89 @@ class BaseHandler(RequestHandler):
         template_dir = str(current_dir / "templates")
         self.application.settings.setdefault("template_path", template_dir)
 
+    # Per-request limit for blocking calls, see run_blocking()
+    request_timeout = REQUEST_TIMEOUT
+
+    async def run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:  # noqa: ANN401
+        """Run a blocking call in the worker pool and await its result.
+
+        Args:
+            func: The blocking callable, e.g. a Pykka ``.get()`` or VK call.
+            *args: Arguments for the callable.
+
+        Returns:
+            The result of the call.
+
+        Raises:
+            HTTPError: 504 if the call does not finish within
+                ``request_timeout``. The call itself keeps running in the
+                pool.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(_executor, functools.partial(func, *args)),
+                self.request_timeout,
+            )
+        except TimeoutError:
+            logger.warning(
+                "%s timed out after %ss", self.request.uri, self.request_timeout
+            )
+            raise HTTPError(504, reason="VKM backend timed out") from None
+
+    async def backend_attribute(self, name: str) -> Any:  # noqa: ANN401
+        """Find a VKMBackend attribute without blocking the IOLoop.
+
+        Args:
+            name: The attribute name.
+
+        Returns:
+            The attribute or None if the backend is not available.
+        """
+        return await self.run_blocking(self.get_backend_attribute, name)
+
+    async def call_backend(self, func: Callable[..., Any], *args: Any) -> Any:  # noqa: ANN401
+        """Call a backend method in the worker pool and await its result.
+
+        Methods and providers reached through the backend's actor proxy
+        return Pykka futures; these are resolved in the pool as well.
+
+        Args:
+            func: The method, plain or through an actor proxy.
+            *args: Arguments for the method.
+
+        Returns:
+            The result of the call.
+        """
+
+        def call() -> Any:  # noqa: ANN401
+            result = func(*args)
+            return result.get() if isinstance(result, pykka.Future) else result
+
+        return await self.run_blocking(call)
+
+    def write_error(self, status_code: int, **kwargs: Any) -> None:  # noqa: ANN401, ARG002
+        """Write errors, including timeouts, as JSON."""
+        self.set_header("Content-Type", "application/json")
+        self.finish({"status": "error", "error": self._reason})
+
     def get_auth_service(self) -> VKMAuthService | None:
         """Get the VKMAuthService instance from the backend.
 
         Returns:
             The VKMAuthService instance or None if not available.
         """
+        return self.get_backend_attribute("auth_service")
+
+    def get_backend_attribute(self, name: str) -> Any:  # noqa: ANN401
+        """Get an attribute of the VKM backend, e.g. ``auth_service``.
+
+        Args:
+            name: The backend attribute name.
+
+        Returns:
+            The attribute value or None if the backend is not available.
+        """
         # Import here to avoid circular imports
         from mopidy_vkm.backend import VKMBackend
 
@@ -57,7 +168,7 @@ class BaseHandler(RequestHandler):
                     getattr(backend, "uri_schemes", []),
                 )
                 if isinstance(backend, VKMBackend):
-                    return backend.auth_service
+                    return getattr(backend, name, None)
         except Exception as e1:
             logger.debug("First approach failed: %s", e1)
             try:
@@ -93,41 +204,42 @@ class BaseHandler(RequestHandler):
                             logger.debug(
                                 "Found VKM backend at index %d by uri_schemes", i
                             )
-                            # Try to access auth_service - get the real backend first
+                            # Try to access the attribute - get the real backend first
                             try:
                                 backend = backend_proxy.get()
                                 logger.debug(
                                     "Got real backend: %s",
                                     type(backend).__name__,
                                 )
-                                auth_service = getattr(backend, "auth_service", None)
-                                if auth_service:
+                                attribute = getattr(backend, name, None)
+                                if attribute:
                                     logger.debug(
-                                        "Got auth_service: %s",
-                                        type(auth_service).__name__,
+                                        "Got %s: %s",
+                                        name,
+                                        type(attribute).__name__,
                                     )
-                                    return auth_service
+                                    return attribute
                             except Exception as e:
                                 logger.debug(
-                                    "Failed to access auth_service through proxy: %s", e
+                                    "Failed to access %s through proxy: %s", name, e
                                 )
                                 # Try direct proxy access as fallback
                                 try:
-                                    auth_service_future = cast(
-                                        "Any", backend_proxy
-                                    ).auth_service
+                                    attribute_future = getattr(backend_proxy, name)
                                     logger.debug(
-                                        "Auth service future type: %s",
-                                        type(auth_service_future).__name__,
+                                        "%s future type: %s",
+                                        name,
+                                        type(attribute_future).__name__,
                                     )
-                                    if hasattr(auth_service_future, "get"):
-                                        auth_service = auth_service_future.get()
+                                    if hasattr(attribute_future, "get"):
+                                        attribute = attribute_future.get()
                                         logger.debug(
-                                            "Got auth_service via future: %s",
-                                            type(auth_service).__name__,
+                                            "Got %s via future: %s",
+                                            name,
+                                            type(attribute).__name__,
                                         )
-                                        return auth_service
-                                    return auth_service_future
+                                        return attribute
+                                    return attribute_future
                                 except Exception as e2:
                                     logger.debug("Fallback proxy access failed: %s", e2)
                     except Exception as e:
@@ -155,8 +267,8 @@ class BaseHandler(RequestHandler):
                             hasattr(backend_proxy, "__class__")
                             and backend_proxy.__class__.__name__ == "VKMBackend"
                         ):
-                            # Access auth_service through the proxy
-                            return cast("Any", backend_proxy).auth_service
+                            # Access the attribute through the proxy
+                            return getattr(backend_proxy, name)
                 except Exception as e3:
                     logger.debug("Third approach failed: %s", e3)
                     logger.exception("All approaches failed to access VKM backend")
@@ -169,24 +281,33 @@ class BaseHandler(RequestHandler):
 class MainHandler(BaseHandler):
     """Handler for the main VKM page."""
 
+    # Rendered page shell; it only depends on the asset manifest
+    _page: bytes | None = None
+
     def get(self) -> None:
         """Handle GET request for the main page."""
-        # Serve the main HTML page
-        self.render("vkm/index.html")
+        if MainHandler._page is None:
+            manifest = load_manifest()
+            MainHandler._page = self.render_string(
+                "vkm/index.html", asset_url=lambda name: asset_url(manifest, name)
+            )
+        # Tornado answers with 304 when the ETag of the shell matches
+        self.set_header("Cache-Control", "no-cache")
+        self.write(MainHandler._page)
 
 
 class AuthStatusHandler(BaseHandler):
     """Handler for authentication status requests."""
 
-    def get(self) -> None:
+    async def get(self) -> None:
         """Handle GET request for authentication status."""
-        auth_service = self.get_auth_service()
+        auth_service = await self.backend_attribute("auth_service")
         if not auth_service:
             self.set_status(503)  # Service Unavailable
             self.write({"status": "error", "error": "VKM backend not available"})
             return
 
-        status = auth_service.get_status()
+        status = await self.run_blocking(auth_service.get_status)
         self.set_header("Content-Type", "application/json")
         self.write(status)
 
@@ -194,9 +315,9 @@ class AuthStatusHandler(BaseHandler):
 class AuthLoginHandler(BaseHandler):
     """Handler for authentication login requests."""
 
-    def post(self) -> None:
+    async def post(self) -> None:
         """Handle POST request for authentication login."""
-        auth_service = self.get_auth_service()
+        auth_service = await self.backend_attribute("auth_service")
         if not auth_service:
             self.set_status(503)  # Service Unavailable
             self.write({"status": "error", "error": "VKM backend not available"})
@@ -215,16 +336,18 @@ class AuthLoginHandler(BaseHandler):
                 return
 
             # Start the authentication process
-            auth_service.start_auth(login, password)
+            await self.run_blocking(auth_service.start_auth, login, password)
 
             # Return the current status
-            status = auth_service.get_status()
+            status = await self.run_blocking(auth_service.get_status)
             self.set_header("Content-Type", "application/json")
             self.write(status)
 
         except json.JSONDecodeError:
             self.set_status(400)  # Bad Request
             self.write({"status": "error", "error": "Invalid JSON"})
+        except HTTPError:
+            raise
         except Exception as e:
             logger.exception("Error during authentication")
             self.set_status(500)  # Internal Server Error
@@ -234,9 +357,9 @@ class AuthLoginHandler(BaseHandler):
 class AuthVerifyHandler(BaseHandler):
     """Handler for authentication verification requests."""
 
-    def post(self) -> None:
+    async def post(self) -> None:
         """Handle POST request for authentication verification."""
-        auth_service = self.get_auth_service()
+        auth_service = await self.backend_attribute("auth_service")
         if not auth_service:
             self.set_status(503)  # Service Unavailable
             self.write({"status": "error", "error": "VKM backend not available"})
@@ -247,17 +370,17 @@ class AuthVerifyHandler(BaseHandler):
             captcha_solution = data.get("captcha")
             two_factor_code = data.get("code")
 
-            current_status = auth_service.get_status()
+            current_status = await self.run_blocking(auth_service.get_status)
             status_value = current_status.get("status")
 
             if status_value == AuthStatus.CAPTCHA_REQUIRED.value and captcha_solution:
                 # Submit captcha solution
-                auth_service.submit_captcha(captcha_solution)
+                await self.run_blocking(auth_service.submit_captcha, captcha_solution)
             elif (
                 status_value == AuthStatus.TWO_FACTOR_REQUIRED.value and two_factor_code
             ):
                 # Submit two-factor code
-                auth_service.submit_two_factor(two_factor_code)
+                await self.run_blocking(auth_service.submit_two_factor, two_factor_code)
             else:
                 self.set_status(400)  # Bad Request
                 self.write(
@@ -269,13 +392,15 @@ class AuthVerifyHandler(BaseHandler):
                 return
 
             # Return the current status
-            status = auth_service.get_status()
+            status = await self.run_blocking(auth_service.get_status)
             self.set_header("Content-Type", "application/json")
             self.write(status)
 
         except json.JSONDecodeError:
             self.set_status(400)  # Bad Request
             self.write({"status": "error", "error": "Invalid JSON"})
+        except HTTPError:
+            raise
         except Exception as e:
             logger.exception("Error during verification")
             self.set_status(500)  # Internal Server Error
@@ -285,9 +410,9 @@ class AuthVerifyHandler(BaseHandler):
 class AuthCancelHandler(BaseHandler):
     """Handler for authentication cancellation requests."""
 
-    def post(self) -> None:
+    async def post(self) -> None:
         """Handle POST request for authentication cancellation."""
-        auth_service = self.get_auth_service()
+        auth_service = await self.backend_attribute("auth_service")
         if not auth_service:
             self.set_status(503)  # Service Unavailable
             self.write({"status": "error", "error": "VKM backend not available"})
@@ -295,14 +420,613 @@ class AuthCancelHandler(BaseHandler):
 
         try:
             # Cancel the authentication process
-            auth_service.cancel_auth()
+            await self.run_blocking(auth_service.cancel_auth)
 
             # Return the current status
-            status = auth_service.get_status()
+            status = await self.run_blocking(auth_service.get_status)
             self.set_header("Content-Type", "application/json")
             self.write(status)
 
+        except HTTPError:
+            raise
         except Exception as e:
             logger.exception("Error during cancellation")
             self.set_status(500)  # Internal Server Error
             self.write({"status": "error", "error": str(e)})
+
+
+class ImportHandler(BaseHandler):
+    """Handler for starting playlist imports."""
+
+    async def post(self) -> None:
+        """Handle POST request to import a playlist export.
+
+        The body is JSON with ``content`` (the exported file as text),
+        ``format`` (``m3u``, ``csv`` or ``json``) and an optional ``name``.
+        """
+        importer = await self.backend_attribute("importer")
+        if not importer:
+            self.set_status(503)  # Service Unavailable
+            self.write({"status": "error", "error": "VKM backend not available"})
+            return
+
+        try:
+            data = json.loads(self.request.body)
+            content = data.get("content")
+            fmt = data.get("format")
+            if not content or not fmt:
+                self.set_status(400)  # Bad Request
+                self.write(
+                    {"status": "error", "error": "Content and format are required"}
+                )
+                return
+
+            entries = parse_playlist(content, fmt)
+            if not entries:
+                self.set_status(400)  # Bad Request
+                self.write({"status": "error", "error": "No tracks found"})
+                return
+
+            # Matching runs in the background; the client polls the job
+            job = await self.run_blocking(
+                importer.start, data.get("name") or "Imported playlist", entries
+            )
+            self.set_status(202)  # Accepted
+            self.set_header("Content-Type", "application/json")
+            self.write(job.to_dict())
+
+        except ValueError as e:
+            # Includes json.JSONDecodeError and unsupported formats
+            self.set_status(400)  # Bad Request
+            self.write({"status": "error", "error": str(e)})
+        except HTTPError:
+            raise
+        except Exception as e:
+            logger.exception("Error during playlist import")
+            self.set_status(500)  # Internal Server Error
+            self.write({"status": "error", "error": str(e)})
+
+
+class ImportStatusHandler(BaseHandler):
+    """Handler for playlist import progress requests."""
+
+    async def get(self, job_id: str) -> None:
+        """Handle GET request for the progress of an import job.
+
+        Args:
+            job_id: The import job ID.
+        """
+        importer = await self.backend_attribute("importer")
+        job = await self.run_blocking(importer.get_job, job_id) if importer else None
+        if job is None:
+            self.set_status(404)  # Not Found
+            self.write({"status": "error", "error": "Import job not found"})
+            return
+
+        self.set_header("Content-Type", "application/json")
+        self.write(job.to_dict())
+
+
+class SearchSuggestHandler(BaseHandler):
+    """Handler for search autocomplete requests."""
+
+    async def get(self) -> None:
+        """Handle GET request for suggestions matching the ``q`` prefix.
+
+        Suggestions come from the prefix index of previous searches, so
+        typing never costs a VK API call.
+        """
+        search_cache = await self.backend_attribute("search_cache")
+        if not search_cache:
+            self.set_status(503)  # Service Unavailable
+            self.write({"status": "error", "error": "VKM backend not available"})
+            return
+
+        prefix = self.get_argument("q", "")
+        suggestions = [
+            {
+                "query": suggestion["query"],
+                "results": [
+                    {**item, "uri": track_uri(item["owner_id"], item["track_id"])}
+                    for item in suggestion["results"]
+                ],
+            }
+            for suggestion in await self.run_blocking(search_cache.suggest, prefix)
+        ]
+        self.set_header("Content-Type", "application/json")
+        self.write({"query": prefix, "suggestions": suggestions})
+
+
+class BatchHandler(BaseHandler):
+    """Handler running several API operations in one round-trip.
+
+    The body is a JSON array (or ``{"operations": [...]}``) of
+    ``{"id", "op", "params"}`` objects. Operations run concurrently and
+    each one succeeds or fails on its own; results come back in request
+    order.
+    """
+
+    MAX_OPERATIONS = 50
+    BROWSE_PAGE_SIZE = 100
+
+    def prepare(self) -> None:
+        """Reset the per-batch backend lookups."""
+        self._lookups: dict[str, asyncio.Future[Any]] = {}
+
+    async def post(self) -> None:
+        """Handle POST request for a batch of operations."""
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            self.set_status(400)  # Bad Request
+            self.write({"status": "error", "error": "Invalid JSON"})
+            return
+
+        operations = data.get("operations") if isinstance(data, dict) else data
+        if not isinstance(operations, list) or not all(
+            isinstance(operation, dict) for operation in operations
+        ):
+            self.set_status(400)  # Bad Request
+            self.write({"status": "error", "error": "Expected a list of operations"})
+            return
+        if len(operations) > self.MAX_OPERATIONS:
+            self.set_status(400)  # Bad Request
+            self.write(
+                {
+                    "status": "error",
+                    "error": f"At most {self.MAX_OPERATIONS} operations per batch",
+                }
+            )
+            return
+
+        results = await asyncio.gather(
+            *(self.run_operation(operation) for operation in operations)
+        )
+        self.set_header("Content-Type", "application/json")
+        self.write({"status": "success", "results": list(results)})
+
+    async def run_operation(self, operation: dict[str, Any]) -> dict[str, Any]:
+        """Run a single operation, turning failures into an error result.
+
+        Args:
+            operation: The ``{"id", "op", "params"}`` object.
+
+        Returns:
+            ``{"id", "status", "result"}`` or ``{"id", "status", "error"}``.
+        """
+        op_id = operation.get("id")
+        method = self.operations.get(str(operation.get("op")))
+        if method is None:
+            return {"id": op_id, "status": "error", "error": "Unknown operation"}
+        try:
+            result = await method(self, operation.get("params") or {})
+        except HTTPError as e:
+            return {"id": op_id, "status": "error", "error": e.reason}
+        except Exception as e:
+            logger.exception("Batch operation %s failed", operation.get("op"))
+            return {"id": op_id, "status": "error", "error": str(e)}
+        return {"id": op_id, "status": "success", "result": result}
+
+    async def _require(self, name: str) -> Any:  # noqa: ANN401
+        """Get a backend attribute or fail the operation.
+
+        Lookups are shared by all operations of the batch.
+        """
+        if name not in self._lookups:
+            self._lookups[name] = asyncio.ensure_future(self.backend_attribute(name))
+        attribute = await self._lookups[name]
+        if not attribute:
+            raise HTTPError(503, reason="VKM backend not available")
+        return attribute
+
+    async def op_status(self, params: dict[str, Any]) -> Any:  # noqa: ANN401, ARG002
+        """Authentication status."""
+        auth_service = await self._require("auth_service")
+        return await self.run_blocking(auth_service.get_status)
+
+    async def op_browse(self, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        """One page of a library directory: ``uri``, ``offset``, ``limit``."""
+        library = await self._require("library")
+        refs = await self.call_backend(library.browse, params.get("uri", "vkm:root"))
+        offset = max(int(params.get("offset", 0)), 0)
+        limit = min(int(params.get("limit", self.BROWSE_PAGE_SIZE)), 500)
+        return {
+            "total": len(refs),
+            "offset": offset,
+            "items": [ref.serialize() for ref in refs[offset : offset + limit]],
+        }
+
+    async def op_search(self, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        """Track search: ``query`` (Mopidy query dict) and ``exact``."""
+        library = await self._require("library")
+        result = await self.call_backend(
+            functools.partial(
+                library.search,
+                params.get("query") or {},
+                exact=bool(params.get("exact")),
+            )
+        )
+        return [track.serialize() for track in result.tracks] if result else []
+
+    async def op_images(self, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        """Images for ``uris``."""
+        library = await self._require("library")
+        images = await self.call_backend(library.get_images, params.get("uris") or [])
+        return {
+            uri: [image.serialize() for image in uri_images]
+            for uri, uri_images in images.items()
+        }
+
+    async def op_suggest(self, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        """Search autocomplete for the ``q`` prefix."""
+        search_cache = await self._require("search_cache")
+        return await self.run_blocking(search_cache.suggest, params.get("q", ""))
+
+    async def op_import_status(self, params: dict[str, Any]) -> Any:  # noqa: ANN401
+        """Progress of the import job ``job_id``."""
+        importer = await self._require("importer")
+        job = await self.run_blocking(importer.get_job, str(params.get("job_id")))
+        if job is None:
+            raise HTTPError(404, reason="Import job not found")
+        return job.to_dict()
+
+    async def op_downloads(self, params: dict[str, Any]) -> Any:  # noqa: ANN401, ARG002
+        """Progress of the preroll downloads and the bandwidth they get."""
+        preroll = await self._require("preroll")
+        traffic = await self.backend_attribute("traffic")
+        return {
+            **await self.run_blocking(preroll.progress),
+            "traffic": traffic.stats() if traffic else None,
+        }
+
+    operations: ClassVar[dict[str, Callable[..., Awaitable[Any]]]] = {
+        "status": op_status,
+        "browse": op_browse,
+        "search": op_search,
+        "images": op_images,
+        "suggest": op_suggest,
+        "import_status": op_import_status,
+        "downloads": op_downloads,
+    }
+
+
+class LibraryApiHandler(BaseHandler):
+    """Handler serving pages of the synced library index.
+
+    Every page carries a weak ETag built from the version the collection
+    last changed in, so unchanged pages are answered with 304 before any
+    items are serialized.
+    """
+
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 500
+    COLLECTIONS = (MY_MUSIC, PLAYLISTS, RECOMMENDATIONS)
+
+    async def get(self, collection: str | None = None) -> None:
+        """Handle GET request for a page of a collection.
+
+        Without a collection, returns the ``total`` and ``version`` of every
+        collection. Query arguments ``offset`` and ``limit`` select the page.
+
+        Args:
+            collection: ``my_music``, ``playlists`` or ``recommendations``.
+        """
+        index = await self.backend_attribute("library_index")
+        if not index:
+            self.set_status(503)  # Service Unavailable
+            self.write({"status": "error", "error": "VKM backend not available"})
+            return
+
+        if collection is None:
+            states = {name: index.get_state(name) for name in self.COLLECTIONS}
+            self.set_header("Cache-Control", "no-cache")
+            self.write(
+                {
+                    "version": index.version,
+                    "collections": {
+                        name: {
+                            "total": len(state.get("items", [])),
+                            "version": state.get("version", 0),
+                        }
+                        for name, state in states.items()
+                    },
+                }
+            )
+            return
+
+        try:
+            offset = max(int(self.get_argument("offset", "0")), 0)
+            limit = int(self.get_argument("limit", str(self.DEFAULT_LIMIT)))
+        except ValueError:
+            self.set_status(400)  # Bad Request
+            self.write({"status": "error", "error": "Invalid offset or limit"})
+            return
+        limit = min(max(limit, 1), self.MAX_LIMIT)
+
+        state = index.get_state(collection)
+        version = state.get("version", 0)
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("Etag", f'W/"{collection}-{version}-{offset}-{limit}"')
+        if self.check_etag_header():
+            self.set_status(304)  # Not Modified
+            return
+
+        items = state.get("items", [])
+        to_uri = _playlist_item_uri if collection == PLAYLISTS else _track_item_uri
+        self.write(
+            {
+                "collection": collection,
+                "version": version,
+                "total": len(items),
+                "offset": offset,
+                "limit": limit,
+                "items": [
+                    {**item, "uri": to_uri(item)}
+                    for item in items[offset : offset + limit]
+                ],
+            }
+        )
+
+
+def _track_item_uri(item: dict[str, Any]) -> str:
+    return track_uri(item["owner_id"], item["track_id"])
+
+
+def _playlist_item_uri(item: dict[str, Any]) -> str:
+    return playlist_uri(
+        item["owner_id"], item["playlist_id"], item.get("access_key", "")
+    )
+
+
+class ExportHandler(BaseHandler):
+    """Handler streaming a library export with chunked transfer encoding."""
+
+    # Producing one chunk may page through a playlist on VK
+    request_timeout = 60.0
+
+    async def get(self) -> None:
+        """Handle GET request for a library export.
+
+        Query arguments: ``format`` (``ndjson``, ``csv`` or ``m3u``),
+        ``collections`` (comma separated, all by default) and
+        ``playlist_tracks=1`` to include the tracks of every playlist.
+        """
+        fmt = self.get_argument("format", "ndjson")
+        collections = self.get_argument(
+            "collections", ",".join(exporter.COLLECTIONS)
+        ).split(",")
+        if fmt not in exporter.FORMATS or not set(collections) <= set(
+            exporter.COLLECTIONS
+        ):
+            self.set_status(400)  # Bad Request
+            self.write({"status": "error", "error": "Invalid format or collections"})
+            return
+
+        index = await self.backend_attribute("library_index")
+        if not index:
+            self.set_status(503)  # Service Unavailable
+            self.write({"status": "error", "error": "VKM backend not available"})
+            return
+        service = None
+        if self.get_argument("playlist_tracks", "") == "1":
+            # Behind the circuit breaker and the response cache, like the
+            # backend's own VK calls
+            get_service = await self.backend_attribute("get_vk_service")
+            service = await self.call_backend(get_service) if get_service else None
+
+        extension = "m3u8" if fmt == "m3u" else fmt
+        self.set_header("Content-Type", exporter.CONTENT_TYPES[fmt])
+        self.set_header(
+            "Content-Disposition", f'attachment; filename="vk-library.{extension}"'
+        )
+        # Rows are produced lazily from the index, a chunk at a time, in the
+        # worker pool; memory stays flat however large the library is
+        rows = exporter.iter_rows(index, collections, service)
+        chunks = exporter.iter_chunks(exporter.iter_lines(rows, fmt))
+        try:
+            while True:
+                chunk = await self.run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                self.write(chunk)
+                await self.flush()
+        except StreamClosedError:
+            logger.debug("Client closed the export stream")
+
+
+class StreamHandler(BaseHandler):
+    """Handler playing a local or prerolled track.
+
+    Cached and saved files are served with byte ranges.
+
+    GStreamer is also pointed here on about-to-finish for tracks whose head
+    is in the backend's preroll buffer. The buffered bytes are sent at once
+    and the rest is proxied with a range request, so the track change does
+    not wait on URL resolution or the CDN. Seeks and tracks that are no
+    longer buffered are redirected to the CDN.
+    """
+
+    # Relay reads end on the socket's STREAM_TIMEOUT before the pool's
+    request_timeout = 2 * STREAM_TIMEOUT
+
+    async def get(self, audio_id: str) -> None:
+        """Handle GET request for a track stream.
+
+        Args:
+            audio_id: The VK audio ID.
+        """
+        local_tracks = await self.backend_attribute("local_tracks")
+        path = (
+            await self.run_blocking(local_tracks.find, audio_id)
+            if local_tracks
+            else None
+        )
+        if path is not None:
+            await self._send_file(path)
+            return
+
+        preroll = await self.backend_attribute("preroll")
+        track = preroll.get(audio_id) if preroll else None
+        head_range = re.fullmatch(
+            r"bytes=0-(\d*)", self.request.headers.get("Range", "bytes=0-")
+        )
+        if track is None or head_range is None:
+            url = track.url if track else None
+            if url is None:
+                resolve_url = await self.backend_attribute("resolve_url")
+                url = (
+                    await self.call_backend(resolve_url, audio_id)
+                    if resolve_url
+                    else None
+                )
+            if not url:
+                raise HTTPError(404, reason="Track not available")
+            self.redirect(url)
+            return
+
+        await self._send_prerolled(audio_id, track, head_range.group(1))
+
+    async def _send_prerolled(
+        self,
+        audio_id: str,
+        track: Any,  # noqa: ANN401
+        range_end: str,
+    ) -> None:
+        """Send the buffered head of a track and relay the rest from the CDN.
+
+        Args:
+            audio_id: The VK audio ID.
+            track: The ``PrerolledTrack``.
+            range_end: The end of a ``bytes=0-<end>`` range, or empty.
+        """
+        monitor = await self.backend_attribute("throughput")
+        traffic = await self.backend_attribute("traffic")
+        self.set_header("Content-Type", track.content_type)
+        self.set_header("Accept-Ranges", "bytes")
+        end = None
+        if range_end:
+            end = int(range_end)
+            if track.total is not None:
+                end = min(end, track.total - 1)
+            self.set_status(206)  # Partial Content
+            self.set_header("Content-Range", f"bytes 0-{end}/{track.total or '*'}")
+            self.set_header("Content-Length", str(end + 1))
+        elif track.total is not None:
+            self.set_header("Content-Length", str(track.total))
+        head = track.data if end is None else track.data[: end + 1]
+        try:
+            self.write(head)
+            await self.flush()
+            if not track.complete and (end is None or end >= len(head)):
+                await self._proxy_rest(track.url, len(head), end, monitor, traffic)
+        except StreamClosedError:
+            logger.debug("Player closed the stream of %s", audio_id)
+        except OSError as e:
+            # Headers are out: all that is left is to cut the stream short
+            logger.warning("Failed to stream the rest of %s: %s", audio_id, e)
+            if monitor:
+                monitor.stall()
+
+    async def _send_file(self, path: pathlib.Path) -> None:
+        """Send a local track, or the requested byte range of it."""
+        size = (await self.run_blocking(path.stat)).st_size
+        start, end = 0, size - 1
+        byte_range = re.fullmatch(
+            r"bytes=(\d+)-(\d*)", self.request.headers.get("Range", "")
+        )
+        if byte_range:
+            start = int(byte_range.group(1))
+            if byte_range.group(2):
+                end = min(int(byte_range.group(2)), end)
+            if start > end:
+                self.set_header("Content-Range", f"bytes */{size}")
+                raise HTTPError(416, reason="Range not satisfiable")
+            self.set_status(206)  # Partial Content
+            self.set_header("Content-Range", f"bytes {start}-{end}/{size}")
+
+        self.set_header("Content-Type", "audio/mpeg")
+        self.set_header("Accept-Ranges", "bytes")
+        self.set_header("Content-Length", str(end - start + 1))
+        remaining = end - start + 1
+        try:
+            with path.open("rb") as f:
+                f.seek(start)
+                while remaining > 0:
+                    chunk = await self.run_blocking(
+                        f.read, min(FILE_CHUNK_SIZE, remaining)
+                    )
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    self.write(chunk)
+                    await self.flush()
+        except StreamClosedError:
+            logger.debug("Player closed the stream of %s", path.name)
+
+    async def _proxy_rest(
+        self,
+        url: str,
+        offset: int,
+        end: int | None,
+        monitor: Any,  # noqa: ANN401
+        traffic: Any,  # noqa: ANN401
+    ) -> None:
+        """Relay the track from ``offset`` to ``end`` as it comes from the CDN.
+
+        Chunks are read in the worker pool, and each is flushed to the player
+        before the next is read. A slow player holds back the download
+        instead of filling memory. Only the time spent waiting on the CDN
+        is measured: it gives the link rate, and a wait longer than
+        ``STALL_GAP`` is a stall. The relayed bytes are playback traffic
+        for the shaper.
+        """
+        request = urllib.request.Request(  # noqa: S310
+            url, headers={"Range": f"bytes={offset}-{'' if end is None else end}"}
+        )
+        response = await self.run_blocking(
+            functools.partial(urllib.request.urlopen, timeout=STREAM_TIMEOUT),
+            request,
+        )
+        waited = 0.0
+        received = 0
+        try:
+            while True:
+                start = time.monotonic()
+                chunk = await self.run_blocking(response.read1, RELAY_CHUNK_SIZE)
+                wait = time.monotonic() - start
+                if not chunk:
+                    break
+                if monitor and wait > STALL_GAP:
+                    monitor.stall()
+                waited += wait
+                received += len(chunk)
+                if traffic:
+                    traffic.playback(len(chunk))
+                self.write(chunk)
+                await self.flush()
+        finally:
+            response.close()
+        if monitor:
+            monitor.record(received, waited)
+
+
+class DebugCachesHandler(BaseHandler):
+    """Handler reporting the in-memory caches and their shared budget."""
+
+    async def get(self) -> None:
+        """Handle GET request for per-cache size, hit rate and evictions."""
+        budget = await self.backend_attribute("memory_budget")
+        if not budget:
+            self.set_status(503)  # Service Unavailable
+            self.write({"status": "error", "error": "VKM backend not available"})
+            return
+
+        report = await self.run_blocking(budget.report)
+        quality = await self.backend_attribute("quality")
+        if quality:
+            report["stream"] = {"quality": quality.level(), **quality.monitor.stats()}
+        traffic = await self.backend_attribute("traffic")
+        if traffic:
+            report["traffic"] = traffic.stats()
+        self.set_header("Content-Type", "application/json")
+        self.write(report)
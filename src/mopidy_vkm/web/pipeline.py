@@ -0,0 +1,266 @@
+"""Build and serve fingerprinted, precompressed web UI assets.
+
+Run ``python -m mopidy_vkm.web.pipeline`` after changing the sources in
+``assets/`` to turn them into content-hashed files with gzip and brotli
+variants in ``static/``, described by ``static/manifest.json``. The built
+files are committed, so that packages ship them. Without a manifest the
+sources are served as they are.
+"""
+
+from __future__ import annotations
+
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import pathlib
+import re
+
+from tornado.web import StaticFileHandler
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WEB_DIR = pathlib.Path(__file__).parent
+ASSETS_DIR = WEB_DIR / "assets"
+STATIC_DIR = WEB_DIR / "static"
+MANIFEST_NAME = "manifest.json"
+URL_PREFIX = "/vkm"
+
+HASH_LENGTH = 12
+# name.<hash>.ext, as produced by build_assets()
+FINGERPRINT_RE = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}\.\w+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Preferred first; the suffix is appended to the fingerprinted file name
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def fingerprint(name: str, content: bytes) -> str:
+    """Insert a content hash into an asset file name.
+
+    Args:
+        name: The asset file name, e.g. ``vkm.js``.
+        content: The asset content.
+
+    Returns:
+        The fingerprinted name, e.g. ``vkm.0123456789ab.js``.
+    """
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, dot, ext = name.rpartition(".")
+    return f"{stem}.{digest}.{ext}" if dot else f"{name}.{digest}"
+
+
+def build_assets(
+    source_dir: pathlib.Path = ASSETS_DIR, output_dir: pathlib.Path = STATIC_DIR
+) -> dict[str, str]:
+    """Build fingerprinted and precompressed assets.
+
+    Args:
+        source_dir: Directory with the asset sources.
+        output_dir: Directory the built files and manifest are written to.
+
+    Returns:
+        The manifest mapping source names to fingerprinted names.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for source in sorted(source_dir.iterdir()):
+        if not source.is_file():
+            continue
+        content = source.read_bytes()
+        name = fingerprint(source.name, content)
+        (output_dir / name).write_bytes(content)
+        # mtime=0 keeps the gzip output reproducible across builds
+        (output_dir / f"{name}.gz").write_bytes(
+            gzip.compress(content, compresslevel=9, mtime=0)
+        )
+        if brotli is not None:
+            (output_dir / f"{name}.br").write_bytes(brotli.compress(content))
+        manifest[source.name] = name
+
+    # Drop outdated builds of the same assets
+    current = set(manifest.values())
+    for path in output_dir.iterdir():
+        base = path.name.removesuffix(".gz").removesuffix(".br")
+        if FINGERPRINT_RE.search(base) and base not in current:
+            path.unlink()
+
+    temp_path = output_dir / f"{MANIFEST_NAME}.tmp"
+    temp_path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    temp_path.replace(output_dir / MANIFEST_NAME)
+    list_variants.cache_clear()
+    if brotli is None:
+        logger.warning("brotli is not installed, only gzip variants were built")
+    return manifest
+
+
+def load_manifest(static_dir: pathlib.Path = STATIC_DIR) -> dict[str, str]:
+    """Load the asset manifest.
+
+    Args:
+        static_dir: Directory with the built assets.
+
+    Returns:
+        The manifest, empty if the assets have not been built.
+    """
+    try:
+        return json.loads((static_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def asset_url(manifest: dict[str, str], name: str) -> str:
+    """Get the URL of an asset.
+
+    Args:
+        manifest: The asset manifest.
+        name: The source asset name.
+
+    Returns:
+        The fingerprinted static URL, or the source URL if not built.
+    """
+    if name in manifest:
+        return f"{URL_PREFIX}/static/{manifest[name]}"
+    return f"{URL_PREFIX}/assets/{name}"
+
+
+def accepted_encodings(header: str) -> dict[str, float]:
+    """Parse an ``Accept-Encoding`` header.
+
+    Args:
+        header: The header value.
+
+    Returns:
+        The quality value of every listed coding, lowercased; a missing or
+        malformed ``q`` counts as 1 and 0 respectively.
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = (item.strip() for item in part.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+def choose_encoding(header: str, available: list[str]) -> str | None:
+    """Choose the content coding to send.
+
+    Args:
+        header: The ``Accept-Encoding`` header value.
+        available: Codings a variant exists for, preferred first.
+
+    Returns:
+        The available coding with the highest quality value, the preferred
+        one on ties, or None if none is acceptable.
+    """
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+@functools.cache
+def list_variants(static_dir: str) -> frozenset[str]:
+    """List the precompressed files of a static directory, once per process.
+
+    Args:
+        static_dir: Directory with the built assets.
+
+    Returns:
+        Paths of the variant files relative to ``static_dir``.
+    """
+    root = pathlib.Path(static_dir)
+    suffixes = {suffix for _, suffix in ENCODINGS}
+    return frozenset(
+        path.relative_to(root).as_posix()
+        for path in root.rglob("*")
+        if path.suffix in suffixes and path.is_file()
+    )
+
+
+class PrecompressedStaticHandler(StaticFileHandler):
+    """Serve the best precompressed variant of a static file.
+
+    Fingerprinted files never change, so they are sent with immutable cache
+    headers; everything else is revalidated through its ETag. Variants are
+    looked up in :func:`list_variants`, not on disk per request.
+    """
+
+    _original_path = ""
+    _encoding: str | None = None
+
+    def initialize(self, path: str, default_filename: str | None = None) -> None:
+        """Initialize the handler.
+
+        Args:
+            path: The static root.
+            default_filename: File served for directory requests.
+        """
+        super().initialize(path, default_filename)
+        self._variants = list_variants(path)
+
+    async def get(self, path: str, include_body: bool = True) -> None:  # noqa: FBT001, FBT002
+        """Serve a static file, preferring a precompressed variant.
+
+        Args:
+            path: The requested path relative to the static root.
+            include_body: Whether to send the body (False for HEAD).
+        """
+        self._original_path = path
+        self._encoding = None
+        suffixes = {
+            encoding: suffix
+            for encoding, suffix in ENCODINGS
+            if f"{path}{suffix}" in self._variants
+        }
+        encoding = choose_encoding(
+            self.request.headers.get("Accept-Encoding", ""), list(suffixes)
+        )
+        if encoding is not None:
+            self._encoding = encoding
+            path = f"{path}{suffixes[encoding]}"
+        await super().get(path, include_body)
+
+    def set_extra_headers(self, path: str) -> None:  # noqa: ARG002
+        """Set encoding and caching headers."""
+        self.set_header("Vary", "Accept-Encoding")
+        if self._encoding:
+            self.set_header("Content-Encoding", self._encoding)
+        if FINGERPRINT_RE.search(self._original_path):
+            self.set_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        else:
+            self.set_header("Cache-Control", "no-cache")
+
+    def get_content_type(self) -> str:
+        """Get the content type of the original, uncompressed file."""
+        mime_type, _ = mimetypes.guess_type(self._original_path)
+        return mime_type or "application/octet-stream"
+
+
+def main() -> None:
+    """Build the web UI assets."""
+    logging.basicConfig(level=logging.INFO)
+    for source, name in build_assets().items():
+        logger.info("%s -> %s", source, name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+// DOM Elements
+const loginForm = document.getElementById('login-form');
+const processingIndicator = document.getElementById('processing');
+const captchaForm = document.getElementById('captcha-form');
+const twoFactorForm = document.getElementById('two-factor-form');
+const successMessage = document.getElementById('success');
+const errorContainer = document.getElementById('error');
+const errorMessage = document.getElementById('error-message');
+const captchaImage = document.getElementById('captcha-image');
+
+// Buttons
+const loginButton = document.getElementById('login-button');
+const captchaButton = document.getElementById('captcha-button');
+const captchaCancel = document.getElementById('captcha-cancel');
+const twoFactorButton = document.getElementById('two-factor-button');
+const twoFactorCancel = document.getElementById('two-factor-cancel');
+const errorRetry = document.getElementById('error-retry');
+
+// Input fields
+const loginInput = document.getElementById('login');
+const passwordInput = document.getElementById('password');
+const captchaInput = document.getElementById('captcha');
+const codeInput = document.getElementById('code');
+
+// Variables
+let captchaSid = '';
+let pollingInterval = null;
+
+// Show only the specified element and hide others
+function showOnly(element) {
+    [loginForm, processingIndicator, captchaForm, twoFactorForm, successMessage, errorContainer].forEach(el => {
+        el.classList.add('hidden');
+    });
+    element.classList.remove('hidden');
+}
+
+// Start polling for status
+function startPolling() {
+    if (pollingInterval) {
+        clearInterval(pollingInterval);
+    }
+
+    pollingInterval = setInterval(checkStatus, 1000);
+}
+
+// Stop polling
+function stopPolling() {
+    if (pollingInterval) {
+        clearInterval(pollingInterval);
+        pollingInterval = null;
+    }
+}
+
+// Check authentication status
+function checkStatus() {
+    fetch('/vkm/auth/status')
+        .then(response => response.json())
+        .then(data => {
+            console.log('Status:', data);
+            handleStatus(data);
+        })
+        .catch(error => {
+            console.error('Error checking status:', error);
+            showError('Failed to check authentication status.');
+        });
+}
+
+// Handle status response
+function handleStatus(data) {
+    const status = data.status;
+
+    switch (status) {
+        case 'processing':
+            showOnly(processingIndicator);
+            break;
+
+        case 'captcha_required':
+            captchaSid = data.captcha_sid;
+            captchaImage.src = data.captcha_img;
+            captchaInput.value = '';
+            showOnly(captchaForm);
+            stopPolling();
+            break;
+
+        case '2fa_required':
+            codeInput.value = '';
+            showOnly(twoFactorForm);
+            stopPolling();
+            break;
+
+        case 'success':
+            showOnly(successMessage);
+            stopPolling();
+            break;
+
+        case 'error':
+            showError(data.error || 'Authentication failed.');
+            stopPolling();
+            break;
+
+        default:
+            showError('Unknown status: ' + status);
+            stopPolling();
+            break;
+    }
+}
+
+// Show error message
+function showError(message) {
+    errorMessage.textContent = message;
+    showOnly(errorContainer);
+}
+
+// Submit login
+function submitLogin() {
+    const login = loginInput.value.trim();
+    const password = passwordInput.value;
+
+    if (!login || !password) {
+        showError('Please enter both login and password.');
+        return;
+    }
+
+    showOnly(processingIndicator);
+
+    fetch('/vkm/auth/login', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ login, password }),
+    })
+        .then(response => response.json())
+        .then(data => {
+            handleStatus(data);
+            startPolling();
+        })
+        .catch(error => {
+            console.error('Error during login:', error);
+            showError('Failed to start authentication process.');
+        });
+}
+
+// Submit captcha
+function submitCaptcha() {
+    const captcha = captchaInput.value.trim();
+
+    if (!captcha) {
+        showError('Please enter the CAPTCHA text.');
+        return;
+    }
+
+    showOnly(processingIndicator);
+
+    fetch('/vkm/auth/verify', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ captcha }),
+    })
+        .then(response => response.json())
+        .then(data => {
+            handleStatus(data);
+            startPolling();
+        })
+        .catch(error => {
+            console.error('Error submitting CAPTCHA:', error);
+            showError('Failed to submit CAPTCHA.');
+        });
+}
+
+// Submit two-factor code
+function submitTwoFactor() {
+    const code = codeInput.value.trim();
+
+    if (!code) {
+        showError('Please enter the 2FA code.');
+        return;
+    }
+
+    showOnly(processingIndicator);
+
+    fetch('/vkm/auth/verify', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ code }),
+    })
+        .then(response => response.json())
+        .then(data => {
+            handleStatus(data);
+            startPolling();
+        })
+        .catch(error => {
+            console.error('Error submitting 2FA code:', error);
+            showError('Failed to submit 2FA code.');
+        });
+}
+
+// Cancel authentication
+function cancelAuth() {
+    showOnly(processingIndicator);
+
+    fetch('/vkm/auth/cancel', {
+        method: 'POST',
+    })
+        .then(response => response.json())
+        .then(data => {
+            showOnly(loginForm);
+        })
+        .catch(error => {
+            console.error('Error cancelling authentication:', error);
+            showError('Failed to cancel authentication.');
+        });
+}
+
+// Event listeners
+loginButton.addEventListener('click', submitLogin);
+captchaButton.addEventListener('click', submitCaptcha);
+captchaCancel.addEventListener('click', cancelAuth);
+twoFactorButton.addEventListener('click', submitTwoFactor);
+twoFactorCancel.addEventListener('click', cancelAuth);
+errorRetry.addEventListener('click', () => showOnly(loginForm));
+
+// Enter key support
+loginInput.addEventListener('keypress', e => {
+    if (e.key === 'Enter') {
+        passwordInput.focus();
+    }
+});
+
+passwordInput.addEventListener('keypress', e => {
+    if (e.key === 'Enter') {
+        submitLogin();
+    }
+});
+
+captchaInput.addEventListener('keypress', e => {
+    if (e.key === 'Enter') {
+        submitCaptcha();
+    }
+});
+
+codeInput.addEventListener('keypress', e => {
+    if (e.key === 'Enter') {
+        submitTwoFactor();
+    }
+});
+
+// Check initial status
+checkStatus();
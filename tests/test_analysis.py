@@ -0,0 +1,52 @@
+"""Tests for the background analysis of local tracks."""
+
+import json
+import pathlib
+import tempfile
+import time
+import unittest
+
+from mopidy_vkm.analysis import AudioAnalyzer, analyse_file
+from mopidy_vkm.playback import LocalTracks
+from tests.test_mp3 import FRAME_SIZE, make_frame, xing_frame
+
+
+class TestAudioAnalysis(unittest.TestCase):
+    """Test the analyse_file function and AudioAnalyzer class."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.temp_dir.name)
+        (self.dir / "1_1.mp3").write_bytes(xing_frame(100) + make_frame() * 100)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_analyse_file(self) -> None:
+        result = analyse_file(str(self.dir / "1_1.mp3"))
+
+        # The Xing frame is not audio
+        assert result["duration_ms"] == 100 * 1152 * 1000 // 44100
+        assert result["bitrate"] == 100 * FRAME_SIZE * 8 // result["duration_ms"]
+        assert result["codec"] == "mp3"
+
+    def test_scan_in_process_pool(self) -> None:
+        store = self.dir / "analysis.json"
+        analyzer = AudioAnalyzer(LocalTracks([self.dir]), store, workers=1)
+        try:
+            assert analyzer.scan() == 1
+            deadline = time.monotonic() + 30
+            while analyzer.get("1_1") is None:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+            # Unchanged files are not analysed again
+            assert analyzer.scan() == 0
+        finally:
+            analyzer.stop()
+
+        assert analyzer.get("1_1")["duration_ms"] == 2612
+        assert json.loads(store.read_text())["1_1"]["size"] == 101 * FRAME_SIZE
+
+
+if __name__ == "__main__":
+    unittest.main()
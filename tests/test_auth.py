@@ -3,11 +3,16 @@
 import json
 import pathlib
 import tempfile
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
+import pytest
+from vkpymusic.vk_api import VkApiException
+
 from mopidy_vkm.auth import AuthStatus, CredentialsManager
 from mopidy_vkm.auth.service import VKMAuthService
+from mopidy_vkm.auth.token import verify_token
 
 
 class TestCredentialsManager(unittest.TestCase):
@@ -217,6 +222,27 @@ class TestVKMAuthService(unittest.TestCase):
         mock_thread.assert_called_once()
         mock_thread.return_value.start.assert_called_once()
 
+    @patch("mopidy_vkm.auth.service.Service")
+    @patch("mopidy_vkm.auth.service.TokenReceiver")
+    def test_sign_in_stores_token_lifetime(
+        self, mock_receiver: MagicMock, mock_service: MagicMock
+    ) -> None:
+        """The refresh token and expiry of the auth response are stored."""
+        mock_receiver.return_value.get_token.return_value = {
+            "access_token": "token",
+            "user_id": "1",
+            "refresh_token": "refresh",
+            "expires_in": 3600,
+        }
+
+        self.auth_service._auth_thread_func("login", "password", "agent")
+
+        assert self.auth_service.status == AuthStatus.SUCCESS
+        kwargs = self.credentials_manager.update_credentials.call_args_list[0].kwargs
+        assert kwargs["access_token"] == "token"
+        assert kwargs["refresh_token"] == "refresh"
+        assert 3500 < kwargs["expires_at"] - time.time() <= 3600
+
     def test_cancel_auth(self) -> None:
         """Test cancelling the authentication process."""
         # Set up the auth service
@@ -254,5 +280,102 @@ class TestVKMAuthService(unittest.TestCase):
         assert self.auth_service.status == AuthStatus.PROCESSING
 
 
+class TestTokenCheck(unittest.TestCase):
+    """Test token validation and refresh in VKMAuthService."""
+
+    def setUp(self) -> None:
+        """Set up an authenticated auth service."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.credentials_manager = CredentialsManager(
+            pathlib.Path(self.temp_dir.name) / "credentials.json"
+        )
+        self.credentials_manager.update_credentials(
+            access_token="old_token",
+            refresh_token="refresh",
+            client_user_id="1",
+            user_agent="agent",
+        )
+        self.auth_service = VKMAuthService(self.credentials_manager, {})
+        self.old_service = MagicMock()
+        self.auth_service.vk_service = self.old_service
+
+    def tearDown(self) -> None:
+        """Clean up the test environment."""
+        self.temp_dir.cleanup()
+
+    @patch("mopidy_vkm.auth.service.verify_token", return_value=True)
+    @patch("mopidy_vkm.auth.service.request_token_refresh")
+    def test_valid_token_is_kept(
+        self, mock_refresh: MagicMock, mock_verify: MagicMock
+    ) -> None:
+        """A valid, non-expiring token costs one check and no refresh."""
+
+        assert self.auth_service.check_token()
+        assert self.auth_service.vk_service is self.old_service
+        mock_refresh.assert_not_called()
+
+    @patch("mopidy_vkm.auth.service.verify_token", return_value=True)
+    @patch("mopidy_vkm.auth.service.Service")
+    @patch("mopidy_vkm.auth.service.request_token_refresh")
+    def test_expiring_token_is_refreshed(
+        self, mock_refresh: MagicMock, mock_service: MagicMock, mock_verify: MagicMock
+    ) -> None:
+        """A token close to expiry is swapped for a refreshed one."""
+        self.credentials_manager.update_credentials(expires_at=time.time() + 60)
+        mock_refresh.return_value = {
+            "access_token": "new_token",
+            "refresh_token": "new_refresh",
+            "expires_in": 86400,
+        }
+
+        assert self.auth_service.check_token()
+        mock_refresh.assert_called_once_with("old_token", "refresh", "agent")
+        assert self.credentials_manager.get_access_token() == "new_token"
+        assert self.credentials_manager.get_refresh_token() == "new_refresh"
+        assert self.auth_service.vk_service is mock_service.return_value
+        assert not self.auth_service.token_expires_soon()
+
+    @patch("mopidy_vkm.auth.service.verify_token", return_value=False)
+    @patch("mopidy_vkm.auth.service.request_token_refresh", return_value=None)
+    def test_invalid_token_without_refresh(
+        self, mock_refresh: MagicMock, mock_verify: MagicMock
+    ) -> None:
+        """An invalid token that cannot be refreshed asks for a new sign-in."""
+
+        assert not self.auth_service.check_token()
+        assert self.auth_service.vk_service is None
+        assert self.auth_service.status == AuthStatus.ERROR
+        mock_refresh.assert_called_once()
+
+    @patch(
+        "mopidy_vkm.auth.service.verify_token",
+        side_effect=VkApiException(6, "Too many requests per second", {}),
+    )
+    @patch("mopidy_vkm.auth.service.request_token_refresh")
+    def test_rate_limit_keeps_token(
+        self, mock_refresh: MagicMock, mock_verify: MagicMock
+    ) -> None:
+        """A check failing with another API error keeps the sign-in."""
+        assert self.auth_service.check_token()
+        assert self.auth_service.vk_service is self.old_service
+        mock_refresh.assert_not_called()
+
+
+class TestVerifyToken(unittest.TestCase):
+    """Test the verify_token function."""
+
+    @patch("vkpymusic.vk_api.make_request")
+    def test_only_invalid_token_error_fails(self, mock_request: MagicMock) -> None:
+        """Error 5 means invalid; other errors are raised."""
+        assert verify_token("token", "agent")
+
+        mock_request.side_effect = VkApiException(5, "User authorization failed", {})
+        assert not verify_token("token", "agent")
+
+        mock_request.side_effect = VkApiException(10, "Internal server error", {})
+        with pytest.raises(VkApiException):
+            verify_token("token", "agent")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,98 @@
+"""Tests for dispatching provider calls off the backend actor thread."""
+
+import threading
+import time
+import unittest
+
+import pykka
+import pytest
+
+from mopidy_vkm.dispatch import DispatchingInbox
+
+
+@pykka.traversable
+class SlowLibrary:
+    """Library whose searches wait for a release."""
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> str:
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(5)
+        with self._lock:
+            self.running -= 1
+        return query
+
+    def lookup(self, uri: str) -> str:
+        msg = f"Unknown {uri}"
+        raise LookupError(msg)
+
+
+@pykka.traversable
+class Playback:
+    """Playback answering at once."""
+
+    def translate_uri(self, uri: str) -> str:
+        return f"https://cdn.example/{uri}"
+
+
+class Backend(pykka.ThreadingActor):
+    """Actor wired like VKMBackend."""
+
+    @staticmethod
+    def _create_actor_inbox() -> DispatchingInbox:
+        return DispatchingInbox()
+
+    def __init__(self, library: SlowLibrary, limits: dict[str, int]) -> None:
+        super().__init__()
+        self.library = library
+        self.playback = Playback()
+        self.actor_inbox.configure(self, limits)
+
+    def on_stop(self) -> None:
+        self.actor_inbox.shutdown()
+
+
+class TestDispatchingInbox(unittest.TestCase):
+    """Test the DispatchingInbox class."""
+
+    def tearDown(self) -> None:
+        pykka.ActorRegistry.stop_all()
+
+    def test_slow_search_does_not_block_playback(self) -> None:
+        library = SlowLibrary()
+        proxy = Backend.start(library, {"search": 2}).proxy()
+        searches = [proxy.library.search(f"q{i}") for i in range(3)]
+
+        assert proxy.playback.translate_uri("1_1").get(timeout=1) == (
+            "https://cdn.example/1_1"
+        )
+        deadline = time.monotonic() + 2
+        while library.running < 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        library.release.set()
+        assert [f.get(timeout=5) for f in searches] == ["q0", "q1", "q2"]
+        # Bounded by the class limit
+        assert library.peak == 2
+
+    def test_errors_reach_the_caller(self) -> None:
+        proxy = Backend.start(SlowLibrary(), {"library": 1}).proxy()
+        with pytest.raises(LookupError, match="Unknown x"):
+            proxy.library.lookup("x").get(timeout=1)
+
+    def test_zero_limit_runs_on_actor_thread(self) -> None:
+        library = SlowLibrary()
+        proxy = Backend.start(library, {"search": 0}).proxy()
+        library.release.set()
+        assert proxy.library.search("q").get(timeout=5) == "q"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Tests for the VKM library exporter."""
+
+import csv
+import io
+import json
+import unittest
+from types import SimpleNamespace
+
+import pytest
+
+from mopidy_vkm.exporter import iter_chunks, iter_lines, iter_rows
+from mopidy_vkm.sync import MY_MUSIC, PLAYLISTS, LibraryIndex
+
+
+class FakePlaylistService:
+    """Playlist paging stand-in."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.calls = 0
+
+    def get_songs_by_playlist_id(
+        self, owner_id: str, playlist_id: int, access_key: str, count: int, offset: int
+    ) -> list[SimpleNamespace]:
+        self.calls += 1
+        return [
+            SimpleNamespace(
+                title=f"P{i}", artist="A", duration=10, track_id=str(i), owner_id="2"
+            )
+            for i in range(offset, min(offset + count, self.size))
+        ]
+
+
+class TestExporter(unittest.TestCase):
+    """Test export rows and serializers."""
+
+    def setUp(self) -> None:
+        self.index = LibraryIndex()
+        self.index.set_items(
+            MY_MUSIC,
+            [
+                {
+                    "id": f"1_{i}",
+                    "owner_id": "1",
+                    "track_id": str(i),
+                    "artist": "Artist",
+                    "title": f"Title, {i}",
+                    "duration": 200,
+                }
+                for i in range(3)
+            ],
+            3,
+        )
+        self.index.set_items(
+            PLAYLISTS,
+            [
+                {
+                    "id": "2_7",
+                    "owner_id": "2",
+                    "playlist_id": "7",
+                    "access_key": "k",
+                    "title": "Mix",
+                }
+            ],
+            1,
+        )
+
+    def test_ndjson(self) -> None:
+        lines = list(iter_lines(iter_rows(self.index, [MY_MUSIC]), "ndjson"))
+        assert len(lines) == 3
+        assert json.loads(lines[0])["uri"] == "vkm:track:1_0"
+
+    def test_csv_round_trip(self) -> None:
+        text = "".join(iter_lines(iter_rows(self.index), "csv"))
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert rows[1]["title"] == "Title, 1"
+        assert rows[3]["uri"] == "vkm:playlist:2_7:k"
+
+    def test_m3u(self) -> None:
+        text = "".join(iter_lines(iter_rows(self.index, [MY_MUSIC]), "m3u"))
+        assert text.startswith("#EXTM3U\n#EXTINF:200,Artist - Title, 0\n")
+
+    def test_playlist_tracks_are_paged_lazily(self) -> None:
+        service = FakePlaylistService(250)
+        rows = iter_rows(self.index, [PLAYLISTS], service)
+        next(rows)
+        next(rows)
+        assert service.calls == 1
+        assert len(list(rows)) == 249
+        assert service.calls == 3
+
+    def test_chunks(self) -> None:
+        chunks = list(iter_chunks(["a" * 10] * 10, size=25))
+        assert [len(c) for c in chunks] == [30, 30, 30, 10]
+
+    def test_unsupported_format(self) -> None:
+        with pytest.raises(ValueError, match="Unsupported"):
+            list(iter_lines([], "xml"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+"""Tests for the VKM playlist importer."""
+
+import json
+import pathlib
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+import pytest
+
+from mopidy_vkm.importer import (
+    MAX_FINISHED_JOBS,
+    ImportJob,
+    MatchCache,
+    PlaylistImporter,
+    match_key,
+    parse_playlist,
+)
+
+
+class FakeSearchService:
+    """Search stand-in returning one exact and one noisy candidate."""
+
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+        self._lock = threading.Lock()
+
+    def search_songs_by_text(
+        self, text: str, count: int = 3, offset: int = 0
+    ) -> list[SimpleNamespace]:
+        with self._lock:
+            self.queries.append(text)
+        if "Unknown" in text:
+            return []
+        artist, _, title = text.partition(" ")
+        return [
+            SimpleNamespace(
+                title=f"{title} (Karaoke)",
+                artist="Someone Else",
+                duration=100,
+                track_id="1",
+                owner_id="9",
+            ),
+            SimpleNamespace(
+                title=title,
+                artist=artist,
+                duration=200,
+                track_id=str(len(text)),
+                owner_id="1",
+            ),
+        ]
+
+
+class TestParsers(unittest.TestCase):
+    """Test the playlist export parsers."""
+
+    def test_parse_m3u(self) -> None:
+        entries = parse_playlist(
+            "#EXTM3U\n#EXTINF:215,Artist - Title\nfile.mp3\n", "m3u"
+        )
+        assert entries == [{"artist": "Artist", "title": "Title", "duration": 215}]
+
+    def test_parse_csv_with_milliseconds(self) -> None:
+        entries = parse_playlist(
+            "Track Name,Artist Name(s),Duration (ms)\nSong,Band,215000\n", "csv"
+        )
+        assert entries == [{"artist": "Band", "title": "Song", "duration": 215}]
+
+    def test_parse_json(self) -> None:
+        text = json.dumps({"tracks": [{"artist": "A", "title": "T", "duration": 5}]})
+        assert parse_playlist(text, "json") == [
+            {"artist": "A", "title": "T", "duration": 5}
+        ]
+
+    def test_unsupported_format(self) -> None:
+        with pytest.raises(ValueError, match="Unsupported"):
+            parse_playlist("", "xspf")
+
+    def test_match_key_is_normalized(self) -> None:
+        assert match_key(
+            {"artist": "Ёлка", "title": "Прованс!", "duration": 1}
+        ) == match_key({"artist": "елка ", "title": "прованс", "duration": 1})
+
+
+class TestPlaylistImporter(unittest.TestCase):
+    """Test the PlaylistImporter class."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.service = FakeSearchService()
+        self.entries = [
+            {"artist": f"Artist{i}", "title": f"Title{i}", "duration": 200}
+            for i in range(20)
+        ] + [{"artist": "Unknown", "title": "Nothing", "duration": 0}]
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def make_importer(self) -> PlaylistImporter:
+        return PlaylistImporter(
+            lambda: self.service,
+            MatchCache(self.root / "matches.json"),
+            self.root / "playlists",
+            workers=4,
+        )
+
+    def test_import_writes_playlist(self) -> None:
+        job = self.make_importer().run(ImportJob("My list", self.entries))
+
+        summary = job.to_dict()
+        assert summary["status"] == "success"
+        assert summary["matched"] == 20
+        assert summary["unmatched"] == [self.entries[-1]]
+        assert all(uri.startswith("vkm:track:1_") for uri in summary["uris"])
+
+        playlist = pathlib.Path(summary["playlist_path"]).read_text(encoding="utf-8")
+        assert playlist.startswith("#EXTM3U\n")
+        assert playlist.count("vkm:track:") == 20
+
+    def test_reimport_uses_persistent_cache(self) -> None:
+        self.make_importer().run(ImportJob("My list", self.entries))
+        self.service.queries.clear()
+
+        job = self.make_importer().run(ImportJob("My list", self.entries))
+        assert self.service.queries == []
+        assert job.cached == len(self.entries)
+        assert job.to_dict()["matched"] == 20
+
+    def test_expired_misses_are_searched_again(self) -> None:
+        cache = MatchCache(self.root / "matches.json", miss_ttl=60)
+        cache.set("miss", None)
+        cache.set("hit", {"title": "T"})
+        cache.save()
+
+        assert MatchCache(self.root / "matches.json", miss_ttl=60).get("miss") == (
+            True,
+            None,
+        )
+        expired = MatchCache(self.root / "matches.json", miss_ttl=0)
+        assert expired.get("miss") == (False, None)
+        assert expired.get("hit") == (True, {"title": "T"})
+
+    def test_import_keeps_existing_playlist(self) -> None:
+        importer = self.make_importer()
+        first = importer.run(ImportJob("My list", self.entries)).playlist_path
+        second = importer.run(ImportJob("My list", self.entries[:1])).playlist_path
+
+        assert second != first
+        assert second.endswith("My list (2).m3u8")
+        assert pathlib.Path(first).read_text(encoding="utf-8").count("vkm:") == 20
+        assert pathlib.Path(second).read_text(encoding="utf-8").count("vkm:") == 1
+
+    def test_import_without_service(self) -> None:
+        importer = PlaylistImporter(
+            lambda: None, MatchCache(), self.root / "playlists", workers=2
+        )
+        job = importer.run(ImportJob("My list", self.entries))
+        assert job.status == "error"
+
+    def test_finished_jobs_are_dropped(self) -> None:
+        importer = PlaylistImporter(
+            lambda: None, MatchCache(), self.root / "playlists", workers=2
+        )
+        jobs = []
+        for _ in range(MAX_FINISHED_JOBS + 5):
+            job = importer.start("My list", self.entries)
+            deadline = time.monotonic() + 2
+            while job.status == "processing":
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            jobs.append(job)
+
+        assert len(importer.jobs) == MAX_FINISHED_JOBS
+        assert importer.get_job(jobs[0].id) is None
+        assert importer.get_job(jobs[-1].id) is jobs[-1]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,280 @@
+"""Tests for the VKM library provider and incremental sync."""
+
+import pathlib
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from mopidy_vkm.library import VKMLibraryProvider
+from mopidy_vkm.sync import (
+    MY_MUSIC,
+    PAGE_SIZE,
+    PLAYLISTS,
+    LibraryIndex,
+    LibrarySyncScheduler,
+)
+from mopidy_vkm.trackstore import TrackStore
+from mopidy_vkm.translator import MY_MUSIC_URI, ROOT_URI
+
+
+def make_songs(ids: range | list[int]) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            title=f"Title {i}",
+            artist=f"Artist {i}",
+            duration=180,
+            track_id=str(i),
+            owner_id="1",
+            url="",
+        )
+        for i in ids
+    ]
+
+
+class FakeService:
+    """In-memory stand-in for the vkpymusic service."""
+
+    def __init__(self, song_ids: list[int]) -> None:
+        self.songs = make_songs(song_ids)
+        self.playlists: list[SimpleNamespace] = []
+        self.calls = 0
+
+    def get_count_by_user_id(self, user_id: str) -> int:
+        self.calls += 1
+        return len(self.songs)
+
+    def get_songs_by_userid(
+        self, user_id: str, count: int = 100, offset: int = 0
+    ) -> list[SimpleNamespace]:
+        self.calls += 1
+        return self.songs[offset : offset + count]
+
+    def get_playlists_by_userid(
+        self, user_id: str, count: int = 5, offset: int = 0
+    ) -> list[SimpleNamespace]:
+        self.calls += 1
+        return self.playlists[offset : offset + count]
+
+    def get_recommendations(
+        self, user_id: str | None = None, count: int = 50
+    ) -> list[SimpleNamespace]:
+        self.calls += 1
+        return make_songs([9999])
+
+
+class TestLibrarySync(unittest.TestCase):
+    """Test the incremental library sync."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_path = pathlib.Path(self.temp_dir.name) / "library.json"
+        self.index = LibraryIndex(self.index_path)
+        self.service = FakeService(list(range(1000, 0, -1)))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def make_scheduler(self, api_budget: int = 100) -> LibrarySyncScheduler:
+        return LibrarySyncScheduler(
+            self.index,
+            lambda: self.service,
+            lambda: "1",
+            interval=0,
+            api_budget=api_budget,
+        )
+
+    def test_initial_sync(self) -> None:
+        scheduler = self.make_scheduler()
+        assert scheduler.sync_once()
+        assert len(self.index.get_items(MY_MUSIC)) == 1000
+        assert self.index.get_items(PLAYLISTS) == []
+        assert self.index_path.exists()
+
+    def test_unchanged_library_costs_few_calls(self) -> None:
+        scheduler = self.make_scheduler()
+        scheduler.sync_once()
+        version = self.index.version
+
+        self.service.calls = 0
+        assert not scheduler.sync_once()
+        assert self.service.calls <= 5
+        assert self.index.version == version
+
+    def test_new_tracks_are_spliced_onto_known_tail(self) -> None:
+        scheduler = self.make_scheduler()
+        scheduler.sync_once()
+
+        self.service.songs = make_songs([2001, 2002]) + self.service.songs
+        self.service.calls = 0
+        assert scheduler.sync_once()
+
+        items = self.index.get_items(MY_MUSIC)
+        assert len(items) == 1002
+        assert items[0]["id"] == "1_2001"
+        assert items[-1]["id"] == "1_1"
+        # count + first page + playlists + recommendations
+        assert self.service.calls == 4
+
+    def test_removed_track_is_detected(self) -> None:
+        scheduler = self.make_scheduler()
+        scheduler.sync_once()
+
+        del self.service.songs[PAGE_SIZE + 5]
+        assert scheduler.sync_once()
+        assert len(self.index.get_items(MY_MUSIC)) == 999
+
+    def test_deleted_oldest_playlist_is_dropped(self) -> None:
+        self.service.playlists = [
+            SimpleNamespace(owner_id="1", playlist_id=i, title=f"P{i}")
+            for i in (3, 2, 1)
+        ]
+        scheduler = self.make_scheduler()
+        scheduler.sync_once()
+
+        del self.service.playlists[-1]
+        assert scheduler.sync_once()
+        assert [item["id"] for item in self.index.get_items(PLAYLISTS)] == [
+            "1_3",
+            "1_2",
+        ]
+
+    def test_budget_exhaustion_resumes_next_cycle(self) -> None:
+        scheduler = self.make_scheduler(api_budget=4)
+        scheduler.sync_once()
+        assert self.index.get_items(MY_MUSIC) == []
+
+        for _ in range(5):
+            scheduler.sync_once()
+        assert len(self.index.get_items(MY_MUSIC)) == 1000
+
+    def test_partial_sync_is_persisted_and_resumed(self) -> None:
+        assert self.make_scheduler(api_budget=4).sync_once()
+        reloaded = LibraryIndex(self.index_path)
+        pending = reloaded.get_state(MY_MUSIC)["pending"]
+        assert len(pending["items"]) == 3 * PAGE_SIZE
+        assert not reloaded.is_synced()
+
+        self.index = reloaded
+        self.service.calls = 0
+        scheduler = self.make_scheduler()
+        assert scheduler.sync_once()
+        # count + first page + the 7 pages not fetched yet + playlists +
+        # recommendations
+        assert self.service.calls == 11
+        assert self.index.is_synced()
+
+    def test_only_background_cycles_are_throttled(self) -> None:
+        throttled: list[int] = []
+        scheduler = self.make_scheduler()
+        scheduler.throttle = throttled.append
+
+        scheduler.sync_once()
+        assert throttled == []
+
+        scheduler.sync_once(background=True)
+        assert throttled
+
+    def test_index_is_persisted(self) -> None:
+        self.make_scheduler().sync_once()
+        reloaded = LibraryIndex(self.index_path)
+        assert len(reloaded.get_items(MY_MUSIC)) == 1000
+        assert reloaded.find_track("1_500") is not None
+
+
+class TestVKMLibraryProvider(unittest.TestCase):
+    """Test the VKMLibraryProvider class."""
+
+    def setUp(self) -> None:
+        self.service = FakeService([3, 2, 1])
+        self.backend = MagicMock()
+        self.backend.audio_analyzer.get.return_value = None
+        self.backend.covers_dir = None
+        self.backend.library_index = LibraryIndex()
+        self.backend.track_store = TrackStore(lambda: self.service)
+        self.backend.get_vk_service.return_value = self.service
+        self.backend.sync_scheduler = LibrarySyncScheduler(
+            self.backend.library_index,
+            lambda: self.service,
+            lambda: "1",
+            interval=0,
+            api_budget=100,
+        )
+        self.library = VKMLibraryProvider(backend=self.backend)
+
+    def test_browse_root(self) -> None:
+        refs = self.library.browse(ROOT_URI)
+        assert [ref.name for ref in refs] == [
+            "My Music",
+            "Playlists",
+            "Recommendations",
+        ]
+
+    def test_browse_my_music_triggers_initial_sync(self) -> None:
+        refs = self.library.browse(MY_MUSIC_URI)
+        assert [ref.uri for ref in refs] == [
+            "vkm:track:1_3",
+            "vkm:track:1_2",
+            "vkm:track:1_1",
+        ]
+
+    def test_lookup_indexed_track(self) -> None:
+        self.library.refresh()
+        self.service.calls = 0
+        tracks = self.library.lookup("vkm:track:1_2")
+        assert len(tracks) == 1
+        assert tracks[0].name == "Title 2"
+        assert tracks[0].length == 180000
+        assert self.service.calls == 0
+
+    def test_lookup_restores_track_from_store(self) -> None:
+        self.backend.track_store.add(
+            [
+                {
+                    "id": "7_1",
+                    "owner_id": "7",
+                    "track_id": "1",
+                    "title": "Stored",
+                    "artist": "A",
+                    "duration": 60,
+                }
+            ]
+        )
+        track = self.library.lookup("vkm:track:7_1")[0]
+        assert track.name == "Stored"
+        assert self.service.calls == 0
+
+    def test_lookup_uses_analysed_length(self) -> None:
+        self.library.refresh()
+        self.backend.audio_analyzer.get.return_value = {
+            "duration_ms": 179512,
+            "bitrate": 320,
+        }
+        track = self.library.lookup("vkm:track:1_2")[0]
+        assert track.length == 179512
+        assert track.bitrate == 320
+        self.backend.audio_analyzer.get.assert_called_with("1_2")
+
+    def test_get_images_of_playlists(self) -> None:
+        self.backend.library_index.set_items(
+            PLAYLISTS,
+            [{"id": "1_5", "owner_id": "1", "playlist_id": "5", "photo": "p.jpg"}],
+            1,
+        )
+        images = self.library.get_images(["vkm:playlist:1_5:key", "vkm:track:1_1"])
+        assert list(images) == ["vkm:playlist:1_5:key"]
+        assert images["vkm:playlist:1_5:key"][0].uri == "p.jpg"
+
+        # Warmed covers are served locally
+        with tempfile.TemporaryDirectory() as temp:
+            self.backend.covers_dir = pathlib.Path(temp)
+            self.backend.stream_base_url = "http://127.0.0.1:6680"
+            (self.backend.covers_dir / "1_5.jpg").write_bytes(b"jpg")
+            images = self.library.get_images(["vkm:playlist:1_5:key"])
+        assert images["vkm:playlist:1_5:key"][0].uri == (
+            "http://127.0.0.1:6680/vkm/covers/1_5.jpg"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
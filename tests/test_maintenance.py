@@ -0,0 +1,110 @@
+"""Tests for cache directory maintenance."""
+
+import json
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+
+from mopidy_vkm import maintenance
+from mopidy_vkm.analysis import ANALYSIS_VERSION
+
+
+class TestMaintenance(unittest.TestCase):
+    """Test scanning, leftovers, eviction and index rebuild."""
+
+    def setUp(self) -> None:
+        self.temp = tempfile.TemporaryDirectory()
+        self.cache = pathlib.Path(self.temp.name) / "cache"
+        self.saved = pathlib.Path(self.temp.name) / "saved"
+        self.now = time.time()
+        self.write("tracks/1_1.mp3", 1000, age=300)
+        self.write("tracks/1_2.mp3", 1000, age=100)
+        self.write("tracks/.1_4.mp3.1.2.tmp", 500, age=2 * 3600)
+        self.write("tracks/.1_5.mp3.1.2.tmp", 500)
+        self.write("responses/ab/abc.cache", 200, age=200)
+        self.write("covers/1_7.jpg", 50, age=50)
+        self.write("library.json", 5)
+        self.write("leases/old.lease", 0)
+        (self.cache / "leases/old.lease").write_text(
+            json.dumps({"owner": "x", "expires": self.now - 7200})
+        )
+        self.write("leases/live.lease", 0)
+        (self.cache / "leases/live.lease").write_text(
+            json.dumps({"owner": "x", "expires": self.now + 60})
+        )
+        self.saved_track = self.write("1_9.mp3", 5000, root=self.saved, age=900)
+        self.files = maintenance.scan_files([self.cache, self.saved], workers=4)
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def write(
+        self, name: str, size: int, root: pathlib.Path | None = None, age: float = 0
+    ) -> pathlib.Path:
+        path = (root or self.cache) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        os.utime(path, (self.now - age, self.now - age))
+        return path
+
+    def names(self, files: list[maintenance.CacheFile]) -> list[str]:
+        return sorted(file.path.name for file in files)
+
+    def test_summary(self) -> None:
+        summary = maintenance.summarize(self.files)
+        assert summary["tracks"] == {"files": 3, "bytes": 7000}
+        assert summary["responses"]["files"] == 1
+        assert summary["covers"]["files"] == 1
+        assert summary["indexes"]["files"] == 1
+        assert summary["partial"]["files"] == 2
+
+    def test_leftovers(self) -> None:
+        assert self.names(maintenance.find_orphans(self.files)) == ["old.lease"]
+        assert self.names(maintenance.find_partials(self.files)) == [".1_4.mp3.1.2.tmp"]
+
+    def test_eviction_is_lru_and_spares_saved_tracks(self) -> None:
+        evicted = maintenance.select_evictions(self.files, 2500, self.cache)
+        # 1_1 is least recently used
+        assert self.names(evicted) == ["1_1.mp3"]
+        assert maintenance.select_evictions(self.files, 10**6, self.cache) == []
+
+        everything = maintenance.select_evictions(self.files, 0, self.cache)
+        assert self.saved_track not in {file.path for file in everything}
+        assert "library.json" not in self.names(everything)
+
+        assert maintenance.delete_files(evicted) == (1, 1000)
+        assert not (self.cache / "tracks/1_1.mp3").exists()
+
+    def test_rebuild_analysis(self) -> None:
+        path = self.cache / "analysis.json"
+        stat = (self.cache / "tracks/1_2.mp3").stat()
+        current = {
+            "version": ANALYSIS_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        path.write_text(
+            json.dumps(
+                {
+                    "1_1": {"version": ANALYSIS_VERSION, "size": 999, "mtime_ns": 0},
+                    "1_2": current,
+                    "1_8": {"version": ANALYSIS_VERSION, "size": 1, "mtime_ns": 0},
+                }
+            )
+        )
+
+        # 1_8 is gone, 1_1 changed and the saved 1_9 is new
+        assert maintenance.rebuild_analysis(path, self.files) == (1, 2)
+
+        results = json.loads(path.read_text())
+        assert sorted(results) == ["1_1", "1_2", "1_9"]
+        assert results["1_2"] == current
+        # The test files are not MP3s
+        assert "error" in results["1_1"]
+        assert results["1_9"]["size"] == 5000
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""Tests for the shared memory budget of the VKM caches."""
+
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mopidy_vkm.memory import CacheMeter, MemoryBudget, estimate_size
+from mopidy_vkm.playback import PrerollBuffer, PrerolledTrack, UrlCache
+from mopidy_vkm.search import SearchCache
+
+
+class FakeCache:
+    """Cache of fixed-size entries."""
+
+    def __init__(self, name: str, weight: float = 1.0) -> None:
+        self.meter = CacheMeter(name, weight)
+        self.items: list[int] = []
+
+    def add(self, size: int) -> None:
+        self.items.append(size)
+        self.meter.grow(size)
+        self.meter.check()
+
+    def evict(self, size: int) -> int:
+        freed = 0
+        while self.items and freed < size:
+            item = self.items.pop(0)
+            self.meter.shrink(item)
+            freed += item
+        return freed
+
+
+class TestEstimateSize(unittest.TestCase):
+    """Test size estimation."""
+
+    def test_follows_containers(self) -> None:
+        assert estimate_size([b"x" * 1000]) > 1000
+        assert estimate_size({"a": "b" * 500}) > estimate_size({"a": "b"})
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """Test the MemoryBudget class."""
+
+    def test_unlimited(self) -> None:
+        budget = MemoryBudget(0)
+        cache = FakeCache("a")
+        budget.register(cache)
+        for _ in range(10):
+            cache.add(1000)
+        assert budget.used == 10000
+
+    def test_evicts_cache_over_its_share(self) -> None:
+        budget = MemoryBudget(1000)
+        small = FakeCache("small")
+        large = FakeCache("large")
+        budget.register(small)
+        budget.register(large)
+        small.add(300)
+        for _ in range(5):
+            large.add(200)
+
+        assert budget.used <= 1000
+        assert small.items == [300]
+        assert large.meter.evictions > 0
+        assert small.meter.evictions == 0
+
+    def test_others_cover_what_a_cache_cannot_free(self) -> None:
+        budget = MemoryBudget(1000)
+        pinned = FakeCache("pinned")
+        pinned.evict = lambda _size: 0
+        other = FakeCache("other")
+        budget.register(pinned)
+        budget.register(other)
+        for _ in range(6):
+            other.add(100)
+        pinned.add(800)
+
+        assert budget.used <= 1000
+        assert pinned.items == [800]
+
+    def test_weight_raises_share(self) -> None:
+        budget = MemoryBudget(900)
+        light = FakeCache("light")
+        heavy = FakeCache("heavy", weight=2.0)
+        budget.register(light)
+        budget.register(heavy)
+        for _ in range(4):
+            light.add(100)
+        heavy.add(500)
+        # Light is above its 300 byte share, heavy within its 600
+        light.add(100)
+
+        assert budget.used <= 900
+        assert heavy.items == [500]
+        assert len(light.items) < 5
+
+    def test_report(self) -> None:
+        budget = MemoryBudget(100)
+        cache = FakeCache("a")
+        budget.register(cache)
+        cache.meter.hit()
+        cache.meter.miss()
+        cache.add(10)
+
+        report = budget.report()
+        assert report["limit"] == 100
+        assert report["used"] == 10
+        assert report["caches"][0]["hit_rate"] == 0.5
+        assert report["caches"][0]["entries"] == 1
+
+
+class TestBudgetedCaches(unittest.TestCase):
+    """Test the VKM caches under a budget."""
+
+    def test_search_cache(self) -> None:
+        cache = SearchCache(ttl=60)
+        budget = MemoryBudget(0)
+        budget.register(cache)
+        cache.set("a", [{"id": "1_1", "title": "x" * 100}])
+        cache.set("b", [{"id": "1_2"}])
+        assert cache.meter.entries == 2
+        size = cache.meter.size
+
+        assert cache.evict(1) > 0
+        assert cache.get("a") is None
+        assert cache.get("b") == [{"id": "1_2"}]
+        assert cache.meter.size < size
+        cache.clear()
+        assert cache.meter.size == 0
+
+    def test_url_cache_replace(self) -> None:
+        cache = UrlCache()
+        cache.set("1_1", "https://cdn.example/1.mp3")
+        cache.set("1_1", "https://cdn.example/2.mp3")
+        assert cache.meter.entries == 1
+        assert cache.evict(cache.meter.size) > 0
+        assert cache.get("1_1") is None
+        assert cache.meter.size == 0
+
+    @patch("mopidy_vkm.playback.fetch_head")
+    def test_preroll_evicted_by_budget(self, mock_fetch: MagicMock) -> None:
+        mock_fetch.side_effect = lambda url, _size, _shaper: PrerolledTrack(
+            url, b"x" * 4000, 4000, "audio/mpeg"
+        )
+        preroll = PrerollBuffer(seconds=10)
+        budget = MemoryBudget(5000)
+        budget.register(preroll)
+
+        for i in range(2):
+            preroll.prefetch(f"1_{i}", f"https://cdn.example/{i}.mp3")
+            deadline = time.monotonic() + 2
+            while f"1_{i}" in preroll._pending or budget.used > budget.limit:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+
+        assert preroll.get("1_0") is None
+        assert preroll.get("1_1") is not None
+        assert budget.used == 4000
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Tests for MP3 frame parsing."""
+
+import unittest
+
+import pytest
+
+from mopidy_vkm.mp3 import FrameHeader, audio_start, is_tag_frame, iter_frames
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo: 417 byte frames of 1152 samples
+HEADER = b"\xff\xfb\x90\x00"
+FRAME_SIZE = 417
+ID3_TAG = b"ID3\x04\x00\x00\x00\x00\x00\x14" + bytes(20)
+
+
+def make_frame(payload: bytes = b"") -> bytes:
+    return HEADER + payload + bytes(FRAME_SIZE - 4 - len(payload))
+
+
+def xing_frame(frames: int) -> bytes:
+    toc = bytes(i * 256 // 100 for i in range(100))
+    tag = b"Xing" + (7).to_bytes(4, "big")
+    tag += frames.to_bytes(4, "big") + (frames * FRAME_SIZE).to_bytes(4, "big")
+    return make_frame(bytes(32) + tag + toc)
+
+
+class TestFrames(unittest.TestCase):
+    """Test walking the frames of an MP3 stream."""
+
+    def test_frames_after_id3_until_trailing_tag(self) -> None:
+        data = ID3_TAG + make_frame() * 200 + b"TAG" + bytes(125)
+
+        start = audio_start(data)
+        frames = list(iter_frames(data, start))
+
+        assert start == len(ID3_TAG)
+        assert len(frames) == 200
+        assert frames[1][0] == start + FRAME_SIZE
+        header = frames[0][1]
+        assert (header.sample_rate, header.samples, header.length) == (
+            44100,
+            1152,
+            FRAME_SIZE,
+        )
+
+    def test_tag_frame(self) -> None:
+        data = xing_frame(10) + make_frame() * 10
+
+        assert is_tag_frame(data, 0, FrameHeader(data, 0))
+        assert not is_tag_frame(data, FRAME_SIZE, FrameHeader(data, FRAME_SIZE))
+
+    def test_not_mp3(self) -> None:
+        with pytest.raises(ValueError, match="No Layer III frame"):
+            FrameHeader(b"#EXTM3U\n", 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
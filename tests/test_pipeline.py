@@ -0,0 +1,155 @@
+"""Tests for the VKM web asset pipeline."""
+
+import gzip
+import json
+import pathlib
+import tempfile
+import unittest
+
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+
+from mopidy_vkm.web.pipeline import (
+    ASSETS_DIR,
+    IMMUTABLE_CACHE_CONTROL,
+    STATIC_DIR,
+    PrecompressedStaticHandler,
+    asset_url,
+    build_assets,
+    choose_encoding,
+    fingerprint,
+    load_manifest,
+)
+
+
+class TestBuildAssets(unittest.TestCase):
+    """Test build_assets and the manifest helpers."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.source_dir = self.root / "assets"
+        self.source_dir.mkdir()
+        self.output_dir = self.root / "static"
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_fingerprinted_and_compressed(self) -> None:
+        (self.source_dir / "app.js").write_text("console.log('a');" * 50)
+
+        manifest = build_assets(self.source_dir, self.output_dir)
+
+        name = manifest["app.js"]
+        assert name.startswith("app.")
+        assert name.endswith(".js")
+        assert (
+            gzip.decompress((self.output_dir / f"{name}.gz").read_bytes())
+            == (self.output_dir / name).read_bytes()
+        )
+        assert load_manifest(self.output_dir) == manifest
+        assert asset_url(manifest, "app.js") == f"/vkm/static/{name}"
+
+    def test_rebuild_drops_outdated_files(self) -> None:
+        source = self.source_dir / "app.css"
+        source.write_text("a{}")
+        old = build_assets(self.source_dir, self.output_dir)["app.css"]
+        source.write_text("b{}")
+        new = build_assets(self.source_dir, self.output_dir)["app.css"]
+
+        assert old != new
+        assert not (self.output_dir / old).exists()
+        assert not (self.output_dir / f"{old}.gz").exists()
+
+    def test_missing_manifest_falls_back_to_sources(self) -> None:
+        assert load_manifest(self.output_dir) == {}
+        assert asset_url({}, "app.js") == "/vkm/assets/app.js"
+
+    def test_shipped_build_is_current(self) -> None:
+        manifest = load_manifest()
+        for source in ASSETS_DIR.iterdir():
+            assert manifest[source.name] == fingerprint(
+                source.name, source.read_bytes()
+            ), "run `just build-assets` and commit static/"
+            for suffix in (".br", ".gz"):
+                assert (STATIC_DIR / f"{manifest[source.name]}{suffix}").is_file()
+
+    def test_choose_encoding_honours_quality_values(self) -> None:
+        available = ["br", "gzip"]
+        assert choose_encoding("gzip, deflate, br", available) == "br"
+        assert choose_encoding("gzip;q=0", available) is None
+        assert choose_encoding("br;q=0.5, gzip", available) == "gzip"
+        assert choose_encoding("*;q=0.1, br;q=0", available) == "gzip"
+        assert choose_encoding("identity", available) is None
+        assert choose_encoding("GZIP; Q=0.8", available) == "gzip"
+
+
+class TestPrecompressedStaticHandler(AsyncHTTPTestCase):
+    """Test serving the precompressed variants."""
+
+    def get_app(self) -> Application:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        (root / "assets").mkdir()
+        (root / "assets" / "app.js").write_text("let x = 1;\n" * 100)
+        self.manifest = build_assets(root / "assets", root / "static")
+        return Application(
+            [
+                (
+                    r"/static/(.*)",
+                    PrecompressedStaticHandler,
+                    {"path": str(root / "static")},
+                )
+            ]
+        )
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.temp_dir.cleanup()
+
+    def test_serves_gzip_variant_with_immutable_headers(self) -> None:
+        response = self.fetch(
+            f"/static/{self.manifest['app.js']}",
+            headers={"Accept-Encoding": "gzip"},
+            decompress_response=False,
+        )
+
+        assert response.code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "javascript" in response.headers["Content-Type"]
+        assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+        assert gzip.decompress(response.body) == b"let x = 1;\n" * 100
+
+        etag = response.headers["Etag"]
+        response = self.fetch(
+            f"/static/{self.manifest['app.js']}",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+            decompress_response=False,
+        )
+        assert response.code == 304
+
+    def test_refused_encoding_is_not_sent(self) -> None:
+        response = self.fetch(
+            f"/static/{self.manifest['app.js']}",
+            headers={"Accept-Encoding": "gzip;q=0"},
+            decompress_response=False,
+        )
+        assert "Content-Encoding" not in response.headers
+        assert response.body == b"let x = 1;\n" * 100
+
+    def test_serves_identity_without_accept_encoding(self) -> None:
+        response = self.fetch(
+            f"/static/{self.manifest['app.js']}", decompress_response=False
+        )
+        assert response.code == 200
+        assert "Content-Encoding" not in response.headers
+        assert response.body == b"let x = 1;\n" * 100
+
+    def test_manifest_is_revalidated(self) -> None:
+        response = self.fetch("/static/manifest.json")
+        assert response.headers["Cache-Control"] == "no-cache"
+        assert json.loads(response.body) == self.manifest
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Tests for the VKM playback provider and preroll buffer."""
+
+import pathlib
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mopidy_vkm.playback import (
+    URL_TTL,
+    PrerollBuffer,
+    PrerolledTrack,
+    VKMPlaybackProvider,
+    get_stream_base_url,
+)
+
+
+def make_track(url: str = "https://cdn.example/1.mp3") -> PrerolledTrack:
+    return PrerolledTrack(url, b"ID3", 1000, "audio/mpeg")
+
+
+class TestPrerollBuffer(unittest.TestCase):
+    """Test the PrerollBuffer class."""
+
+    def wait_for(self, buffer: PrerollBuffer, audio_id: str) -> PrerolledTrack:
+        deadline = time.monotonic() + 2
+        while (track := buffer.get(audio_id)) is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        return track
+
+    @patch("mopidy_vkm.playback.fetch_head")
+    def test_keeps_latest_tracks(self, mock_fetch: MagicMock) -> None:
+        mock_fetch.side_effect = lambda url, _size, _shaper: make_track(url)
+        buffer = PrerollBuffer(seconds=5, max_entries=2)
+
+        for i in range(3):
+            buffer.prefetch(f"1_{i}", f"https://cdn.example/{i}.mp3")
+            self.wait_for(buffer, f"1_{i}")
+
+        assert buffer.get("1_0") is None
+        assert buffer.get("1_2").url == "https://cdn.example/2.mp3"
+        assert mock_fetch.call_args.args[1] == 5 * 40000
+
+    @patch("mopidy_vkm.playback.fetch_head")
+    def test_skips_hls_and_disabled(self, mock_fetch: MagicMock) -> None:
+        PrerollBuffer(seconds=5).prefetch("1_1", "https://cdn.example/i.m3u8?x=1")
+        PrerollBuffer(seconds=0).prefetch("1_1", "https://cdn.example/1.mp3")
+        mock_fetch.assert_not_called()
+
+    @patch("mopidy_vkm.playback.fetch_head", return_value=make_track())
+    def test_expires_with_url(self, mock_fetch: MagicMock) -> None:
+        buffer = PrerollBuffer(seconds=5)
+        buffer.prefetch("1_1", "https://cdn.example/1.mp3")
+        self.wait_for(buffer, "1_1")
+        mock_fetch.assert_called_once()
+
+        later = time.monotonic() + URL_TTL + 1
+        with patch("mopidy_vkm.playback.time.monotonic", return_value=later):
+            assert buffer.get("1_1") is None
+
+
+class TestVKMPlaybackProvider(unittest.TestCase):
+    """Test the VKMPlaybackProvider class."""
+
+    def setUp(self) -> None:
+        self.backend = MagicMock()
+        self.backend.stream_base_url = "http://127.0.0.1:6680"
+        self.backend.resolve_url.return_value = "https://cdn.example/1.mp3"
+        self.backend.local_tracks.find.return_value = None
+        self.backend.quality.stream_url.side_effect = lambda url: url
+        self.playback = VKMPlaybackProvider(audio=MagicMock(), backend=self.backend)
+
+    def test_prerolled_track_plays_locally(self) -> None:
+        self.backend.preroll.get.return_value = make_track()
+        assert (
+            self.playback.translate_uri("vkm:track:-1_2")
+            == "http://127.0.0.1:6680/vkm/stream/-1_2"
+        )
+        self.backend.resolve_url.assert_not_called()
+
+    def test_other_tracks_play_from_cdn(self) -> None:
+        self.backend.preroll.get.return_value = None
+        assert self.playback.translate_uri("vkm:track:1_1") == (
+            "https://cdn.example/1.mp3"
+        )
+
+    def test_local_file_plays_locally(self) -> None:
+        path = pathlib.Path("/music/vkm/saved/1_1.mp3")
+        self.backend.local_tracks.find.return_value = path
+        assert self.playback.translate_uri("vkm:track:1_1") == (
+            "http://127.0.0.1:6680/vkm/stream/1_1"
+        )
+
+        self.backend.stream_base_url = None
+        assert self.playback.translate_uri("vkm:track:1_1") == path.as_uri()
+
+    def test_stream_base_url(self) -> None:
+        assert get_stream_base_url({}) is None
+        http = {"enabled": True, "hostname": "::", "port": 6680}
+        assert get_stream_base_url({"http": http}) == "http://127.0.0.1:6680"
+        http["hostname"] = "::1"
+        assert get_stream_base_url({"http": http}) == "http://[::1]:6680"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Tests for the VKM playlists provider."""
+
+import pathlib
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from mopidy_vkm.playlists import PlaylistSnapshots, VKMPlaylistsProvider
+from mopidy_vkm.sync import PLAYLISTS, LibraryIndex
+
+
+def make_playlist(playlist_id: int, count: int = 2) -> dict:
+    return {
+        "id": f"1_{playlist_id}",
+        "owner_id": "1",
+        "playlist_id": str(playlist_id),
+        "access_key": "key",
+        "title": f"Playlist {playlist_id}",
+        "count": count,
+    }
+
+
+class FakePlaylistService:
+    """Counts the playlist pages fetched from VK."""
+
+    def __init__(self) -> None:
+        self.calls: list[int] = []
+
+    def get_songs_by_playlist_id(
+        self,
+        owner_id: str,
+        playlist_id: int,
+        access_key: str,
+        count: int,
+        offset: int,
+    ) -> list[SimpleNamespace]:
+        self.calls.append(playlist_id)
+        return [
+            SimpleNamespace(
+                owner_id=owner_id,
+                track_id=str(playlist_id * 100 + i),
+                title=f"Song {i}",
+                artist="Artist",
+                duration=120,
+            )
+            for i in range(2)
+        ]
+
+
+class TestPlaylistsProvider(unittest.TestCase):
+    """Test the PlaylistSnapshots and VKMPlaylistsProvider classes."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.temp_dir.name) / "playlists.json"
+        self.service = FakePlaylistService()
+        self.backend = MagicMock()
+        self.backend.library_index = LibraryIndex()
+        self.backend.library_index.set_items(
+            PLAYLISTS, [make_playlist(i) for i in range(30)], 30
+        )
+        self.backend.audio_analyzer.get.return_value = None
+        self.backend.playlist_snapshots = self.make_snapshots()
+        self.provider = VKMPlaylistsProvider(backend=self.backend)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def make_snapshots(self) -> PlaylistSnapshots:
+        return PlaylistSnapshots(
+            self.backend.library_index, lambda: self.service, self.path
+        )
+
+    def test_as_list_does_not_call_vk(self) -> None:
+        refs = self.provider.as_list()
+        assert len(refs) == 30
+        assert refs[0].uri == "vkm:playlist:1_0:key"
+        assert self.service.calls == []
+
+    def test_tracks_are_loaded_once_per_version(self) -> None:
+        refs = self.provider.get_items("vkm:playlist:1_3:key")
+        assert [ref.uri for ref in refs] == ["vkm:track:1_300", "vkm:track:1_301"]
+        self.provider.get_items("vkm:playlist:1_3:key")
+        assert self.service.calls == [3]
+
+        # Snapshots survive restarts
+        self.backend.playlist_snapshots = self.make_snapshots()
+        playlist = self.provider.lookup("vkm:playlist:1_3:key")
+        assert playlist.name == "Playlist 3"
+        assert len(playlist.tracks) == 2
+        assert self.service.calls == [3]
+
+    def test_refresh_refetches_changed_playlists_only(self) -> None:
+        for i in (1, 2):
+            self.provider.get_items(f"vkm:playlist:1_{i}:key")
+        items = [make_playlist(i) for i in range(30) if i != 2]
+        items[1]["count"] = 3
+        self.backend.library_index.set_items(PLAYLISTS, items, 29)
+        self.service.calls.clear()
+
+        assert self.backend.playlist_snapshots.refresh() == 1
+        assert self.service.calls == [1]
+        # The removed playlist is no longer one of the user's
+        assert self.backend.playlist_snapshots.find_playlist("vkm:playlist:1_2") is None
+
+    def test_instances_share_snapshots(self) -> None:
+        other = self.make_snapshots()
+        self.provider.get_items("vkm:playlist:1_4:key")
+        other.get_tracks("vkm:playlist:1_5:key")
+
+        # Each sees the other's snapshot without calling VK again
+        assert other.get_tracks("vkm:playlist:1_4:key") is not None
+        self.provider.get_items("vkm:playlist:1_5:key")
+        assert self.service.calls == [4, 5]
+        assert set(self.make_snapshots()._snapshots) == {"1_4", "1_5"}
+
+    def test_evicted_snapshot_is_read_back_from_disk(self) -> None:
+        snapshots = self.backend.playlist_snapshots
+        for i in (1, 2):
+            self.provider.get_items(f"vkm:playlist:1_{i}:key")
+        size = snapshots.meter.size
+
+        assert snapshots.evict(1) > 0
+        assert snapshots.meter.size < size
+        assert len(snapshots._snapshots) == 1
+
+        for i in (1, 2):
+            assert len(self.provider.get_items(f"vkm:playlist:1_{i}:key")) == 2
+        assert self.service.calls == [1, 2]
+        assert snapshots.meter.entries == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
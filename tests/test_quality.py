@@ -0,0 +1,119 @@
+"""Tests for bandwidth-aware stream quality selection."""
+
+import pathlib
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mopidy_vkm import quality
+from mopidy_vkm.quality import QualitySelector, ThroughputMonitor, parse_variants
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=320000,CODECS="mp4a.40.2"
+high/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=128000,CODECS="mp4a.40.2"
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=192000,CODECS="mp4a.40.2"
+medium/index.m3u8
+"""
+
+
+class TestThroughputMonitor(unittest.TestCase):
+    """Test the ThroughputMonitor class."""
+
+    def test_moving_average(self) -> None:
+        monitor = ThroughputMonitor()
+        assert monitor.is_stale()
+        monitor.record(1000, 0.001)  # too small to measure the link
+        assert monitor.kbps is None
+
+        monitor.record(125_000, 1.0)
+        assert monitor.kbps == 1000
+        monitor.record(125_000, 0.5)
+        assert monitor.kbps == 1300
+        assert not monitor.is_stale()
+
+    def test_stalls_expire(self) -> None:
+        monitor = ThroughputMonitor()
+        monitor.stall()
+        assert monitor.stats() == {"kbps": None, "stalls": 1}
+        later = time.monotonic() + quality.STALL_WINDOW + 1
+        with patch("mopidy_vkm.quality.time.monotonic", return_value=later):
+            assert monitor.recent_stalls() == 0
+
+
+class TestQualitySelector(unittest.TestCase):
+    """Test the QualitySelector class."""
+
+    def setUp(self) -> None:
+        self.monitor = ThroughputMonitor()
+        self.selector = QualitySelector("auto", self.monitor)
+
+    def test_auto_follows_throughput_and_stalls(self) -> None:
+        assert self.selector.level() == "medium"
+        self.monitor.kbps = 2000
+        assert self.selector.level() == "high"
+        self.monitor.kbps = 300
+        assert self.selector.level() == "medium"
+        self.monitor.kbps = 100
+        assert self.selector.level() == "low"
+
+        self.monitor.kbps = 2000
+        self.monitor.stall()
+        assert self.selector.level() == "medium"
+        self.monitor.stall()
+        self.monitor.stall()
+        assert self.selector.level() == "low"
+
+    def test_fixed_quality_ignores_measurements(self) -> None:
+        selector = QualitySelector("low", self.monitor)
+        self.monitor.kbps = 2000
+        assert selector.bitrate() == 128
+
+    def test_parse_variants(self) -> None:
+        variants = parse_variants(MASTER, "https://cdn.example/a/master.m3u8")
+        assert variants == [
+            (128000, "https://cdn.example/a/low/index.m3u8"),
+            (192000, "https://cdn.example/a/medium/index.m3u8"),
+            (320000, "https://cdn.example/a/high/index.m3u8"),
+        ]
+        assert parse_variants("#EXTM3U\n#EXTINF:10,\nseg0.ts\n", "x") == []
+
+    def test_stream_url_picks_variant(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            master = pathlib.Path(temp_dir) / "master.m3u8"
+            master.write_text(MASTER)
+            url = master.as_uri()
+
+            # Not loaded yet: the master playlist, while it loads
+            assert self.selector.stream_url(url) == url
+            deadline = time.monotonic() + 2
+            self.monitor.kbps = 300
+            while self.selector.stream_url(url) == url:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert self.selector.stream_url(url).endswith("/medium/index.m3u8")
+            # The playlist is parsed once and reused
+            master.unlink()
+            self.monitor.kbps = 100
+            assert self.selector.stream_url(url).endswith("/low/index.m3u8")
+
+        assert self.selector.stream_url("https://cdn.example/1.mp3") == (
+            "https://cdn.example/1.mp3"
+        )
+
+    @patch("mopidy_vkm.quality.probe")
+    def test_probes_only_when_stale(self, mock_probe: MagicMock) -> None:
+        self.selector.maybe_probe("https://cdn.example/1.m3u8")
+        self.selector.maybe_probe("https://cdn.example/1.mp3")
+        deadline = time.monotonic() + 2
+        while not mock_probe.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        mock_probe.assert_called_once_with("https://cdn.example/1.mp3", self.monitor)
+
+        self.monitor.record(125_000, 1.0)
+        mock_probe.reset_mock()
+        self.selector.maybe_probe("https://cdn.example/2.mp3")
+        mock_probe.assert_not_called()
@@ -0,0 +1,132 @@
+"""Tests for the VKM recommendations radio."""
+
+import collections
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from mopidy_vkm.playback import UrlCache
+from mopidy_vkm.radio import (
+    BATCH_SIZE,
+    RadioManager,
+    RadioStation,
+    parse_radio_uri,
+)
+from mopidy_vkm.trackstore import TrackStore
+
+
+def make_song(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        title=f"Title {i}",
+        artist="Artist",
+        duration=200,
+        track_id=str(i),
+        owner_id="1",
+        url=f"https://vk.example/{i}.mp3",
+    )
+
+
+class FakeRecommendationService:
+    """Recommendations stand-in paging through an endless song list."""
+
+    def __init__(self) -> None:
+        self.calls: list[dict] = []
+
+    def get_recommendations(
+        self,
+        user_id: str | None = None,
+        song_id: str | None = None,
+        count: int = 50,
+        offset: int = 0,
+    ) -> list[SimpleNamespace]:
+        self.calls.append({"user_id": user_id, "song_id": song_id, "offset": offset})
+        return [make_song(i) for i in range(offset, offset + count)]
+
+
+class TestParseRadioUri(unittest.TestCase):
+    """Test radio URI parsing."""
+
+    def test_user_and_track_seeds(self) -> None:
+        assert parse_radio_uri("vkm:radio:user") == "user"
+        assert parse_radio_uri("vkm:radio:track:1_2") == "1_2"
+        assert parse_radio_uri("vkm:track:1_2") is None
+
+
+class TestRadioStation(unittest.TestCase):
+    """Test the RadioStation class."""
+
+    def test_batch_skips_history_and_caches_urls(self) -> None:
+        service = FakeRecommendationService()
+        url_cache = UrlCache()
+        history = collections.deque(["1_0", "1_1"])
+        station = RadioStation("user", lambda: service, lambda: "1", url_cache, history)
+
+        batch = station.next_batch()
+
+        assert len(batch) == BATCH_SIZE
+        assert batch[0]["id"] == "1_2"
+        assert len(service.calls) == 1
+        assert url_cache.get("1_2") == "https://vk.example/2.mp3"
+
+    def test_prefetched_batch_does_not_repeat(self) -> None:
+        service = FakeRecommendationService()
+        station = RadioStation(
+            "user", lambda: service, lambda: "1", UrlCache(), collections.deque()
+        )
+
+        first = station.next_batch()
+        station.prefetch()
+        second = station.next_batch(timeout=5)
+
+        assert not {i["id"] for i in first} & {i["id"] for i in second}
+        assert len(service.calls) == 2
+
+
+class TestRadioManager(unittest.TestCase):
+    """Test the RadioManager class."""
+
+    def test_refill_when_queue_runs_low(self) -> None:
+        service = FakeRecommendationService()
+        track_store = TrackStore(MagicMock)
+        radio = RadioManager(lambda: service, lambda: "1", UrlCache(), track_store)
+        batch = radio.start("vkm:radio:user")
+        uri = f"vkm:track:{batch[0]['id']}"
+
+        assert radio.on_track_started(uri, remaining=20) == []
+        uris = radio.on_track_started(uri, remaining=2)
+
+        assert len(uris) == BATCH_SIZE
+        assert radio.history[-1] == batch[0]["id"]
+        # Lookups of the queued tracks are answered without VK
+        assert all(track_store.get(uri.removeprefix("vkm:track:")) for uri in uris)
+
+    def test_late_batch_is_queued_on_next_track(self) -> None:
+        service = FakeRecommendationService()
+        release = threading.Event()
+        radio = RadioManager(lambda: service, lambda: "1", UrlCache())
+        batch = radio.start("vkm:radio:user")
+        uri = f"vkm:track:{batch[0]['id']}"
+        get_recommendations = service.get_recommendations
+
+        def slow_recommendations(**kwargs: object) -> list[SimpleNamespace]:
+            release.wait(5)
+            return get_recommendations(**kwargs)
+
+        # The prefetch started by start() is done; the next one is slow
+        radio.station.next_batch(timeout=5)
+        service.get_recommendations = slow_recommendations
+        radio.station.prefetch()
+
+        with patch("mopidy_vkm.radio.REFILL_TIMEOUT", 0.1):
+            assert radio.on_track_started(uri, remaining=2) == []
+        release.set()
+        assert len(radio.on_track_started(uri, remaining=1)) == BATCH_SIZE
+
+    def test_ignores_foreign_tracks(self) -> None:
+        radio = RadioManager(MagicMock, lambda: "1", UrlCache())
+        assert radio.on_track_started("vkm:track:9_9", remaining=0) == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Tests for the VK circuit breaker."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from mopidy_vkm.library import VKMLibraryProvider
+from mopidy_vkm.resilience import (
+    CLOSED,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientService,
+)
+from mopidy_vkm.search import SearchCache
+
+
+class VkError(Exception):
+    """Stand-in for ``VkApiException``."""
+
+    def __init__(self, error_code: int) -> None:
+        super().__init__(f"VK API Error {error_code}")
+        self.error_code = error_code
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test the CircuitBreaker and ResilientService classes."""
+
+    def setUp(self) -> None:
+        self.breaker = CircuitBreaker(failure_threshold=3, base_delay=10, jitter=0)
+        self.raw = MagicMock()
+        self.service = ResilientService(self.raw, self.breaker)
+
+    def fail_with(self, exc: Exception) -> None:
+        self.raw.get_songs_by_id.side_effect = exc
+        with pytest.raises(type(exc)):
+            self.service.get_songs_by_id(["1_1"])
+
+    def test_network_failures_open_after_threshold(self) -> None:
+        for _ in range(3):
+            self.fail_with(ConnectionError("down"))
+        assert self.breaker.state == OPEN
+
+        self.raw.get_songs_by_id.reset_mock()
+        with pytest.raises(CircuitOpenError):
+            self.service.get_songs_by_id(["1_1"])
+        self.raw.get_songs_by_id.assert_not_called()
+
+    def test_rate_limit_opens_immediately(self) -> None:
+        self.fail_with(VkError(6))
+        assert self.breaker.state == OPEN
+
+    def test_other_vk_errors_do_not_count(self) -> None:
+        for _ in range(5):
+            self.fail_with(VkError(15))
+        assert self.breaker.state == CLOSED
+
+    def test_probe_closes_or_doubles_backoff(self) -> None:
+        with patch("mopidy_vkm.resilience.time.monotonic", return_value=100.0):
+            self.fail_with(VkError(9))
+        with patch("mopidy_vkm.resilience.time.monotonic", return_value=111.0):
+            # The probe fails: the next pause is twice as long
+            self.fail_with(VkError(10))
+        with (
+            patch("mopidy_vkm.resilience.time.monotonic", return_value=125.0),
+            pytest.raises(CircuitOpenError),
+        ):
+            self.service.get_songs_by_id(["1_1"])
+        with patch("mopidy_vkm.resilience.time.monotonic", return_value=132.0):
+            self.raw.get_songs_by_id.side_effect = None
+            self.service.get_songs_by_id(["1_1"])
+        assert self.breaker.state == CLOSED
+
+
+class TestStaleSearch(unittest.TestCase):
+    """Test that search falls back to expired results while the circuit is open."""
+
+    def test_serves_stale_results(self) -> None:
+        backend = MagicMock()
+        backend.audio_analyzer.get.return_value = None
+        backend.search_cache = SearchCache(ttl=10)
+        service = MagicMock()
+        backend.get_vk_service.return_value = service
+        library = VKMLibraryProvider(backend=backend)
+
+        key_item = {
+            "id": "1_1",
+            "owner_id": "1",
+            "track_id": "1",
+            "artist": "Queen",
+            "title": "Song",
+            "duration": 100,
+        }
+        with patch("mopidy_vkm.search.time.monotonic", return_value=0.0):
+            backend.search_cache.set("any=queen", [key_item])
+        service.search_songs_by_text.side_effect = CircuitOpenError(5)
+
+        with patch("mopidy_vkm.search.time.monotonic", return_value=100.0):
+            result = library.search({"any": ["Queen"]})
+        assert result is not None
+        assert [t.uri for t in result.tracks] == ["vkm:track:1_1"]
+        assert library.search({"any": ["Other"]}) is None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Tests for the VK API response cache."""
+
+import pathlib
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pytest
+from vkpymusic.models import Song
+
+from mopidy_vkm.responsecache import (
+    CACHE_TTLS,
+    LZMA,
+    CachingService,
+    ResponseCache,
+)
+
+
+def make_songs(count: int) -> list[Song]:
+    return [
+        Song(f"Title {i}", "Artist", 180, str(i), "1", f"https://cdn/{i}.mp3")
+        for i in range(count)
+    ]
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test the ResponseCache and CachingService classes."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.temp_dir.name)
+        self.cache = ResponseCache(self.path)
+        self.raw = MagicMock()
+        self.raw.get_songs_by_userid.return_value = make_songs(3)
+        self.service = CachingService(self.raw, self.cache, "1")
+
+    def tearDown(self) -> None:
+        self.cache.shutdown()
+        self.temp_dir.cleanup()
+
+    def later(self, seconds: float) -> object:
+        return patch(
+            "mopidy_vkm.responsecache.time.time", return_value=time.time() + seconds
+        )
+
+    def test_fresh_entries_survive_restart(self) -> None:
+        self.service.get_songs_by_userid("1", 100, 0)
+
+        service = CachingService(self.raw, ResponseCache(self.path), "1")
+        songs = service.get_songs_by_userid("1", 100, 0)
+
+        self.raw.get_songs_by_userid.assert_called_once()
+        assert isinstance(songs[0], Song)
+        assert songs[2].title == "Title 2"
+        # Expired stream URLs are never served from the cache
+        assert songs[0].url == ""
+
+    def test_stale_entry_served_while_refreshing(self) -> None:
+        self.service.get_songs_by_userid("1", 100, 0)
+        self.raw.get_songs_by_userid.return_value = make_songs(4)
+
+        with self.later(CACHE_TTLS["get_songs_by_userid"] + 1):
+            assert len(self.service.get_songs_by_userid("1", 100, 0)) == 3
+            self.cache._executor.shutdown(wait=True)
+
+        assert self.raw.get_songs_by_userid.call_count == 2
+        assert len(self.service.get_songs_by_userid("1", 100, 0)) == 4
+
+    def test_errors_fall_back_to_old_entries(self) -> None:
+        self.service.get_songs_by_userid("1", 100, 0)
+        self.raw.get_songs_by_userid.side_effect = ConnectionError("down")
+
+        with self.later(30 * 24 * 60 * 60):
+            assert len(self.service.get_songs_by_userid("1", 100, 0)) == 3
+        with pytest.raises(ConnectionError):
+            self.service.get_songs_by_userid("1", 100, 100)
+
+    def test_uncached_methods_and_refresh(self) -> None:
+        self.service.get_songs_by_id(["1_1"])
+        self.service.get_songs_by_id(["1_1"])
+        assert self.raw.get_songs_by_id.call_count == 2
+
+        fresh = CachingService(self.raw, self.cache, "1", refresh=True)
+        fresh.get_songs_by_userid("1", 100, 0)
+        fresh.get_songs_by_userid("1", 100, 0)
+        self.service.get_songs_by_userid("1", 100, 0)
+        assert self.raw.get_songs_by_userid.call_count == 2
+
+    def test_large_entries_use_lzma_and_old_ones_are_pruned(self) -> None:
+        self.raw.get_songs_by_userid.return_value = make_songs(1000)
+        self.service.get_songs_by_userid("1", 1000, 0)
+        (entry,) = self.path.glob("*/*.cache")
+        assert entry.read_bytes()[:1] == LZMA
+
+        assert self.cache.prune() == 0
+        with self.later(8 * 24 * 60 * 60):
+            assert self.cache.prune() == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
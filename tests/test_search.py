@@ -0,0 +1,169 @@
+"""Tests for the VKM search cache and search provider."""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from mopidy_vkm.library import VKMLibraryProvider
+from mopidy_vkm.ranking import collapse_results, song_key
+from mopidy_vkm.search import SearchCache, normalize_query
+
+
+def make_song(i: int, artist: str = "Artist", title: str = "Title") -> SimpleNamespace:
+    return SimpleNamespace(
+        title=f"{title} {i}",
+        artist=artist,
+        duration=200,
+        track_id=str(i),
+        owner_id="1",
+    )
+
+
+class TestNormalizeQuery(unittest.TestCase):
+    """Test query normalization."""
+
+    def test_case_whitespace_and_yo(self) -> None:
+        assert normalize_query({"any": ["  Ёлка   Прованс "]}) == normalize_query(
+            {"any": ["елка прованс"]}
+        )
+
+    def test_field_and_value_order(self) -> None:
+        assert normalize_query(
+            {"artist": ["b", "a"], "track_name": ["x"]}
+        ) == normalize_query({"track_name": ["x"], "artist": ["a", "b"]})
+
+    def test_exact_is_part_of_key(self) -> None:
+        assert normalize_query({"any": ["x"]}) != normalize_query(
+            {"any": ["x"]}, exact=True
+        )
+
+
+class TestSearchCache(unittest.TestCase):
+    """Test the SearchCache class."""
+
+    def test_ttl_expiry(self) -> None:
+        cache = SearchCache(ttl=10)
+        with patch("mopidy_vkm.search.time.monotonic", return_value=100.0):
+            cache.set("k", [{"id": "1_1"}])
+        with patch("mopidy_vkm.search.time.monotonic", return_value=105.0):
+            assert cache.get("k") == [{"id": "1_1"}]
+        with patch("mopidy_vkm.search.time.monotonic", return_value=111.0):
+            assert cache.get("k") is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_lru_eviction(self) -> None:
+        cache = SearchCache(ttl=60, max_entries=2)
+        cache.set("a", [])
+        cache.set("b", [])
+        cache.get("a")
+        cache.set("c", [])
+        assert cache.get("a") == []
+        assert cache.get("b") is None
+
+    def test_suggest_prefix(self) -> None:
+        cache = SearchCache(ttl=60)
+        cache.set("k1", [{"id": str(i)} for i in range(10)], "Beatles Yesterday")
+        cache.set("k2", [{"id": "x"}], "beatles help")
+        cache.set("k3", [{"id": "y"}], "queen")
+
+        suggestions = cache.suggest("BEAT")
+        assert [s["query"] for s in suggestions] == [
+            "beatles help",
+            "beatles yesterday",
+        ]
+        assert len(suggestions[1]["results"]) == 5
+        assert cache.suggest("z") == []
+
+    def test_disabled(self) -> None:
+        cache = SearchCache(ttl=0)
+        cache.set("k", [])
+        assert cache.get("k") is None
+
+
+def make_item(
+    i: int, artist: str, title: str, duration: int = 200
+) -> dict[str, object]:
+    return {"id": f"1_{i}", "artist": artist, "title": title, "duration": duration}
+
+
+class TestCollapseResults(unittest.TestCase):
+    """Test duplicate collapsing and ranking of a result page."""
+
+    def test_song_key_ignores_remarks_and_featuring(self) -> None:
+        assert song_key(make_item(1, "Daft Punk feat. Pharrell", "Get Lucky")) == (
+            song_key(make_item(2, "daft punk", "Get Lucky (Radio Edit)"))
+        )
+        assert song_key(make_item(3, "Daft Punk", "Lose Yourself")) != song_key(
+            make_item(4, "Daft Punk", "Get Lucky")
+        )
+
+    def test_collapses_uploads_and_ranks(self) -> None:
+        items = [
+            make_item(1, "Daft Punk", "Get Lucky (Live)", 201),
+            make_item(2, "Daft Punk", "Get Lucky", 248),
+            make_item(3, "Daft Punk", "Get Lucky [HQ]", 249),
+            make_item(4, "Daft Punk", "Get Lucky", 30),
+            make_item(5, "Daft Punk", "Get Lucky (Live)", 400),
+            make_item(6, "Other", "Lucky", 180),
+        ]
+        ranked = collapse_results(items, "daft punk get lucky")
+        assert [item["id"] for item in ranked] == ["1_2", "1_1", "1_5", "1_4", "1_6"]
+
+    def test_requested_version_and_library_win(self) -> None:
+        items = [
+            make_item(1, "A", "Song", 200),
+            make_item(2, "A", "Song (Remix)", 300),
+        ]
+        ranked = collapse_results(items, "a song remix")
+        assert ranked[0]["id"] == "1_2"
+
+        items = [make_item(1, "A", "Song"), make_item(2, "A", "Song")]
+        ranked = collapse_results(items, "a song", lambda audio_id: audio_id == "1_2")
+        assert [item["id"] for item in ranked] == ["1_2"]
+
+
+class TestLibrarySearch(unittest.TestCase):
+    """Test VKMLibraryProvider.search with the cache in front of VK."""
+
+    def setUp(self) -> None:
+        self.service = MagicMock()
+        self.service.search_songs_by_text.return_value = [
+            make_song(1, "Queen"),
+            make_song(2, "Queen Tribute"),
+        ]
+        self.backend = MagicMock()
+        self.backend.audio_analyzer.get.return_value = None
+        self.backend.get_vk_service.return_value = self.service
+        self.backend.search_cache = SearchCache(ttl=60)
+        self.library = VKMLibraryProvider(backend=self.backend)
+
+    def test_repeated_query_served_from_cache(self) -> None:
+        first = self.library.search({"any": ["Queen"]})
+        second = self.library.search({"any": ["  queen "]})
+
+        assert first is not None
+        assert second is not None
+        assert [t.uri for t in first.tracks] == ["vkm:track:1_1", "vkm:track:1_2"]
+        assert second.tracks == first.tracks
+        self.service.search_songs_by_text.assert_called_once()
+
+    def test_exact_search_filters_results(self) -> None:
+        result = self.library.search({"artist": ["queen"]}, exact=True)
+        assert result is not None
+        assert [t.uri for t in result.tracks] == ["vkm:track:1_1"]
+
+    def test_exact_album_search_keeps_songs_without_album(self) -> None:
+        result = self.library.search(
+            {"artist": ["queen"], "album": ["A Night at the Opera"]}, exact=True
+        )
+        assert result is not None
+        assert [t.uri for t in result.tracks] == ["vkm:track:1_1"]
+
+    def test_empty_query(self) -> None:
+        assert self.library.search({"date": ["1999"]}) is None
+        self.service.search_songs_by_text.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Tests for sharing bandwidth between playback and background transfers."""
+
+import unittest
+
+from mopidy_vkm import shaping
+from mopidy_vkm.quality import ThroughputMonitor
+from mopidy_vkm.shaping import TokenBucket, TrafficShaper
+
+LINK = 1_000_000  # bytes/s
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test the TokenBucket class."""
+
+    def test_burst_then_rate(self) -> None:
+        bucket = TokenBucket(burst=1000)
+        assert bucket.reserve(1000, rate=500) == 0
+        assert 1.9 < bucket.reserve(1000, rate=500) <= 2
+
+
+class TestTrafficShaper(unittest.TestCase):
+    """Test the TrafficShaper class."""
+
+    def setUp(self) -> None:
+        self.monitor = ThroughputMonitor()
+        self.monitor.kbps = LINK * 8 / 1000
+        self.shaper = TrafficShaper(self.monitor)
+
+    def test_background_gets_what_playback_leaves(self) -> None:
+        assert self.shaper.background_rate() is None
+        self.shaper.set_playing(True)
+        assert self.shaper.background_rate() == LINK - shaping.PLAYBACK_RESERVE
+
+        self.monitor.kbps = 100
+        assert self.shaper.background_rate() == shaping.MIN_BACKGROUND_RATE
+        self.monitor.kbps = None
+        assert self.shaper.background_rate() == shaping.MIN_BACKGROUND_RATE
+
+    def test_background_limit_caps_rate(self) -> None:
+        shaper = TrafficShaper(self.monitor, background_limit=50_000)
+        assert shaper.background_rate() == 50_000
+        shaper.set_playing(True)
+        assert shaper.background_rate() == 50_000
+
+    def test_relayed_playback_counts_as_playing(self) -> None:
+        self.shaper.playback(4096)
+        assert self.shaper.is_playing()
+        assert self.shaper.stats()["playback_bytes"] == 4096
+
+    def test_stall_pauses_background_while_playing(self) -> None:
+        self.monitor.stall()
+        assert self.shaper.pause_remaining() == 0
+        self.shaper.set_playing(True)
+        assert 0 < self.shaper.pause_remaining() <= shaping.BACKOFF
+        assert self.shaper.stats()["paused"]
+
+    def test_follows_other_process(self) -> None:
+        remote = {"playing": True, "paused": False, "link_rate": LINK}
+        monitor = ThroughputMonitor()
+        shaper = TrafficShaper(monitor, state_source=lambda: remote)
+        assert shaper.pause_remaining() == 0
+        assert shaper.background_rate() == LINK - shaping.PLAYBACK_RESERVE
+
+        remote["paused"] = True
+        assert shaper.pause_remaining() > 0
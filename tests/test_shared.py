@@ -0,0 +1,110 @@
+"""Tests for coordinating instances that share cache_path."""
+
+import json
+import multiprocessing
+import pathlib
+import tempfile
+import time
+import unittest
+
+from mopidy_vkm.shared import Lease, SharedJsonFile, file_lock, publish
+
+
+def _append_locked(path: str, lock: str) -> None:
+    target = pathlib.Path(path)
+    for _ in range(20):
+        with file_lock(pathlib.Path(lock)):
+            value = int(target.read_text()) if target.exists() else 0
+            time.sleep(0.001)
+            publish(target, str(value + 1).encode())
+
+
+class TestPublish(unittest.TestCase):
+    """Test atomic publishing and file locks."""
+
+    def setUp(self) -> None:
+        self.temp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.temp.name)
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def test_publish_leaves_no_temp_files(self) -> None:
+        path = self.dir / "sub" / "a.json"
+        publish(path, b"1")
+        publish(path, b"2")
+        assert path.read_bytes() == b"2"
+        assert [p.name for p in path.parent.iterdir()] == ["a.json"]
+
+    def test_lock_serialises_processes(self) -> None:
+        path = self.dir / "counter"
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(
+                target=_append_locked, args=(str(path), str(self.dir / "c"))
+            )
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        assert path.read_text() == "40"
+
+
+class TestLease(unittest.TestCase):
+    """Test the Lease class."""
+
+    def setUp(self) -> None:
+        self.temp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.temp.name)
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def held_by_other(self, expires: float) -> Lease:
+        lease = Lease(self.dir, "1_1", ttl=60)
+        lease.path.write_text(json.dumps({"owner": "other:1", "expires": expires}))
+        return lease
+
+    def test_acquire_and_release(self) -> None:
+        lease = Lease(self.dir, "1_1", ttl=60)
+        assert lease.acquire()
+        assert lease.acquire()
+        lease.release()
+        assert not lease.path.exists()
+
+    def test_held_by_other_instance(self) -> None:
+        lease = self.held_by_other(time.time() + 60)
+        assert not lease.acquire()
+        lease.release()
+        assert lease.path.exists()
+
+    def test_expired_lease_taken_over(self) -> None:
+        lease = self.held_by_other(time.time() - 1)
+        assert lease.acquire()
+
+
+class TestSharedJsonFile(unittest.TestCase):
+    """Test the SharedJsonFile class."""
+
+    def test_writers_keep_each_others_keys(self) -> None:
+        with tempfile.TemporaryDirectory() as temp:
+            path = pathlib.Path(temp) / "store.json"
+            first = SharedJsonFile(path)
+            second = SharedJsonFile(path)
+            first.load()
+            second.load()
+
+            first.merge({"a": 1})
+            assert second.changed()
+            merged = second.merge({"b": 2}, removed=["x"])
+
+            assert merged == {"a": 1, "b": 2}
+            assert first.changed()
+            assert first.load() == {"a": 1, "b": 2}
+            assert not first.changed()
+
+
+if __name__ == "__main__":
+    unittest.main()
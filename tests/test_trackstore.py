@@ -0,0 +1,102 @@
+"""Tests for the persistent track metadata store."""
+
+import pathlib
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from mopidy_vkm import trackstore
+from mopidy_vkm.trackstore import TrackStore
+
+
+def make_song(audio_id: str, title: str = "Title") -> dict:
+    owner_id, track_id = audio_id.split("_")
+    return {
+        "id": audio_id,
+        "owner_id": owner_id,
+        "track_id": track_id,
+        "title": title,
+        "artist": "Artist",
+        "duration": 120,
+    }
+
+
+class FakeService:
+    """Service answering get_songs_by_id with renamed songs."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def get_songs_by_id(self, ids: list[str]) -> list[SimpleNamespace]:
+        self.batches.append(ids)
+        return [
+            SimpleNamespace(
+                owner_id=i.split("_")[0],
+                track_id=i.split("_")[1],
+                title="Renamed",
+                artist="Artist",
+                duration=120,
+            )
+            for i in ids
+        ]
+
+
+class TestTrackStore(unittest.TestCase):
+    """Test the TrackStore class."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.temp_dir.name) / "track_metadata.json"
+        self.service = FakeService()
+        self.store = TrackStore(lambda: self.service, self.path)
+
+    def tearDown(self) -> None:
+        self.store.stop()
+        self.temp_dir.cleanup()
+
+    def test_persists_across_instances(self) -> None:
+        self.store.add([make_song("1_1"), make_song("1_2")])
+        self.store.stop()
+        reloaded = TrackStore(lambda: self.service, self.path)
+        assert reloaded.get("1_2") == make_song("1_2")
+        assert reloaded.get("1_3") is None
+
+    def test_drops_least_recently_used(self) -> None:
+        store = TrackStore(lambda: self.service, self.path, max_tracks=2)
+        store.add([make_song("1_1"), make_song("1_2")])
+        store.get("1_1")
+        store.add([make_song("1_3")])
+        store.stop()
+        reloaded = TrackStore(lambda: self.service, self.path)
+        assert reloaded.get("1_1") is not None
+        assert reloaded.get("1_2") is None
+        assert reloaded.get("1_3") is not None
+
+    def test_eviction_keeps_unsaved_entries_and_the_file(self) -> None:
+        self.store.add([make_song("1_1"), make_song("1_2")])
+        self.store.save()
+        self.store.add([make_song("1_3")])
+        size = self.store.meter.size
+
+        assert self.store.evict(size) > 0
+        assert self.store.meter.entries == 1
+        assert self.store.get("1_1") is None
+        assert self.store.get("1_3") == make_song("1_3")
+
+        self.store.stop()
+        reloaded = TrackStore(lambda: self.service, self.path)
+        assert reloaded.get("1_1") == make_song("1_1")
+        assert reloaded.meter.size == size
+
+    def test_revalidates_due_entries_in_batches(self) -> None:
+        songs = [make_song(f"1_{i}") for i in range(150)]
+        self.store.add(songs)
+        for entry in self.store._entries.values():
+            entry["checked_at"] = time.time() - trackstore.REVALIDATE_AFTER - 1
+        for song in songs:
+            assert self.store.get(song["id"])["title"] == "Title"
+        assert self.store.revalidate() == 150
+        assert [len(batch) for batch in self.service.batches] == [100, 50]
+        assert self.store.get("1_0")["title"] == "Renamed"
+        assert self.store.revalidate() == 0
@@ -0,0 +1,154 @@
+"""Tests for warming the caches of a fresh node."""
+
+import pathlib
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from mopidy_vkm.playlists import PlaylistSnapshots
+from mopidy_vkm.sync import MY_MUSIC, PLAYLISTS, LibraryIndex, LibrarySyncScheduler
+from mopidy_vkm.warmer import CacheWarmer
+
+
+class FakeService:
+    """Library of one playlist whose files live on disk."""
+
+    def __init__(self, media: pathlib.Path) -> None:
+        self.media = media
+        self.songs = 0
+        self.resolved: list[list[str]] = []
+
+    def get_count_by_user_id(self, user_id: str) -> int:
+        return self.songs
+
+    def get_songs_by_userid(
+        self, user_id: str, count: int = 100, offset: int = 0
+    ) -> list[SimpleNamespace]:
+        return [
+            SimpleNamespace(
+                owner_id="1", track_id=str(i), title="T", artist="A", duration=1
+            )
+            for i in range(offset, min(offset + count, self.songs))
+        ]
+
+    def get_playlists_by_userid(
+        self, user_id: str, count: int = 50, offset: int = 0
+    ) -> list[SimpleNamespace]:
+        if offset:
+            return []
+        return [
+            SimpleNamespace(
+                title="Mix",
+                description="",
+                photo=(self.media / "cover.jpg").as_uri(),
+                count=2,
+                owner_id="1",
+                playlist_id="7",
+                access_key="key",
+            )
+        ]
+
+    def get_songs_by_playlist_id(
+        self, owner_id: str, playlist_id: int, access_key: str, count: int, offset: int
+    ) -> list[SimpleNamespace]:
+        return [
+            SimpleNamespace(
+                owner_id="1", track_id=str(i), title="T", artist="A", duration=1
+            )
+            for i in (1, 2)
+        ]
+
+    def get_songs_by_id(self, ids: list[str]) -> list[SimpleNamespace]:
+        self.resolved.append(ids)
+        return [
+            SimpleNamespace(
+                owner_id="1",
+                track_id=audio_id.split("_")[1],
+                url=(self.media / f"{audio_id}.mp3").as_uri(),
+            )
+            for audio_id in ids
+        ]
+
+    def get_recommendations(
+        self, user_id: str, count: int = 50
+    ) -> list[SimpleNamespace]:
+        return []
+
+
+class TestCacheWarmer(unittest.TestCase):
+    """Test the CacheWarmer class."""
+
+    def setUp(self) -> None:
+        self.temp = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp.name)
+        self.cache = root / "cache"
+        media = root / "media"
+        media.mkdir()
+        (media / "cover.jpg").write_bytes(b"jpg")
+        for i in (1, 2):
+            (media / f"1_{i}.mp3").write_bytes(b"mp3" * 100)
+        self.service = FakeService(media)
+        self.index = LibraryIndex(self.cache / "library.json")
+        self.progress: list[tuple[str, int, int]] = []
+        self.warmer = CacheWarmer(
+            self.index,
+            LibrarySyncScheduler(
+                self.index, lambda: self.service, lambda: "1", 0, 1000
+            ),
+            PlaylistSnapshots(
+                self.index, lambda: self.service, self.cache / "playlists.json"
+            ),
+            lambda: self.service,
+            self.cache,
+            workers=2,
+            progress=lambda *args: self.progress.append(args),
+        )
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def test_warm_everything(self) -> None:
+        self.warmer.sync_library()
+        assert [item["id"] for item in self.index.get_items(PLAYLISTS)] == ["1_7"]
+
+        assert self.warmer.resolve_playlists() == 1
+        assert self.warmer.fetch_covers() == 1
+        assert (self.cache / "covers" / "1_7.jpg").read_bytes() == b"jpg"
+
+        assert self.warmer.download_playlists(["1_7"]) == 2
+        assert (self.cache / "tracks" / "1_2.mp3").read_bytes() == b"mp3" * 100
+        assert ("downloads", 2, 2) in self.progress
+
+        # Already stored tracks are not resolved again
+        assert self.warmer.download_playlists(["vkm:playlist:1_7:key"]) == 2
+        assert self.service.resolved == [["1_1", "1_2"]]
+
+    def test_download_skips_track_finished_by_another_instance(self) -> None:
+        self.warmer.sync_library()
+        tracks = self.cache / "tracks"
+        resolve = self.service.get_songs_by_id
+
+        def resolve_while_other_finishes(ids: list[str]) -> list[SimpleNamespace]:
+            tracks.mkdir(parents=True, exist_ok=True)
+            (tracks / "1_1.mp3").write_bytes(b"other")
+            return resolve(ids)
+
+        self.service.get_songs_by_id = resolve_while_other_finishes
+
+        assert self.warmer.download_playlists(["1_7"]) == 2
+        assert (tracks / "1_1.mp3").read_bytes() == b"other"
+        assert (tracks / "1_2.mp3").read_bytes() == b"mp3" * 100
+
+    def test_sync_library_spans_several_budgets(self) -> None:
+        self.service.songs = 2500
+        self.warmer.scheduler.api_budget = 10
+
+        cycles = self.warmer.sync_library()
+
+        assert cycles > 1
+        assert self.index.is_synced()
+        assert len(self.index.get_items(MY_MUSIC)) == 2500
+
+
+if __name__ == "__main__":
+    unittest.main()
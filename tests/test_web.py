@@ -1,16 +1,31 @@
 """Tests for the VKM web interface."""
 
 import json
+import pathlib
+import tempfile
+import threading
+import time
 import unittest
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import pykka
+from mopidy.models import Image, Ref, SearchResult, Track
 from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application, RequestHandler
 
 from mopidy_vkm.auth import AuthStatus
 from mopidy_vkm.auth.service import VKMAuthService
 from mopidy_vkm.backend import VKMBackend
+from mopidy_vkm.memory import MemoryBudget
+from mopidy_vkm.playback import LocalTracks, PrerollBuffer, PrerolledTrack
+from mopidy_vkm.quality import ThroughputMonitor
+from mopidy_vkm.search import SearchCache
+from mopidy_vkm.shaping import TrafficShaper
+from mopidy_vkm.sync import LibraryIndex
 from mopidy_vkm.web.app import create_web_app
 from mopidy_vkm.web.handlers import (
+    BaseHandler,
     MainHandler,
 )
 
@@ -46,12 +61,17 @@ class TestWebHandlers(AsyncHTTPTestCase):
     def test_main_handler(self) -> None:
         """Test the main handler."""
         # Patch the render method to avoid template rendering
-        with patch.object(MainHandler, "render") as mock_render:
-            # Make the request
+        MainHandler._page = None
+        with patch.object(
+            MainHandler, "render_string", return_value=b"<html></html>"
+        ) as mock_render:
+            # Make the requests
+            self.fetch("/vkm")
             self.fetch("/vkm")
 
-            # Check that the render method was called
-            mock_render.assert_called_once_with("vkm/index.html")
+            # Check that the page shell was rendered only once
+            mock_render.assert_called_once()
+            assert mock_render.call_args.args == ("vkm/index.html",)
 
     def test_status_handler(self) -> None:
         """Test the status handler."""
@@ -204,5 +224,408 @@ class TestWebHandlers(AsyncHTTPTestCase):
         auth_service.cancel_auth.assert_called_once()
 
 
+class TestAsyncHandlers(AsyncHTTPTestCase):
+    """Test that slow backend calls do not block the IOLoop."""
+
+    def get_app(self) -> Application:
+        self.release = threading.Event()
+        auth_service = MagicMock(spec=VKMAuthService)
+
+        def slow_status() -> dict:
+            self.release.wait(5)
+            return {"status": "success"}
+
+        auth_service.get_status.side_effect = slow_status
+        search_cache = MagicMock()
+        search_cache.suggest.return_value = []
+        attributes = {"auth_service": auth_service, "search_cache": search_cache}
+        self.patcher = patch.object(
+            BaseHandler, "get_backend_attribute", side_effect=attributes.get
+        )
+        self.patcher.start()
+        return Application(create_web_app({}, MockCore()))
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.patcher.stop()
+        super().tearDown()
+
+    def test_slow_backend_times_out_with_json(self) -> None:
+        with patch.object(BaseHandler, "request_timeout", 0.2):
+            response = self.fetch("/auth/status")
+
+        assert response.code == 504
+        assert json.loads(response.body)["error"] == "VKM backend timed out"
+
+    def test_other_requests_served_while_backend_is_slow(self) -> None:
+        slow = self.http_client.fetch(self.get_url("/auth/status"))
+        start = time.monotonic()
+
+        response = self.fetch("/search/suggest?q=abc")
+
+        assert time.monotonic() - start < 2
+        assert response.code == 200
+        self.release.set()
+        assert self.io_loop.run_sync(lambda: slow).code == 200
+
+
+class TestBatchHandler(AsyncHTTPTestCase):
+    """Test the batch API endpoint."""
+
+    def get_app(self) -> Application:
+        auth_service = MagicMock(spec=VKMAuthService)
+        auth_service.get_status.return_value = {"status": "success"}
+        library = MagicMock()
+        library.browse.return_value = [
+            Ref.track(uri=f"vkm:track:1_{i}", name=f"Track {i}") for i in range(5)
+        ]
+        library.get_images.return_value = {
+            "vkm:playlist:1_2": [Image(uri="https://vk.example/p.jpg")]
+        }
+        attributes = {"auth_service": auth_service, "library": library}
+        self.patcher = patch.object(
+            BaseHandler, "get_backend_attribute", side_effect=attributes.get
+        )
+        self.patcher.start()
+        return Application(create_web_app({}, MockCore()))
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        super().tearDown()
+
+    def batch(self, operations: object) -> tuple[int, dict]:
+        response = self.fetch("/api/batch", method="POST", body=json.dumps(operations))
+        return response.code, json.loads(response.body)
+
+    def test_operations_in_one_request(self) -> None:
+        code, data = self.batch(
+            [
+                {"id": 1, "op": "status"},
+                {"id": 2, "op": "browse", "params": {"uri": "vkm:root", "limit": 2}},
+                {"id": 3, "op": "images", "params": {"uris": ["vkm:playlist:1_2"]}},
+                {"id": 4, "op": "suggest", "params": {"q": "a"}},
+                {"id": 5, "op": "nope"},
+            ]
+        )
+
+        assert code == 200
+        results = data["results"]
+        assert [r["id"] for r in results] == [1, 2, 3, 4, 5]
+        assert results[0]["result"] == {"status": "success"}
+        assert results[1]["result"]["total"] == 5
+        assert len(results[1]["result"]["items"]) == 2
+        assert results[2]["result"]["vkm:playlist:1_2"][0]["uri"].endswith("p.jpg")
+        # No search cache in this backend: only that operation fails
+        assert results[3] == {
+            "id": 4,
+            "status": "error",
+            "error": "VKM backend not available",
+        }
+        assert results[4]["error"] == "Unknown operation"
+
+    def test_rejects_non_list(self) -> None:
+        code, data = self.batch({"op": "status"})
+        assert code == 400
+        assert data["status"] == "error"
+
+
+class TestLibraryApiHandler(AsyncHTTPTestCase):
+    """Test the paginated library API."""
+
+    def get_app(self) -> Application:
+        self.index = LibraryIndex()
+        self.index.set_items(
+            "my_music",
+            [
+                {"id": f"1_{i}", "owner_id": "1", "track_id": str(i), "title": "T"}
+                for i in range(250)
+            ],
+            250,
+        )
+        self.patcher = patch.object(
+            BaseHandler,
+            "get_backend_attribute",
+            side_effect={"library_index": self.index}.get,
+        )
+        self.patcher.start()
+        return Application(create_web_app({}, MockCore()))
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        super().tearDown()
+
+    def test_page(self) -> None:
+        response = self.fetch("/api/library/my_music?offset=200&limit=100")
+
+        assert response.code == 200
+        data = json.loads(response.body)
+        assert data["total"] == 250
+        assert len(data["items"]) == 50
+        assert data["items"][0]["uri"] == "vkm:track:1_200"
+
+    def test_conditional_get(self) -> None:
+        etag = self.fetch("/api/library/my_music").headers["Etag"]
+
+        response = self.fetch("/api/library/my_music", headers={"If-None-Match": etag})
+        assert response.code == 304
+
+        self.index.set_items("my_music", [], 0)
+        response = self.fetch("/api/library/my_music", headers={"If-None-Match": etag})
+        assert response.code == 200
+        assert json.loads(response.body)["total"] == 0
+
+    def test_streaming_export(self) -> None:
+        response = self.fetch("/api/export?format=ndjson&collections=my_music")
+
+        assert response.code == 200
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        assert response.headers["Transfer-Encoding"] == "chunked"
+        lines = response.body.decode().splitlines()
+        assert len(lines) == 250
+        assert json.loads(lines[-1])["uri"] == "vkm:track:1_249"
+
+    def test_export_rejects_unknown_format(self) -> None:
+        assert self.fetch("/api/export?format=xml").code == 400
+
+    def test_summary(self) -> None:
+        data = json.loads(self.fetch("/api/library").body)
+        assert data["collections"]["my_music"]["total"] == 250
+        assert data["collections"]["playlists"]["total"] == 0
+
+
+class FakeCdnHandler(RequestHandler):
+    """Serves a track honouring byte ranges, like VK's CDN."""
+
+    body = bytes(range(256)) * 40
+
+    def get(self) -> None:
+        start, _, end = (
+            self.request.headers["Range"].removeprefix("bytes=").partition("-")
+        )
+        self.set_status(206)
+        self.write(self.body[int(start) : int(end) + 1 if end else None])
+
+
+class TestStreamHandler(AsyncHTTPTestCase):
+    """Test the local stream of prerolled tracks."""
+
+    def get_app(self) -> Application:
+        self.preroll = MagicMock()
+        self.traffic = TrafficShaper(ThroughputMonitor())
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tracks_dir = pathlib.Path(self.temp_dir.name)
+        attributes = {
+            "local_tracks": LocalTracks([self.tracks_dir]),
+            "preroll": self.preroll,
+            "resolve_url": lambda _audio_id: "https://cdn.example/1.mp3",
+            "traffic": self.traffic,
+        }
+        self.patcher = patch.object(
+            BaseHandler, "get_backend_attribute", side_effect=attributes.get
+        )
+        self.patcher.start()
+        return Application([*create_web_app({}, MockCore()), (r"/cdn", FakeCdnHandler)])
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def test_local_file_is_served_with_ranges(self) -> None:
+        frames = [b"\xff\xfb\x90\x00" + bytes([i]) * 413 for i in range(100)]
+        (self.tracks_dir / "1_7.mp3").write_bytes(b"".join(frames))
+
+        response = self.fetch("/stream/1_7")
+        assert response.code == 200
+        assert response.body == b"".join(frames)
+
+        response = self.fetch("/stream/1_7", headers={"Range": "bytes=417-833"})
+        assert response.code == 206
+        assert response.headers["Content-Range"] == "bytes 417-833/41700"
+        assert response.body == frames[1]
+
+    def test_prerolled_head_then_rest_from_cdn(self) -> None:
+        body = FakeCdnHandler.body
+        self.preroll.get.return_value = PrerolledTrack(
+            self.get_url("/cdn"), body[:1000], len(body), "audio/mpeg"
+        )
+
+        response = self.fetch("/stream/1_1")
+
+        assert response.code == 200
+        assert response.headers["Content-Type"] == "audio/mpeg"
+        assert response.body == body
+        assert self.traffic.stats()["playback_bytes"] == len(body) - 1000
+
+    def test_head_range_end_is_honoured(self) -> None:
+        body = FakeCdnHandler.body
+        self.preroll.get.return_value = PrerolledTrack(
+            self.get_url("/cdn"), body[:1000], len(body), "audio/mpeg"
+        )
+
+        # Within the buffered head, and reaching past it into the relay
+        for end in (499, 4999):
+            response = self.fetch("/stream/1_1", headers={"Range": f"bytes=0-{end}"})
+            assert response.code == 206
+            assert response.headers["Content-Range"] == f"bytes 0-{end}/{len(body)}"
+            assert response.body == body[: end + 1]
+
+    def test_seek_and_unbuffered_redirect_to_cdn(self) -> None:
+        self.preroll.get.return_value = None
+        response = self.fetch("/stream/1_1", follow_redirects=False)
+        assert response.code == 302
+        assert response.headers["Location"] == "https://cdn.example/1.mp3"
+
+        self.preroll.get.return_value = PrerolledTrack(
+            "https://cdn.example/2.mp3", b"ID3", 100, "audio/mpeg"
+        )
+        response = self.fetch(
+            "/stream/1_2", follow_redirects=False, headers={"Range": "bytes=50-"}
+        )
+        assert response.headers["Location"] == "https://cdn.example/2.mp3"
+
+
+class TestDebugCachesHandler(AsyncHTTPTestCase):
+    """Test the cache introspection endpoint."""
+
+    def get_app(self) -> Application:
+        self.budget = MemoryBudget(1024)
+        self.budget.register(SearchCache(ttl=60))
+        self.patcher = patch.object(
+            BaseHandler,
+            "get_backend_attribute",
+            side_effect={"memory_budget": self.budget}.get,
+        )
+        self.patcher.start()
+        return Application(create_web_app({}, MockCore()))
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        super().tearDown()
+
+    def test_report(self) -> None:
+        response = self.fetch("/debug/caches")
+
+        assert response.code == 200
+        data = json.loads(response.body)
+        assert data["limit"] == 1024
+        assert data["caches"][0]["name"] == "search"
+        assert data["caches"][0]["hit_rate"] is None
+
+
+@pykka.traversable
+class ActorLibrary:
+    """Library provider answering from fixed data."""
+
+    def browse(self, uri: str) -> list[Ref]:
+        return [Ref.track(uri=f"{uri}:{i}", name=f"Track {i}") for i in range(5)]
+
+    def search(self, query: dict, exact: bool = False) -> SearchResult:  # noqa: FBT001, FBT002
+        return SearchResult(
+            tracks=[Track(uri="vkm:track:1_1", name=" ".join(query.get("any", [])))]
+        )
+
+    def get_images(self, uris: list[str]) -> dict[str, list[Image]]:
+        return {uri: [Image(uri="https://vk.example/p.jpg")] for uri in uris}
+
+
+class PlaylistService:
+    """VK service with one song per playlist."""
+
+    def get_songs_by_playlist_id(
+        self, owner_id: str, playlist_id: int, access_key: str, count: int, offset: int
+    ) -> list[SimpleNamespace]:
+        return [
+            SimpleNamespace(
+                title="Song", artist="A", duration=10, track_id="9", owner_id="2"
+            )
+        ][offset:count]
+
+
+class ActorBackend(pykka.ThreadingActor):
+    """Backend actor reached through Pykka proxies, as in Mopidy."""
+
+    uri_schemes = ("vkm",)
+
+    def __init__(self, preroll: PrerollBuffer, index: LibraryIndex) -> None:
+        super().__init__()
+        self.library = ActorLibrary()
+        self.preroll = preroll
+        self.library_index = index
+
+    def get_vk_service(self) -> PlaylistService:
+        return PlaylistService()
+
+    def resolve_url(self, audio_id: str) -> str:
+        return f"https://cdn.example/{audio_id}.mp3"
+
+
+class ActorCore(pykka.ThreadingActor):
+    """Core actor holding the backend proxies."""
+
+    def __init__(self, backends: list[pykka.ActorProxy]) -> None:
+        super().__init__()
+        self.backends = backends
+
+
+class TestActorBackend(AsyncHTTPTestCase):
+    """Test the handlers against a real actor backend."""
+
+    def get_app(self) -> Application:
+        self.preroll = PrerollBuffer(1)
+        index = LibraryIndex()
+        index.set_items(
+            "playlists",
+            [{"id": "2_7", "owner_id": "2", "playlist_id": "7", "title": "Mix"}],
+            1,
+        )
+        backend = ActorBackend.start(self.preroll, index).proxy()
+        core = ActorCore.start([backend]).proxy()
+        return Application(create_web_app({}, core))
+
+    def tearDown(self) -> None:
+        pykka.ActorRegistry.stop_all()
+        super().tearDown()
+
+    def test_batch_resolves_provider_futures(self) -> None:
+        self.preroll._tracks["1_1"] = PrerolledTrack(
+            "https://cdn.example/1.mp3", b"ID3", 100, "audio/mpeg"
+        )
+        response = self.fetch(
+            "/api/batch",
+            method="POST",
+            body=json.dumps(
+                [
+                    {"id": 1, "op": "browse", "params": {"uri": "vkm:root"}},
+                    {"id": 2, "op": "search", "params": {"query": {"any": ["a"]}}},
+                    {"id": 3, "op": "images", "params": {"uris": ["vkm:album:1"]}},
+                    {"id": 4, "op": "downloads"},
+                ]
+            ),
+        )
+
+        results = json.loads(response.body)["results"]
+        assert [r["status"] for r in results] == ["success"] * 4
+        assert results[0]["result"]["total"] == 5
+        assert results[1]["result"][0]["name"] == "a"
+        assert results[2]["result"]["vkm:album:1"][0]["uri"].endswith("p.jpg")
+        assert results[3]["result"]["buffered"] == {"1_1": {"bytes": 3, "total": 100}}
+        assert results[3]["result"]["pending"] == []
+
+    def test_export_includes_playlist_tracks(self) -> None:
+        response = self.fetch(
+            "/api/export?format=m3u&collections=playlists&playlist_tracks=1"
+        )
+
+        assert response.code == 200
+        assert "vkm:track:2_9" in response.body.decode()
+
+    def test_unbuffered_track_redirects_to_resolved_url(self) -> None:
+        response = self.fetch("/stream/1_5", follow_redirects=False)
+
+        assert response.code == 302
+        assert response.headers["Location"] == "https://cdn.example/1_5.mp3"
+
+
 if __name__ == "__main__":
     unittest.main()